@@ -3,5 +3,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Project.settings')
+# Execute GraphQL queries on the event loop (uvicorn Project.asgi:application).
+os.environ.setdefault('GRAPHQL_ASYNC', 'True')
 
 application = get_asgi_application()
@@ -2,9 +2,13 @@ import graphene
 import graphql_jwt
 
 from core.schema.query import CoreQuery
+from core.schema.search import SearchResult
+from core.search import MAX_RESULTS as MAX_SEARCH_RESULTS, search
 from core.schema.mutation import UpdateSiteConfiguration
+from utils.response_cache import cacheable
 
 from driver.schema.query import DriverQuery
+from driver.schema.async_query import AsyncDriverQuery
 from driver.schema.mutation import (
     CreateDriverMutation,
     UpdateDriverMutation,
@@ -12,6 +16,7 @@ from driver.schema.mutation import (
 )
 
 from vehicle.schema.query import VehicleQuery
+from vehicle.schema.async_query import AsyncVehicleQuery
 from vehicle.schema.mutation import (
     CreateVehicleBrandMutation,
     UpdateVehicleBrandMutation,
@@ -24,10 +29,13 @@ from vehicle.schema.mutation import (
     DeleteExpenseCategoryMutation,
     CreateVehicleExpenseMutation,
     UpdateVehicleExpenseMutation,
-    DeleteVehicleExpenseMutation
+    DeleteVehicleExpenseMutation,
+    BulkCreateVehicleExpensesMutation,
+    ImportVehicleExpensesCsvMutation
 )
 
 from party.schema.query import PartyQuery
+from party.schema.async_query import AsyncPartyQuery
 from party.schema.mutation import (
     CreateParty,
     UpdateParty,
@@ -39,6 +47,12 @@ class Query(graphene.ObjectType):
     driver = graphene.Field(DriverQuery)
     vehicle = graphene.Field(VehicleQuery)
     party = graphene.Field(PartyQuery)
+    search = graphene.List(
+        graphene.NonNull(SearchResult),
+        required=True,
+        q=graphene.String(required=True),
+        first=graphene.Int(default_value=20, description=f"At most {MAX_SEARCH_RESULTS}."),
+    )
 
     def resolve_core(self, info):
         return CoreQuery()
@@ -52,6 +66,12 @@ class Query(graphene.ObjectType):
     def resolve_party(self, info):
         return PartyQuery()
 
+    def resolve_search(self, info, q, first):
+        return search(q, first)
+
+
+cacheable(Query, "search")
+
 class Mutation(graphene.ObjectType):
 
     # Core mutations
@@ -84,6 +104,8 @@ class Mutation(graphene.ObjectType):
     create_vehicle_expense = CreateVehicleExpenseMutation.Field()
     update_vehicle_expense = UpdateVehicleExpenseMutation.Field()
     delete_vehicle_expense = DeleteVehicleExpenseMutation.Field()
+    bulk_create_vehicle_expenses = BulkCreateVehicleExpensesMutation.Field()
+    import_vehicle_expenses_csv = ImportVehicleExpensesCsvMutation.Field()
 
     # Party mutations
     create_party = CreateParty.Field()
@@ -91,3 +113,29 @@ class Mutation(graphene.ObjectType):
     delete_party = DeleteParty.Field()
 
 schema = graphene.Schema(query=Query, mutation=Mutation)
+
+
+# Same SDL as Query, with the async resolvers. Served by AsyncGraphQLView under
+# ASGI. (No docstrings on these types: graphene would publish them as
+# descriptions and the two schemas would differ.)
+class AsyncQuery(Query):
+    class Meta:
+        name = "Query"
+
+    driver = graphene.Field(AsyncDriverQuery)
+    vehicle = graphene.Field(AsyncVehicleQuery)
+    party = graphene.Field(AsyncPartyQuery)
+
+    async def resolve_core(self, info):
+        return CoreQuery()
+
+    async def resolve_driver(self, info):
+        return AsyncDriverQuery()
+
+    async def resolve_vehicle(self, info):
+        return AsyncVehicleQuery()
+
+    async def resolve_party(self, info):
+        return AsyncPartyQuery()
+
+async_schema = graphene.Schema(query=AsyncQuery, mutation=Mutation)
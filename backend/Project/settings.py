@@ -31,6 +31,7 @@ INSTALLED_APPS += [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     'graphene_django',
     'django_filters',
@@ -76,6 +77,18 @@ DATABASES = {
     'default': dj_database_url.parse(DB_URI)
 }
 
+# Use a shared backend (e.g. Redis or memcached) when running several workers,
+# so cache-version bumps such as SingletonModel.save() and party search index
+# changes reach all of them. With
+# a process-local backend those per-process copies are not kept at all
+# (utils/caching.py).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -111,16 +124,71 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Let Django serve MEDIA_URL (content-addressed files get immutable cache headers).
+SERVE_MEDIA = config('SERVE_MEDIA', default=DEBUG, cast=bool)
 
 GRAPHENE = {
     'SCHEMA': 'Project.schema.schema',
     'MIDDLEWARE': [
         'graphql_jwt.middleware.JSONWebTokenMiddleware',
+        # Before DataLoaderMiddleware, which evaluates the QuerySets it optimizes.
+        'utils.optimizer.QueryOptimizerMiddleware',
+        'utils.dataloader.DataLoaderMiddleware',
+        # Keep last: it must wrap the other middleware to time them.
+        'utils.tracing.ResolverTimingMiddleware',
+    ],
+}
+
+# Static cost budget checked before any GraphQL query runs (see utils/complexity.py).
+GRAPHQL_QUERY_LIMITS = {
+    'MAX_DEPTH': config('GRAPHQL_MAX_DEPTH', default=12, cast=int),
+    'MAX_COST': config('GRAPHQL_MAX_COST', default=50000, cast=int),
+    'DEFAULT_LIST_SIZE': config('GRAPHQL_DEFAULT_LIST_SIZE', default=100, cast=int),
+    'RELATED_LIST_SIZE': config('GRAPHQL_RELATED_LIST_SIZE', default=20, cast=int),
+}
+
+# Serve /graphql/ with AsyncGraphQLView. Project/asgi.py turns this on.
+GRAPHQL_ASYNC = config('GRAPHQL_ASYNC', default=False, cast=bool)
+
+# Bearer token for scraping /metrics/graphql/ (staff sessions can always read it).
+GRAPHQL_METRICS_TOKEN = config('GRAPHQL_METRICS_TOKEN', default='')
+# Share of untraced requests whose per-resolver trace is logged (0 to 1).
+GRAPHQL_TRACE_SAMPLE_RATE = config('GRAPHQL_TRACE_SAMPLE_RATE', default=0.0, cast=float)
+
+# Opt-in whole-response cache for read-only queries (see utils/response_cache.py).
+# Only turn it on with a shared cache backend: each worker's LocMemCache would
+# keep serving responses that a save in another worker invalidated.
+GRAPHQL_RESPONSE_CACHE = {
+    'ENABLED': config('GRAPHQL_RESPONSE_CACHE', default=False, cast=bool),
+    'TIMEOUT': config('GRAPHQL_RESPONSE_CACHE_TIMEOUT', default=300, cast=int),
+    'MODELS': [
+        'vehicle.VehicleBrand',
+        'vehicle.Vehicle',
+        'vehicle.ExpenseCategory',
+        'vehicle.VehicleExpense',
+        'driver.Driver',
+        'party.Party',
+        'core.SiteConfiguration',
     ],
 }
 
+GRAPHQL_PERSISTED_QUERIES = {
+    'REGISTER_ON_DEMAND': config('GRAPHQL_APQ_REGISTER_ON_DEMAND', default=True, cast=bool),
+    'ON_DEMAND_TIMEOUT': config('GRAPHQL_APQ_ON_DEMAND_TIMEOUT', default=24 * 60 * 60, cast=int),
+    'ALLOWLIST_ONLY': config('GRAPHQL_APQ_ALLOWLIST_ONLY', default=False, cast=bool),
+    'DOCUMENT_CACHE_SIZE': config('GRAPHQL_DOCUMENT_CACHE_SIZE', default=256, cast=int),
+}
+
+# Limits on multipart uploads to /graphql/, enforced while they stream in (utils/uploads.py).
+GRAPHQL_UPLOADS = {
+    'MAX_REQUEST_SIZE': config('GRAPHQL_UPLOAD_MAX_REQUEST_SIZE', default=25 * 1024 * 1024, cast=int),
+}
+
+# Seconds a JWT's user and permissions are served from the cache (core/auth.py).
+JWT_USER_CACHE_TIMEOUT = config('JWT_USER_CACHE_TIMEOUT', default=60, cast=int)
+
 AUTHENTICATION_BACKENDS = [
-    'graphql_jwt.backends.JSONWebTokenBackend',
+    'core.auth.CachedJSONWebTokenBackend',
     'django.contrib.auth.backends.ModelBackend',
 ]
 
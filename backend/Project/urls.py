@@ -1,13 +1,14 @@
+import re
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from django.http import JsonResponse
 from django.conf import settings
-from django.conf.urls.static import static
-from graphene_file_upload.django import FileUploadGraphQLView
 from django.views.decorators.csrf import csrf_exempt
-from Project.schema import schema
+from Project.schema import async_schema, schema
+from Project.views import AsyncGraphQLView, GraphQLView, graphql_metrics, serve_media
 from graphene_django.settings import graphene_settings
 from django.http import HttpResponse
+from vehicle.views import export_vehicle_expenses
 
 # for dev only
 def download_schema(request, *args, **kwargs):
@@ -19,13 +20,23 @@ def download_schema(request, *args, **kwargs):
     response['Content-Disposition'] = 'attachment; filename=schema.graphql'
     return response
 
+# Under ASGI the endpoint executes queries on the event loop (see Project/asgi.py).
+if settings.GRAPHQL_ASYNC:
+    graphql_view = AsyncGraphQLView.as_view(graphiql=True, schema=async_schema)
+else:
+    graphql_view = GraphQLView.as_view(graphiql=True, schema=schema)
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path("graphql/", csrf_exempt(FileUploadGraphQLView.as_view(graphiql=True, schema=schema))),
+    path("graphql/", csrf_exempt(graphql_view)),
+    path("export/expenses/", export_vehicle_expenses),
+    path("metrics/graphql/", graphql_metrics),
     path("", lambda request: JsonResponse({"message": "Welcome to the API"})),
 ]
 
-# Serve media files in development
+# Serve media files in development, or wherever SERVE_MEDIA is set
+if settings.SERVE_MEDIA:
+    urlpatterns += [re_path(r"^%s(?P<path>.*)$" % re.escape(settings.MEDIA_URL.lstrip("/")), serve_media)]
+
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += [path("schema/", download_schema)]
@@ -0,0 +1,362 @@
+import inspect
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.static import serve
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import HttpError
+from graphene_file_upload.django import FileUploadGraphQLView
+from graphql import ExecutionResult, GraphQLError, OperationType, execute, get_operation_ast, validate_schema
+from graphql_jwt.exceptions import JSONWebTokenError
+
+from core.persisted_queries import document_cache, resolve_query
+from utils import response_cache
+from utils.async_execution import SyncResolverMiddleware, pop_execute_wrapper, push_execute_wrapper
+from utils.complexity import check_query_cost, get_limits
+from utils.storage import is_content_addressed
+from utils.tracing import QueryTrace, ResolverTimingMiddleware, log_trace, operation_metrics, trace_requested, trace_sampled
+from utils.uploads import LimitedUploadHandler, UploadRejected
+
+
+class PreparedOperation:
+    """A parsed, validated and costed operation, ready to execute."""
+
+    def __init__(self, schema, document, operation_ast, variables, operation_name):
+        self.schema = schema
+        self.document = document
+        self.operation_ast = operation_ast
+        self.variables = variables
+        self.operation_name = operation_name
+        self.cache_key = None
+        self.tracing = False
+        self.sampled = False
+        self.trace = QueryTrace()
+
+    @property
+    def is_query(self):
+        return self.operation_ast is not None and self.operation_ast.operation == OperationType.QUERY
+
+    @property
+    def name(self):
+        if self.operation_ast is not None and self.operation_ast.name:
+            return self.operation_ast.name.value
+        return self.operation_name
+
+
+class GraphQLView(FileUploadGraphQLView):
+    """
+    The project's GraphQL endpoint. It
+
+    - resolves automatic persisted queries (``extensions.persistedQuery``),
+    - streams multipart uploads to disk under size and file type limits,
+    - serves parsed and validated documents from an LRU keyed by query hash,
+    - rejects operations over the static cost budget before execution and
+      reports the computed cost under ``extensions.cost``,
+    - serves opted-in read-only queries from the response cache,
+    - times every operation for the per-operation histograms, and returns the
+      per-resolver trace under ``extensions.tracing`` when asked to with the
+      ``X-GraphQL-Trace`` header (or logs it for a GRAPHQL_TRACE_SAMPLE_RATE
+      sample of the other requests).
+    """
+
+    extensions = None
+
+    def authenticate_request(self, request):
+        """
+        Resolve a JWT before execution, so the response cache and tracing see
+        the caller. Returns False for an invalid token, which is left for the
+        JWT middleware to report.
+        """
+        if request.user.is_authenticated:
+            return True
+        try:
+            user = authenticate(request=request)
+        except JSONWebTokenError:
+            return False
+        if user is not None:
+            request.user = user
+        return True
+
+    def parse_body(self, request):
+        if self.get_content_type(request) == "multipart/form-data":
+            # Must be set before anything reads request.POST or request.FILES.
+            request.upload_handlers = [LimitedUploadHandler(request)]
+            try:
+                return super().parse_body(request)
+            except UploadRejected as e:
+                raise HttpError(HttpResponse(status=e.status_code), str(e))
+        return super().parse_body(request)
+
+    def get_request_extensions(self, request, data):
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        return extensions if isinstance(extensions, dict) else {}
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        prepared = self.prepare_operation(request, data, query, variables, operation_name, show_graphiql)
+        if not isinstance(prepared, PreparedOperation):
+            return prepared
+        return self.run_operation(request, prepared)
+
+    def prepare_operation(self, request, data, query, variables, operation_name, show_graphiql=False):
+        """
+        Everything before execution. Returns a PreparedOperation, or the
+        ExecutionResult (or None, for GraphiQL) to respond with instead.
+        """
+        self.extensions = {}
+        try:
+            query, query_hash = resolve_query(query, self.get_request_extensions(request, data), operation_name)
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        document, validation_errors = document_cache.get(schema, query_hash, query)
+        if document is None:
+            return ExecutionResult(errors=validation_errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    f"Can only perform a {operation_ast.operation.value} operation from a POST request.",
+                )
+            )
+
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        cost, cost_errors = check_query_cost(schema, document, operation_name, variables)
+        self.extensions["cost"] = cost.as_dict(get_limits())
+        if cost_errors:
+            return ExecutionResult(data=None, errors=cost_errors)
+
+        prepared = PreparedOperation(schema, document, operation_ast, variables, operation_name)
+        authenticated = self.authenticate_request(request)
+        prepared.tracing = trace_requested(request)
+        if authenticated and not prepared.tracing and prepared.is_query:
+            prepared.cache_key = response_cache.cache_key(
+                request, schema, document, query_hash, operation_name, variables
+            )
+        if prepared.cache_key is not None:
+            data = response_cache.get_response(prepared.cache_key)
+            if data is not None:
+                self.extensions["responseCache"] = "HIT"
+                return ExecutionResult(data=data)
+            self.extensions["responseCache"] = "MISS"
+
+        prepared.sampled = not prepared.tracing and trace_sampled()
+        request.graphql_trace = None
+        if prepared.tracing or prepared.sampled:
+            prepared.trace.record_resolvers()
+            request.graphql_trace = prepared.trace
+        return prepared
+
+    def get_middleware(self, request):
+        middleware = super().get_middleware(request)
+        if getattr(request, "graphql_trace", None) is None:
+            # Untraced requests only keep the request-level counters.
+            middleware = [m for m in middleware or () if not isinstance(m, ResolverTimingMiddleware)]
+        return middleware
+
+    def run_operation(self, request, prepared):
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(prepared.trace.sql_wrapper):
+                result = self.execute_document(request, prepared)
+        except Exception as e:
+            result = ExecutionResult(errors=[e])
+        return self.finish_operation(request, prepared, result, time.perf_counter() - start)
+
+    def finish_operation(self, request, prepared, result, duration):
+        trace = prepared.trace
+        trace.duration = duration
+        operation_metrics.observe(prepared.name, trace.duration, trace.sql_count, trace.sql_duration)
+
+        if prepared.cache_key is not None and result is not None and not result.errors:
+            response_cache.set_response(prepared.cache_key, result.data)
+        if prepared.tracing:
+            self.extensions["tracing"] = trace.as_dict()
+        elif prepared.sampled:
+            log_trace(prepared.name, trace)
+        if result is not None and result.extensions:
+            self.extensions.update(result.extensions)
+        return result
+
+    def execute_document(self, request, prepared, middleware=None):
+        execute_options = {
+            "root_value": self.get_root_value(request),
+            "context_value": self.get_context(request),
+            "variable_values": prepared.variables,
+            "operation_name": prepared.operation_name,
+            "middleware": middleware if middleware is not None else self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            execute_options["execution_context_class"] = self.execution_context_class
+
+        operation_ast = prepared.operation_ast
+        if (
+            operation_ast is not None
+            and operation_ast.operation == OperationType.MUTATION
+            and (
+                graphene_settings.ATOMIC_MUTATIONS is True
+                or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+            )
+        ):
+            with transaction.atomic():
+                result = execute(prepared.schema, prepared.document, **execute_options)
+                if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                    transaction.set_rollback(True)
+            return result
+
+        return execute(prepared.schema, prepared.document, **execute_options)
+
+    def json_encode(self, request, d, pretty=False):
+        if self.extensions and isinstance(d, dict) and ("data" in d or "errors" in d):
+            d = {**d, "extensions": self.extensions}
+            self.extensions = None
+        return super().json_encode(request, d, pretty)
+
+
+class AsyncGraphQLView(GraphQLView):
+    """
+    GraphQLView for the ASGI application. Queries execute on the event loop,
+    so coroutine resolvers (the async schema's ``Async*Query`` types) run
+    concurrently and do not hold a thread while they wait on the database.
+    SyncResolverMiddleware moves every other resolver to a worker thread.
+    Parsing (including multipart uploads), persisted queries, the response
+    cache, JWT authentication and mutations run in a worker thread.
+    """
+
+    view_is_async = True
+
+    def get_async_middleware(self, request):
+        return [*self.get_middleware(request), SyncResolverMiddleware()]
+
+    @method_decorator(ensure_csrf_cookie)
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(["GET", "POST"], "GraphQL only supports GET and POST requests.")
+                )
+
+            data = await sync_to_async(self.parse_body)(request)
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            if self.batch:
+                responses = [await self.aget_response(request, entry) for entry in data]
+                result = "[{}]".format(",".join(response[0] for response in responses))
+                status_code = max((response[1] for response in responses), default=200)
+            else:
+                result, status_code = await self.aget_response(request, data)
+
+            return HttpResponse(status=status_code, content=result, content_type="application/json")
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(request, {"errors": [self.format_error(e)]})
+            return response
+
+    async def aget_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        execution_result = await self.aexecute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+
+        status_code = 200
+        if not execution_result:
+            return None, status_code
+        response = {}
+        if execution_result.errors:
+            response["errors"] = [self.format_error(e) for e in execution_result.errors]
+        if execution_result.errors and any(not getattr(e, "path", None) for e in execution_result.errors):
+            status_code = 400
+        else:
+            response["data"] = execution_result.data
+        if self.batch:
+            response["id"] = id
+            response["status"] = status_code
+        return self.json_encode(request, response, pretty=show_graphiql), status_code
+
+    async def aexecute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        prepared = await sync_to_async(self.prepare_operation)(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        if not isinstance(prepared, PreparedOperation):
+            return prepared
+        if not prepared.is_query:
+            # Mutations keep their transaction, so they run in one thread.
+            return await sync_to_async(self.run_operation)(request, prepared)
+
+        start = time.perf_counter()
+        await sync_to_async(push_execute_wrapper)(prepared.trace.sql_wrapper)
+        try:
+            result = self.execute_document(request, prepared, self.get_async_middleware(request))
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception as e:
+            result = ExecutionResult(errors=[e])
+        finally:
+            await sync_to_async(pop_execute_wrapper)(prepared.trace.sql_wrapper)
+        return await sync_to_async(self.finish_operation)(request, prepared, result, time.perf_counter() - start)
+
+
+def graphql_metrics(request):
+    """
+    Per-operation GraphQL histograms in the Prometheus text format. Scrapers
+    authenticate with ``Authorization: Bearer <GRAPHQL_METRICS_TOKEN>``;
+    staff can also read it with their session.
+    """
+    token = settings.GRAPHQL_METRICS_TOKEN
+    authorization = request.META.get("HTTP_AUTHORIZATION", "")
+    authorized = bool(token) and constant_time_compare(authorization, f"Bearer {token}")
+    if not authorized and not request.user.is_staff:
+        return HttpResponse("Forbidden", status=403)
+    return HttpResponse(operation_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# A year, the longest max-age caches are expected to honour.
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def serve_media(request, path):
+    """
+    Serve an uploaded file. Content-addressed files (named by the hash of
+    their bytes, see utils/storage.py) can never change, so browsers and CDNs
+    are told to cache them for good without revalidating.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_content_addressed(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    return response
@@ -1,7 +1,20 @@
 from django.contrib import admin
-from .models import SiteConfiguration
+from .models import SiteConfiguration, PersistedQuery, SearchEntry
 
 @admin.register(SiteConfiguration)
 class SiteConfigurationAdmin(admin.ModelAdmin):
     pass
 
+
+@admin.register(PersistedQuery)
+class PersistedQueryAdmin(admin.ModelAdmin):
+    list_display = ('sha256_hash', 'operation_name', 'created_at')
+    search_fields = ('sha256_hash', 'operation_name')
+    readonly_fields = ('sha256_hash', 'query', 'operation_name', 'created_at')
+
+
+@admin.register(SearchEntry)
+class SearchEntryAdmin(admin.ModelAdmin):
+    list_display = ('term', 'kind', 'object_id', 'field', 'weight')
+    list_filter = ('kind', 'field')
+    search_fields = ('term',)
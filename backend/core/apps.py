@@ -8,7 +8,17 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         from django.contrib.auth import get_user_model
+        from django.core import checks
         from django.db.utils import OperationalError, ProgrammingError
+        from utils import response_cache
+        from utils.caching import check_shared_cache
+        from . import auth  # noqa: F401  (connects the cached-user invalidation signals)
+        from . import search
+
+        checks.register(check_shared_cache, checks.Tags.caches)
+        checks.register(response_cache.check_cache_backend, checks.Tags.caches)
+        response_cache.connect_signals()
+        search.connect_signals()
 
         if settings.DEBUG:
             User = get_user_model()
@@ -0,0 +1,144 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from graphql_jwt.backends import JSONWebTokenBackend
+from graphql_jwt.settings import jwt_settings
+from graphql_jwt.utils import get_credentials, get_payload, get_user_by_payload
+
+User = get_user_model()
+
+# Fields a cached user is rebuilt with; the rest (password hash included) are
+# deferred, and loaded from the database only if something reads them.
+CACHED_FIELDS = (User._meta.pk.attname, User.USERNAME_FIELD, "is_active", "is_staff", "is_superuser")
+
+
+def _token_key(token):
+    return "jwt-user:token:" + hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _user_key(pk):
+    return f"jwt-user:user:{pk}"
+
+
+def forget_users(pks):
+    """Drop the cached users ``pks`` once the current transaction commits."""
+    keys = [_user_key(pk) for pk in pks]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _snapshot(user):
+    # Fills ModelBackend's permission caches, so they can be stored as well.
+    user.get_all_permissions()
+    return {
+        "fields": {name: getattr(user, name) for name in CACHED_FIELDS},
+        "user_permissions": getattr(user, "_user_perm_cache", set()),
+        "group_permissions": getattr(user, "_group_perm_cache", set()),
+    }
+
+
+def _rehydrate(entry):
+    fields = entry["fields"]
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in fields]
+    user = User.from_db(router.db_for_read(User), names, [fields[name] for name in names])
+    # has_perm() is then answered in memory, as with a freshly loaded user.
+    user._user_perm_cache = entry["user_permissions"]
+    user._group_perm_cache = entry["group_permissions"]
+    user._perm_cache = {*entry["user_permissions"], *entry["group_permissions"]}
+    return user
+
+
+def get_user_by_token(token, request=None):
+    """
+    The user a JWT belongs to. The token is verified on every call, but the
+    user's id, CACHED_FIELDS and permissions are kept in Django's cache for
+    JWT_USER_CACHE_TIMEOUT seconds and rebuilt into a User from there. A
+    change to a user, or to the groups and permissions it has, drops that
+    user's entry.
+    """
+    payload = get_payload(token, request)
+    username = jwt_settings.JWT_PAYLOAD_GET_USERNAME_HANDLER(payload)
+    token_key = _token_key(token)
+    pk = cache.get(token_key)
+    entry = cache.get(_user_key(pk)) if pk is not None else None
+    if entry is not None and entry["fields"][User.USERNAME_FIELD] == username:
+        return _rehydrate(entry)
+
+    user = get_user_by_payload(payload)
+    if user is not None:
+        cache.set_many(
+            {token_key: user.pk, _user_key(user.pk): _snapshot(user)},
+            settings.JWT_USER_CACHE_TIMEOUT,
+        )
+    return user
+
+
+class CachedJSONWebTokenBackend(JSONWebTokenBackend):
+    """
+    JSONWebTokenBackend that verifies a request's token once and serves the
+    user from get_user_by_token's cache.
+    """
+
+    def authenticate(self, request=None, **kwargs):
+        if request is None or getattr(request, "_jwt_token_auth", False):
+            return None
+
+        token = get_credentials(request, **kwargs)
+        if token is None:
+            return None
+
+        resolved = getattr(request, "_jwt_user", None)
+        if resolved is not None and resolved[0] == token:
+            return resolved[1]
+        user = get_user_by_token(token, request)
+        request._jwt_user = (token, user)
+        return user
+
+
+def _users_of_groups(group_pks):
+    return User.objects.filter(groups__in=group_pks).values_list("pk", flat=True).distinct()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which the cached users do not hold.
+    if update_fields is None or set(update_fields) != {"last_login"}:
+        forget_users([instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    forget_users([instance.pk])
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # Its memberships are gone (without m2m_changed) by post_delete.
+    forget_users(_users_of_groups([instance.pk]))
+
+
+def _affected_users(sender, instance, reverse, pk_set):
+    # pk_set is None for clears, which are handled before the rows go.
+    if sender is Group.permissions.through:
+        if not reverse:
+            groups = [instance.pk]
+        else:
+            groups = instance.group_set.values_list("pk", flat=True) if pk_set is None else pk_set
+        return _users_of_groups(groups)
+    if not reverse:
+        return [instance.pk]
+    return instance.user_set.values_list("pk", flat=True) if pk_set is None else pk_set
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove", "pre_clear"):
+        forget_users(_affected_users(sender, instance, reverse, pk_set))
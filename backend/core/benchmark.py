@@ -0,0 +1,281 @@
+import datetime
+import json
+import platform
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from graphql_jwt.shortcuts import get_token
+from graphql_relay import to_global_id
+
+from core.fleet_data import generate_fleet
+from utils.caching import is_shared_cache
+from party.models import Party
+from vehicle.models import ExpenseCategory, Vehicle
+
+# Rows generated by seed_dataset() at each scale.
+SCALES = {
+    "small": {"brands": 10, "vehicles": 200, "expenses": 10000, "parties": 2000, "drivers": 50},
+    "medium": {"brands": 30, "vehicles": 2000, "expenses": 500000, "parties": 20000, "drivers": 200},
+    "large": {"brands": 50, "vehicles": 5000, "expenses": 2000000, "parties": 100000, "drivers": 500},
+}
+
+# Fixed, so a seed always produces the same data.
+END_DATE = datetime.date(2024, 12, 31)
+
+# Latency and memory may grow by this fraction over the baseline before the
+# comparison fails. Query counts must not grow at all. Latency depends on the
+# machine, so it is only gated against a baseline recorded on the same host.
+DEFAULT_TOLERANCE = 0.25
+# Latencies below this many milliseconds are too noisy to compare.
+MIN_COMPARED_MS = 5.0
+
+GRAPHQL_PATH = "/graphql/"
+
+
+class Operation:
+    def __init__(self, name, query, variables=None, mutation=False):
+        self.name = name
+        self.query = query
+        # Either a dict, or a callable taking the fixture ids.
+        self.variables = variables
+        self.mutation = mutation
+
+    def get_variables(self, fixtures):
+        if callable(self.variables):
+            return self.variables(fixtures)
+        return self.variables or {}
+
+
+OPERATIONS = [
+    Operation(
+        "all_vehicle_expenses",
+        """{ vehicle { allVehicleExpenses(first: 100) { edges { node {
+             id amount date vehicle { registrationNumber } category { name } } } } } }""",
+    ),
+    Operation(
+        "brand_vehicles_expenses",
+        """{ vehicle { allVehicleBrands(first: 20) { edges { node { name vehicles { registrationNumber
+             expenses(first: 10) { edges { node { amount date category { name } } } } } } } } } }""",
+    ),
+    Operation(
+        "expenses_page",
+        """query ($vehicle: ID) { vehicle { expenses(first: 50, vehicleId: $vehicle) {
+             totalCount edges { node { id amount date category { name } } } pageInfo { hasNextPage endCursor } } } }""",
+        # The connection's filters take global ids.
+        lambda fixtures: {"vehicle": to_global_id("VehicleType", fixtures["vehicle"])},
+    ),
+    Operation(
+        "expense_summary",
+        """{ vehicle { expenseSummary(groupBy: [BRAND, MONTH]) { total count } } }""",
+    ),
+    Operation(
+        "fleet_analytics",
+        """{ vehicle { fleetAnalytics { total vehicles(first: 20) { total costPerYear }
+             months { month total delta } categories { total share } } } }""",
+    ),
+    Operation(
+        "parties_filter",
+        """{ party { parties(first: 50, name_Icontains: "sha") { edges { node { id name phone } } } } }""",
+    ),
+    Operation(
+        "parties_search",
+        """{ party { searchParties(q: "sharma", first: 20) { id name phone } } }""",
+    ),
+    Operation(
+        "search",
+        """{ search(q: "tn 01", first: 20) { __typename ... on VehicleType { registrationNumber } } }""",
+    ),
+    Operation(
+        "create_vehicle_expense",
+        """mutation ($vehicle: ID!, $category: ID) { createVehicleExpense(input: {
+             vehicle: $vehicle, category: $category, amount: "1250.00", date: "2024-06-01" }) { vehicleExpense { id } } }""",
+        lambda fixtures: {"vehicle": fixtures["vehicle"], "category": fixtures["category"]},
+        mutation=True,
+    ),
+    Operation(
+        "update_party",
+        """mutation ($party: ID!) { updateParty(id: $party, input: {
+             name: "Benchmark Traders", phone: "9000000000" }) { party { id } } }""",
+        lambda fixtures: {"party": fixtures["party"]},
+        mutation=True,
+    ),
+]
+
+
+def seed_dataset(scale="small", seed=0, stdout=None):
+    """Fill an empty database with a deterministic fleet of the given scale."""
+    generate_fleet(**SCALES[scale], end_date=END_DATE, seed=seed, stdout=stdout)
+
+
+def fixtures():
+    """Ids the operations' variables refer to."""
+    return {
+        "vehicle": Vehicle.objects.order_by("pk").values_list("pk", flat=True).first(),
+        "category": ExpenseCategory.objects.order_by("pk").values_list("pk", flat=True).first(),
+        "party": Party.objects.order_by("pk").values_list("pk", flat=True).first(),
+    }
+
+
+def _superuser():
+    user = get_user_model().objects.filter(is_superuser=True, is_active=True).first()
+    if user is None:
+        raise RuntimeError("The benchmark needs an active superuser to run mutations.")
+    return user
+
+
+def _host():
+    """A host name ALLOWED_HOSTS accepts, for the test client's requests."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+def benchmark_client():
+    """Test client that authenticates as a superuser with a JWT, like the front end."""
+    return Client(HTTP_HOST=_host(), HTTP_AUTHORIZATION=f"JWT {get_token(_superuser())}")
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _execute(client, operation, variables):
+    with transaction.atomic():
+        response = client.post(
+            GRAPHQL_PATH,
+            json.dumps({"query": operation.query, "variables": variables}),
+            content_type="application/json",
+        )
+        if operation.mutation:
+            transaction.set_rollback(True)
+    try:
+        errors = response.json().get("errors")
+    except ValueError:
+        errors = None
+    if errors or response.status_code != 200:
+        message = errors[0]["message"] if errors else f"HTTP {response.status_code}"
+        raise RuntimeError(f"{operation.name} failed: {message}")
+
+
+def run_operation(client, operation, variables, repeat):
+    """
+    Post an operation to the GraphQL endpoint and return its latency
+    percentiles over ``repeat`` runs (ms), and the SQL queries and peak traced
+    memory (KiB) of one more run. Memory is traced separately because tracing
+    slows execution down. Mutations are rolled back after each run, so every
+    run sees the same data.
+    """
+    # Warm-up, so one-off work such as building the party search index or
+    # parsing the document is not timed.
+    _execute(client, operation, variables)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _execute(client, operation, variables)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as captured:
+            _execute(client, operation, variables)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "p50_ms": round(_percentile(timings, 0.5), 2),
+        "p95_ms": round(_percentile(timings, 0.95), 2),
+        "p99_ms": round(_percentile(timings, 0.99), 2),
+        "queries": len(captured.captured_queries),
+        "peak_kib": round(peak / 1024),
+    }
+
+
+def run_benchmark(repeat=10, names=None, stdout=None, response_cache=False):
+    """
+    Results of every catalogue operation (or those in ``names``), keyed by
+    name. Operations go through the /graphql/ view, with its cost limits,
+    persisted queries and document cache. The response cache is off unless
+    ``response_cache`` is set, so reads measure the work behind it. A
+    process-local default cache is swapped for a file cache, so per-process
+    copies such as the party search index are measured as they run with a
+    shared cache, not rebuilt on every call.
+    """
+    ids = fixtures()
+    client = benchmark_client()
+    results = {}
+    cache_settings = {**getattr(settings, "GRAPHQL_RESPONSE_CACHE", {}), "ENABLED": response_cache}
+    with ExitStack() as stack:
+        stack.enter_context(override_settings(GRAPHQL_RESPONSE_CACHE=cache_settings))
+        if not is_shared_cache():
+            location = stack.enter_context(tempfile.TemporaryDirectory())
+            stack.enter_context(override_settings(CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location},
+            }))
+        for operation in OPERATIONS:
+            if names and operation.name not in names:
+                continue
+            if stdout:
+                stdout.write(f"Running {operation.name}...")
+            results[operation.name] = run_operation(client, operation, operation.get_variables(ids), repeat)
+    return results
+
+
+def latency_changes(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Latencies in ``results`` over ``baseline`` by more than ``tolerance``, as messages."""
+    changes = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if current[metric] >= MIN_COMPARED_MS and current[metric] > previous[metric] * (1 + tolerance):
+                changes.append(f"{name}: {metric} {current[metric]}, baseline {previous[metric]}")
+    return changes
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, latency=False):
+    """
+    Regressions of ``results`` against ``baseline``, as messages. An
+    operation the baseline does not cover counts as one. SQL query counts and
+    peak memory do not depend on the machine and are always compared;
+    latencies only with ``latency``.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            regressions.append(f"{name}: not in the baseline; run with --save-baseline to add it")
+            continue
+        if current["queries"] > previous["queries"]:
+            regressions.append(f"{name}: {current['queries']} queries, baseline {previous['queries']}")
+        if current["peak_kib"] > previous["peak_kib"] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {current['peak_kib']} KiB, baseline {previous['peak_kib']} KiB")
+    if latency:
+        regressions += latency_changes(results, baseline, tolerance)
+    return regressions
+
+
+def current_host():
+    return platform.node()
+
+
+def load_baseline(path):
+    """The baseline file's contents: ``operations``, and the ``host`` it was recorded on if known."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, scale):
+    baseline = {"scale": scale, "database": connection.vendor, "host": current_host(), "operations": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
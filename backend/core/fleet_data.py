@@ -0,0 +1,231 @@
+import csv
+import datetime
+import io
+
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import search
+from driver.models import Driver
+from party.models import Party
+from party.search import invalidate_index
+from utils.response_cache import invalidate
+from vehicle.models import ExpenseCategory, Vehicle, VehicleBrand, VehicleExpense, normalize_registration
+from vehicle.rollups import rebuild_rollups
+from vehicle.totals import reconcile_totals
+
+CHUNK_SIZE = 50000
+BULK_BATCH_SIZE = 5000
+
+STATES = ("TN", "KA", "KL", "AP", "TS", "MH", "GJ", "DL", "RJ", "UP")
+BRANDS = (
+    "Ashok Leyland", "Tata Motors", "Eicher", "BharatBenz", "Mahindra", "Volvo", "Scania", "Force Motors",
+    "SML Isuzu", "MAN", "Piaggio", "Maruti Suzuki", "Toyota", "Hyundai", "Kia",
+)
+MODELS = ("Cargo", "Hauler", "Tipper", "Trailer", "Pickup", "Tanker", "Carrier", "Van")
+FIRST_NAMES = (
+    "Arun", "Bala", "Karthik", "Lakshmi", "Murugan", "Priya", "Ramesh", "Senthil", "Suresh", "Vijay",
+    "Anita", "Deepak", "Ganesh", "Kavya", "Manoj", "Nisha", "Rahul", "Sanjay", "Divya", "Imran",
+)
+SURNAMES = ("Kumar", "Sharma", "Iyer", "Patel", "Reddy", "Singh", "Das", "Nair", "Rao", "Pillai")
+PARTY_SUFFIXES = ("Traders", "Logistics", "Enterprises", "Transports", "Agencies", "& Sons", "Industries")
+
+# name -> (emoji, share of expenses, median amount, log-normal sigma, descriptions)
+CATEGORIES = {
+    "Fuel": ("⛽", 0.52, 3500, 0.5, ("Diesel", "Diesel top-up", "Full tank")),
+    "Tolls": ("🛣️", 0.16, 450, 0.6, ("Highway toll", "FASTag recharge")),
+    "Maintenance": ("🔧", 0.10, 4500, 0.7, ("Oil change", "General service", "Brake pads")),
+    "Repairs": ("🛠️", 0.07, 9000, 1.0, ("Clutch repair", "Electrical repair", "Body work")),
+    "Cleaning": ("🧽", 0.06, 300, 0.4, ("Wash", "Interior cleaning")),
+    "Tyres": ("🛞", 0.04, 22000, 0.4, ("Front tyre replacement", "Rear tyres", "Puncture")),
+    "Permits": ("📄", 0.03, 6000, 0.3, ("National permit", "Fitness certificate")),
+    "Insurance": ("🛡️", 0.02, 38000, 0.3, ("Annual insurance",)),
+}
+# Fraction of expenses that get a description.
+DESCRIBED = 0.3
+MAX_AMOUNT_CENTS = 10 ** 12 - 1
+
+
+def registration_number(index):
+    """Unique, well-formed registration number for every index ("TN 01 AA 0001" onwards)."""
+    index, number = divmod(index, 9999)
+    index, series = divmod(index, 26 * 26)
+    state, district = divmod(index, 99)
+    return (
+        f"{STATES[state % len(STATES)]} {district + 1:02d} "
+        f"{chr(65 + series // 26)}{chr(65 + series % 26)} {number + 1:04d}"
+    )
+
+
+def _phone(rng, first_digit):
+    return f"{first_digit}{rng.integers(10 ** 9):09d}"
+
+
+def _gst_number(rng):
+    letters = "".join(chr(65 + i) for i in rng.integers(26, size=6))
+    return f"33{letters[:5]}{rng.integers(10000):04d}{letters[5]}1Z{rng.integers(10)}"
+
+
+def _write_rows(model, columns, rows):
+    """
+    Insert raw rows (sequences of strings) into ``model``'s table, with COPY on
+    PostgreSQL and executemany elsewhere. Bypasses save() and signals.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ", ".join(connection.ops.quote_name(model._meta.get_field(column).column) for column in columns)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table} ({names}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(f"INSERT INTO {table} ({names}) VALUES ({placeholders})", rows)
+
+
+def _expense_chunks(rng, vehicles, expenses, start, end):
+    """
+    Yield arrays (vehicle_ids, category_indexes, ordinals, cents) of at most
+    CHUNK_SIZE expenses. Vehicles are picked with skewed (log-normal) activity,
+    dates are uniform between ``start`` (or the vehicle's model year, if
+    later) and ``end``, and amounts are log-normal around each category's
+    median.
+    """
+    vehicle_ids = np.array([pk for pk, _ in vehicles])
+    activity = rng.lognormal(0, 0.75, size=len(vehicles))
+    activity /= activity.sum()
+    first_days = np.array([
+        max(start, datetime.date(year, 1, 1)).toordinal() for _, year in vehicles
+    ])
+    profiles = list(CATEGORIES.values())
+    shares = np.array([profile[1] for profile in profiles])
+    shares /= shares.sum()
+    medians = np.log([profile[2] for profile in profiles])
+    sigmas = np.array([profile[3] for profile in profiles])
+
+    for offset in range(0, expenses, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, expenses - offset)
+        picked = rng.choice(len(vehicles), size=size, p=activity)
+        categories = rng.choice(len(profiles), size=size, p=shares)
+        first = first_days[picked]
+        ordinals = first + (rng.random(size) * (end.toordinal() - first + 1)).astype(np.int64)
+        amounts = rng.lognormal(medians[categories], sigmas[categories])
+        cents = np.clip(np.round(amounts * 100), 100, MAX_AMOUNT_CENTS).astype(np.int64)
+        yield vehicle_ids[picked], categories, ordinals, cents
+
+
+def generate_fleet(
+    brands=15,
+    vehicles=1000,
+    drivers=200,
+    parties=10000,
+    expenses=100000,
+    years=3,
+    end_date=None,
+    seed=0,
+    rebuild_indexes=True,
+    stdout=None,
+):
+    """
+    Fill an empty database with a synthetic fleet. The same seed and options
+    always produce the same rows. Expenses are generated with NumPy a chunk at
+    a time and written with COPY (PostgreSQL) or executemany, so tens of
+    millions of rows stay fast. Raw inserts send no signals, so the rollups,
+    search index and vehicle counters are rebuilt afterwards unless
+    ``rebuild_indexes`` is False.
+    """
+    rng = np.random.default_rng(seed)
+    end = end_date or timezone.localdate()
+    start = end - datetime.timedelta(days=round(365.25 * years) - 1)
+    log = stdout.write if stdout else (lambda message: None)
+    now = timezone.now().isoformat()
+
+    with transaction.atomic():
+        VehicleBrand.objects.bulk_create([
+            VehicleBrand(name=BRANDS[i % len(BRANDS)] + (f" {i // len(BRANDS) + 1}" if i >= len(BRANDS) else ""))
+            for i in range(brands)
+        ])
+        ExpenseCategory.objects.bulk_create([
+            ExpenseCategory(name=name, emoji=profile[0]) for name, profile in CATEGORIES.items()
+        ], ignore_conflicts=True)
+        brand_ids = list(VehicleBrand.objects.order_by("pk").values_list("pk", flat=True))
+        category_pks = dict(ExpenseCategory.objects.values_list("name", "pk"))
+        category_ids = np.array([category_pks[name] for name in CATEGORIES])
+
+        # Newer vehicles are more common than old ones.
+        model_years = rng.triangular(end.year - 20, end.year, end.year, size=vehicles).astype(int)
+        vehicle_brands = rng.choice(brand_ids, size=vehicles)
+        vehicle_models = rng.integers(len(MODELS), size=vehicles)
+        Vehicle.objects.bulk_create(
+            (
+                Vehicle(
+                    brand_id=int(vehicle_brands[i]),
+                    name=f"{MODELS[vehicle_models[i]]} {i + 1}",
+                    year=int(model_years[i]),
+                    registration_number=registration_number(i),
+                    registration_key=normalize_registration(registration_number(i)),
+                )
+                for i in range(vehicles)
+            ),
+            batch_size=BULK_BATCH_SIZE,
+        )
+        log(f"Created {brands} brands, {len(CATEGORIES)} categories and {vehicles} vehicles.")
+
+        Driver.objects.bulk_create(
+            (
+                Driver(name=f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)}", phone=_phone(rng, 9))
+                for _ in range(drivers)
+            ),
+            batch_size=BULK_BATCH_SIZE,
+        )
+        Party.objects.bulk_create(
+            (
+                Party(
+                    name=f"{rng.choice(SURNAMES)} {rng.choice(PARTY_SUFFIXES)} {i + 1}",
+                    phone=_phone(rng, 8),
+                    gst_number=_gst_number(rng) if rng.random() < 0.6 else None,
+                )
+                for i in range(parties)
+            ),
+            batch_size=BULK_BATCH_SIZE,
+        )
+        log(f"Created {drivers} drivers and {parties} parties.")
+
+        fleet = list(Vehicle.objects.order_by("pk").values_list("pk", "year"))
+        descriptions = [profile[4] for profile in CATEGORIES.values()]
+        written = 0
+        for vehicle_ids, categories, ordinals, cents in _expense_chunks(rng, fleet, expenses, start, end):
+            described = rng.random(len(cents)) < DESCRIBED
+            choices = rng.integers(1000, size=len(cents))
+            rows = [
+                (
+                    str(vehicle_id),
+                    str(category_ids[category]),
+                    descriptions[category][choice % len(descriptions[category])] if has_description else "",
+                    f"{amount // 100}.{amount % 100:02d}",
+                    datetime.date.fromordinal(ordinal).isoformat(),
+                    now,
+                    now,
+                )
+                for vehicle_id, category, ordinal, amount, has_description, choice in zip(
+                    vehicle_ids.tolist(), categories.tolist(), ordinals.tolist(), cents.tolist(),
+                    described.tolist(), choices.tolist(),
+                )
+            ]
+            _write_rows(
+                VehicleExpense,
+                ("vehicle", "category", "description", "amount", "date", "created_at", "updated_at"),
+                rows,
+            )
+            written += len(rows)
+            log(f"Created {written} of {expenses} expenses.")
+
+    if rebuild_indexes:
+        log("Rebuilding rollups, vehicle totals and search indexes...")
+        rebuild_rollups()
+        reconcile_totals()
+        search.rebuild()
+    invalidate_index()
+    invalidate(VehicleBrand, Vehicle, ExpenseCategory, VehicleExpense, Driver, Party)
@@ -0,0 +1,112 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.benchmark import (
+    DEFAULT_TOLERANCE,
+    OPERATIONS,
+    SCALES,
+    compare,
+    current_host,
+    latency_changes,
+    load_baseline,
+    run_benchmark,
+    save_baseline,
+    seed_dataset,
+)
+from vehicle.models import Vehicle
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a fixed catalogue of GraphQL operations against /graphql/, report latency percentiles, "
+        "SQL queries and peak memory, and fail on query or memory regressions against a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            choices=sorted(SCALES),
+            help="Seed a fleet of this size first. The database must not have any vehicles yet.",
+        )
+        parser.add_argument("--random-seed", type=int, default=0)
+        parser.add_argument("--repeat", type=int, default=10, help="Timed runs per operation.")
+        parser.add_argument(
+            "--operation",
+            action="append",
+            dest="operations",
+            choices=[operation.name for operation in OPERATIONS],
+            help="Only run this operation (repeatable).",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=os.path.join(settings.BASE_DIR, "benchmark-baseline.json"),
+            help="Baseline JSON file (default: the committed benchmark-baseline.json).",
+        )
+        parser.add_argument(
+            "--response-cache",
+            action="store_true",
+            help="Leave the response cache on, so repeated reads are served from it.",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Write the results as the new baseline instead of comparing.",
+        )
+        parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+        parser.add_argument(
+            "--gate-latency",
+            action="store_true",
+            help="Also fail on latency regressions. The baseline must have been recorded on this host.",
+        )
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            if Vehicle.objects.exists():
+                raise CommandError("The database already has vehicles; seed an empty database.")
+            seed_dataset(options["seed"], options["random_seed"], stdout=self.stdout)
+        if not Vehicle.objects.exists():
+            raise CommandError("No data to benchmark; run with --seed first.")
+
+        try:
+            results = run_benchmark(
+                options["repeat"], options["operations"], stdout=self.stdout, response_cache=options["response_cache"]
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"\n{'Operation':<26} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak KiB':>9}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<26} {result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9} "
+                f"{result['queries']:>8} {result['peak_kib']:>9}"
+            )
+
+        path = options["baseline"]
+        if options["save_baseline"]:
+            save_baseline(path, results, options["seed"] or "existing")
+            self.stdout.write(self.style.SUCCESS(f"\nSaved baseline to {path}."))
+            return
+        if not os.path.exists(path):
+            self.stdout.write(f"\nNo baseline at {path}; run with --save-baseline to create one.")
+            return
+
+        baseline = load_baseline(path)
+        if options["gate_latency"] and baseline.get("host") != current_host():
+            raise CommandError(
+                f"{path} was not recorded on this host ({current_host()}), so its latencies are not comparable. "
+                "Record one here with --save-baseline."
+            )
+        operations = baseline["operations"]
+        if not options["gate_latency"]:
+            # Reported only: latency varies from machine to machine.
+            for change in latency_changes(results, operations, options["tolerance"]):
+                self.stdout.write(f"Slower than the baseline (not gated): {change}")
+        regressions = compare(results, operations, options["tolerance"], latency=options["gate_latency"])
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) against {path} ({connection.vendor}).")
+        self.stdout.write(self.style.SUCCESS(f"\nNo regressions against {path}."))
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.persisted_queries import prune_persisted_queries, query_hash, register_persisted_query
+
+
+def read_manifest(data):
+    """
+    Yield (sha256_hash, query, operation_name) from an Apollo persisted query
+    manifest ({"operations": [{"id", "name", "body"}]}) or a {hash: query} map.
+    """
+    if isinstance(data, dict) and isinstance(data.get("operations"), list):
+        for operation in data["operations"]:
+            yield operation.get("id"), operation["body"], operation.get("name") or ""
+    elif isinstance(data, dict):
+        for sha256_hash, query in data.items():
+            yield sha256_hash, query, ""
+    else:
+        raise CommandError("Unrecognised manifest format.")
+
+
+class Command(BaseCommand):
+    help = "Register the operations in a persisted query manifest."
+
+    def add_arguments(self, parser):
+        parser.add_argument("manifest", help="Path to the JSON manifest.")
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete registered queries that are not in the manifest.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["manifest"], encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read manifest: {e}")
+
+        operations = []
+        for sha256_hash, query, operation_name in read_manifest(data):
+            expected = query_hash(query)
+            if sha256_hash and sha256_hash != expected:
+                raise CommandError(f"Hash {sha256_hash} does not match its query ({operation_name or 'anonymous'}).")
+            operations.append((expected, query, operation_name))
+
+        hashes = {
+            register_persisted_query(query, operation_name, sha256_hash)
+            for sha256_hash, query, operation_name in operations
+        }
+
+        self.stdout.write(self.style.SUCCESS(f"Registered {len(hashes)} persisted query(s)."))
+        if options["prune"]:
+            deleted = prune_persisted_queries(hashes)
+            self.stdout.write(f"Pruned {deleted} persisted query(s).")
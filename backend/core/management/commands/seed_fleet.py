@@ -0,0 +1,53 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.fleet_data import generate_fleet
+from vehicle.models import Vehicle, VehicleBrand
+
+
+class Command(BaseCommand):
+    help = "Fill an empty database with a deterministic synthetic fleet for performance work."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--brands", type=int, default=15)
+        parser.add_argument("--vehicles", type=int, default=1000)
+        parser.add_argument("--drivers", type=int, default=200)
+        parser.add_argument("--parties", type=int, default=10000)
+        parser.add_argument("--expenses", type=int, default=100000, help="Total expense rows.")
+        parser.add_argument("--years", type=int, default=3, help="Years of expenses, ending at --end-date.")
+        parser.add_argument(
+            "--end-date",
+            type=datetime.date.fromisoformat,
+            help="Last expense date (YYYY-MM-DD); defaults to today. Fix it for reproducible data.",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+        parser.add_argument(
+            "--skip-indexes",
+            action="store_true",
+            help="Do not rebuild the expense rollups and search index afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        if VehicleBrand.objects.exists() or Vehicle.objects.exists():
+            raise CommandError("The database already has brands or vehicles; seed an empty database.")
+        if options["expenses"] and not options["vehicles"]:
+            raise CommandError("Expenses need at least one vehicle.")
+        if options["vehicles"] and not options["brands"]:
+            raise CommandError("Vehicles need at least one brand.")
+
+        started = time.perf_counter()
+        generate_fleet(
+            brands=options["brands"],
+            vehicles=options["vehicles"],
+            drivers=options["drivers"],
+            parties=options["parties"],
+            expenses=options["expenses"],
+            years=options["years"],
+            end_date=options["end_date"],
+            seed=options["seed"],
+            rebuild_indexes=not options["skip_indexes"],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Seeded the fleet in {time.perf_counter() - started:.1f}s."))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_siteconfiguration_phone1_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersistedQuery',
+            fields=[
+                ('sha256_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('query', models.TextField()),
+                ('operation_name', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Persisted Query',
+                'verbose_name_plural': 'Persisted Queries',
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:59
+
+import re
+from itertools import islice
+
+from django.db import migrations, models
+
+# A copy of core.search as of this migration, so later changes to the live
+# index do not change what it writes.
+SOURCES = {
+    'vehicle': ('vehicle.Vehicle', {'registration_number': 10, 'name': 6}),
+    'driver': ('driver.Driver', {'phone': 9, 'name': 6}),
+    'party': ('party.Party', {'phone': 9, 'gst_number': 9, 'name': 6}),
+    'expense': ('vehicle.VehicleExpense', {'description': 2}),
+}
+MAX_TERMS_PER_FIELD = 32
+TERM_LENGTH = 100
+_WORD = re.compile(r'[^\W_]+')
+_PART = re.compile(r'\d+|[^\W\d_]+')
+
+
+def terms(value):
+    words = [word.lower() for word in _WORD.findall(value or '')]
+    found = [''.join(words)] + words + [part.lower() for part in _PART.findall(value or '')]
+    return list(dict.fromkeys(term[:TERM_LENGTH] for term in found if term))[:MAX_TERMS_PER_FIELD]
+
+
+def populate_search_index(apps, schema_editor):
+    SearchEntry = apps.get_model('core', 'SearchEntry')
+    for kind, (label, fields) in SOURCES.items():
+        model = apps.get_model(label)
+        rows = model.objects.order_by().values_list('pk', *fields)
+        found = (
+            SearchEntry(kind=kind, object_id=row[0], field=field, term=term, weight=weight)
+            for row in rows.iterator(chunk_size=1000)
+            for (field, weight), value in zip(fields.items(), row[1:])
+            for term in terms(value)
+        )
+        # bulk_create() would turn a generator into one list.
+        while batch := list(islice(found, 1000)):
+            SearchEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_persistedquery'),
+        ('driver', '0002_alter_driver_phone'),
+        ('party', '0002_party_search_indexes'),
+        ('vehicle', '0004_vehicleexpensemonthlyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('field', models.CharField(max_length=30)),
+                ('term', models.CharField(max_length=100)),
+                ('weight', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Search Entry',
+                'verbose_name_plural': 'Search Entries',
+                'indexes': [models.Index(fields=['term'], name='core_search_term_idx', opclasses=['varchar_pattern_ops']), models.Index(fields=['kind', 'object_id'], name='core_search_object_idx')],
+            },
+        ),
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
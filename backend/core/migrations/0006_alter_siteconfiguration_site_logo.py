@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:08
+
+import core.models
+import utils.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_searchentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='siteconfiguration',
+            name='site_logo',
+            field=models.ImageField(blank=True, help_text='Site logo image (recommended size: 200x60px)', null=True, storage=utils.storage.get_content_addressed_storage, upload_to=core.models.SiteConfiguration._get_site_logo_path),
+        ),
+    ]
@@ -1,13 +1,16 @@
 from django.db import models
 from django.core.validators import MinLengthValidator, RegexValidator
-from utils.models import SingletonModel
-import uuid
+from utils.images import get_variants
+from utils.models import SingletonModel, TrackLoadedValuesMixin
+from utils.storage import get_content_addressed_storage, release
 
-class SiteConfiguration(SingletonModel):
+class SiteConfiguration(TrackLoadedValuesMixin, SingletonModel):
     """
     Singleton model to store global site configuration settings.
     Only one instance of this model can exist at a time.
     """
+    tracked_fields = ("site_logo",)
+
     site_name = models.CharField(
         max_length=100,
         default="Site Name",
@@ -50,14 +53,14 @@ class SiteConfiguration(SingletonModel):
 
     def _get_site_logo_path(instance, filename: str) -> str:
         """
-        Generate a unique file path for the site logo image.
+        File path for the site logo image. The storage replaces the file name
+        with a hash of its content.
         """
-        ext = filename.split('.')[-1]
-        filename = f"{uuid.uuid4()}.{ext}"
         return f'site_logo/{filename}'
     
     site_logo = models.ImageField(
         upload_to=_get_site_logo_path,
+        storage=get_content_addressed_storage,
         blank=True,
         null=True,
         help_text="Site logo image (recommended size: 200x60px)"
@@ -72,21 +75,63 @@ class SiteConfiguration(SingletonModel):
     
     def save(self, *args, **kwargs):
         """
-        Override the save method to delete the old image when a new one is uploaded.
+        Override the save method to release the old image when a new one is uploaded.
         """
-        if self.pk:
-            try:
-                old_instance = SiteConfiguration.objects.get(pk=self.pk)
-                if old_instance.site_logo and self.site_logo != old_instance.site_logo:
-                    old_image = old_instance.site_logo
-                else:
-                    old_image = None
-            except SiteConfiguration.DoesNotExist:
-                old_image = None
+        # Instances from load() remember their logo, so this only queries
+        # for instances built by hand.
+        loaded = self.get_loaded_values()
+        if loaded is not None:
+            old_image = loaded["site_logo"]
         else:
-            old_image = None
+            old_image = SiteConfiguration.objects.filter(pk=self._PK).values_list("site_logo", flat=True).first()
         
         super().save(*args, **kwargs)
+        self.reset_loaded_values()
         
-        if old_image:
-            old_image.delete(save=False)
\ No newline at end of file
+        if old_image and old_image != self.site_logo.name:
+            release(old_image)
+        # Resized copies are made at upload time rather than on first request.
+        get_variants(self.site_logo)
+
+class PersistedQuery(models.Model):
+    """
+    Allowlisted GraphQL document registered under the SHA-256 hash of its
+    text from a front-end build manifest. Automatic persisted queries
+    registered on demand are only cached (see core/persisted_queries.py).
+    """
+    sha256_hash = models.CharField(max_length=64, primary_key=True)
+    query = models.TextField()
+    operation_name = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Persisted Query"
+        verbose_name_plural = "Persisted Queries"
+
+    def __str__(self):
+        return self.operation_name or self.sha256_hash
+
+
+class SearchEntry(models.Model):
+    """
+    One normalized search term of a vehicle, driver, party or expense, kept
+    up to date by the signal handlers in core/search.py.
+    """
+    kind = models.CharField(max_length=10)
+    object_id = models.PositiveBigIntegerField()
+    field = models.CharField(max_length=30)
+    term = models.CharField(max_length=100)
+    weight = models.PositiveSmallIntegerField()
+
+    class Meta:
+        verbose_name = "Search Entry"
+        verbose_name_plural = "Search Entries"
+        indexes = [
+            # The opclass lets PostgreSQL answer LIKE 'prefix%'; other
+            # databases ignore it.
+            models.Index(fields=['term'], name='core_search_term_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['kind', 'object_id'], name='core_search_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.field}={self.term}"
@@ -0,0 +1,178 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from graphene_django.settings import graphene_settings
+from graphql import GraphQLError, parse, validate
+
+from core.models import PersistedQuery
+
+DEFAULT_SETTINGS = {
+    # Accept {query, sha256Hash} pairs from clients and cache them (APQ).
+    # On-demand registrations only live in the cache; the database holds the
+    # allowlist loaded by the register_persisted_queries command.
+    "REGISTER_ON_DEMAND": True,
+    # Seconds an on-demand registration is kept.
+    "ON_DEMAND_TIMEOUT": 24 * 60 * 60,
+    # Reject any operation that is not on the allowlist.
+    "ALLOWLIST_ONLY": False,
+    # Number of parsed and validated documents kept per process.
+    "DOCUMENT_CACHE_SIZE": 256,
+}
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, "GRAPHQL_PERSISTED_QUERIES", {})}
+
+
+class PersistedQueryError(GraphQLError):
+    def __init__(self, message, code):
+        super().__init__(message, extensions={"code": code})
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def _cache_key(sha256_hash):
+    return f"persisted-query:{sha256_hash}"
+
+
+def _on_demand_cache_key(sha256_hash):
+    return f"persisted-query:on-demand:{sha256_hash}"
+
+
+def get_allowlisted_query(sha256_hash):
+    query = cache.get(_cache_key(sha256_hash))
+    if query is None:
+        query = (
+            PersistedQuery.objects.filter(sha256_hash=sha256_hash)
+            .values_list("query", flat=True)
+            .first()
+        )
+        if query is not None:
+            cache.set(_cache_key(sha256_hash), query, None)
+    return query
+
+
+def get_persisted_query(sha256_hash):
+    """The allowlisted or on-demand registered query with this hash, or None."""
+    return cache.get(_on_demand_cache_key(sha256_hash)) or get_allowlisted_query(sha256_hash)
+
+
+def register_persisted_query(query, operation_name="", sha256_hash=None):
+    """Add a query to the allowlist."""
+    sha256_hash = sha256_hash or query_hash(query)
+    PersistedQuery.objects.update_or_create(
+        sha256_hash=sha256_hash,
+        defaults={"query": query, "operation_name": operation_name or ""},
+    )
+    cache.set(_cache_key(sha256_hash), query, None)
+    return sha256_hash
+
+
+def remember_persisted_query(query, sha256_hash=None):
+    """Register a query on demand, in the cache only, for ON_DEMAND_TIMEOUT seconds."""
+    sha256_hash = sha256_hash or query_hash(query)
+    cache.set(_on_demand_cache_key(sha256_hash), query, get_settings()["ON_DEMAND_TIMEOUT"])
+    return sha256_hash
+
+
+def prune_persisted_queries(keep):
+    """Delete every persisted query whose hash is not in ``keep``."""
+    stale = list(PersistedQuery.objects.exclude(sha256_hash__in=keep).values_list("sha256_hash", flat=True))
+    PersistedQuery.objects.filter(sha256_hash__in=stale).delete()
+    cache.delete_many([_cache_key(sha256_hash) for sha256_hash in stale])
+    return len(stale)
+
+
+def resolve_query(query, extensions, operation_name=None):
+    """
+    Apply the automatic persisted query protocol to a request.
+
+    ``extensions.persistedQuery.sha256Hash`` identifies the document. A
+    request with only the hash gets the stored text, and a request with both
+    registers it in the cache. Returns (query, sha256_hash) or raises
+    PersistedQueryError.
+    """
+    options = get_settings()
+    persisted = (extensions or {}).get("persistedQuery") or {}
+    sha256_hash = persisted.get("sha256Hash")
+
+    if sha256_hash is None:
+        if query and options["ALLOWLIST_ONLY"]:
+            sha256_hash = query_hash(query)
+            if get_allowlisted_query(sha256_hash) is None:
+                raise PersistedQueryError("Only persisted queries are allowed.", "PERSISTED_QUERY_NOT_ALLOWED")
+            return query, sha256_hash
+        return query, query_hash(query) if query else None
+
+    if persisted.get("version", 1) != 1:
+        raise PersistedQueryError("Unsupported persisted query version.", "PERSISTED_QUERY_NOT_SUPPORTED")
+
+    if not query:
+        if options["ALLOWLIST_ONLY"]:
+            query = get_allowlisted_query(sha256_hash)
+        else:
+            query = get_persisted_query(sha256_hash)
+        if query is None:
+            raise PersistedQueryError("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+        return query, sha256_hash
+
+    if query_hash(query) != sha256_hash:
+        raise PersistedQueryError("provided sha does not match query", "INVALID_PERSISTED_QUERY_HASH")
+    if options["ALLOWLIST_ONLY"]:
+        if get_allowlisted_query(sha256_hash) is None:
+            raise PersistedQueryError("Only persisted queries are allowed.", "PERSISTED_QUERY_NOT_ALLOWED")
+    elif get_persisted_query(sha256_hash) is None:
+        if not options["REGISTER_ON_DEMAND"]:
+            raise PersistedQueryError("Only persisted queries are allowed.", "PERSISTED_QUERY_NOT_ALLOWED")
+        remember_persisted_query(query, sha256_hash)
+    return query, sha256_hash
+
+
+class DocumentCache:
+    """
+    Thread-safe LRU of parsed and validated documents keyed by query hash, so
+    repeated operations skip parsing and validation entirely.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, schema, sha256_hash, query):
+        """
+        Return (document, errors) for the query, parsing and validating it
+        against ``schema`` only on a cache miss.
+        """
+        key = (id(schema), sha256_hash)
+        with self._lock:
+            entry = self._documents.get(key)
+            if entry is not None:
+                self._documents.move_to_end(key)
+                return entry
+
+        try:
+            document = parse(query)
+        except GraphQLError as e:
+            return None, [e]
+        errors = validate(schema, document, max_errors=graphene_settings.MAX_VALIDATION_ERRORS)
+        entry = (document, errors)
+
+        with self._lock:
+            self._documents[key] = entry
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+
+document_cache = DocumentCache(get_settings()["DOCUMENT_CACHE_SIZE"])
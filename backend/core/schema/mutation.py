@@ -5,6 +5,7 @@ from graphql import GraphQLError
 from graphql_jwt.decorators import login_required
 
 from core.schema.query import SiteConfigurationType
+from utils.uploads import IMAGE_TYPES, check_upload
 
 class UpdateSiteConfiguration(graphene.Mutation):
     class Arguments:
@@ -25,6 +26,7 @@ class UpdateSiteConfiguration(graphene.Mutation):
 
             # Handle file upload separately
             site_logo = kwargs.pop('site_logo', None)
+            check_upload(site_logo, IMAGE_TYPES)
             
             # Validate phone numbers if provided
             for phone_field in ['phone1', 'phone2']:
@@ -3,6 +3,9 @@ import graphene
 from graphene_django import DjangoObjectType
 from django.contrib.auth.models import User
 from graphql import GraphQLError
+from utils.complexity import bounded_list
+from utils.images import image_variants_field, max_variants, resolve_image_variants
+from utils.response_cache import cacheable
 
 class UserType(DjangoObjectType):
     class Meta:
@@ -20,6 +23,11 @@ class SiteConfigurationType(DjangoObjectType):
             "phone2",
             "site_logo",
         )
+
+    site_logo_variants = image_variants_field()
+
+    def resolve_site_logo_variants(self, info, format=None):
+        return resolve_image_variants(self.site_logo, format)
     
 class CoreQuery(graphene.ObjectType):
 
@@ -39,4 +47,8 @@ class CoreQuery(graphene.ObjectType):
                 raise GraphQLError("Authentication required!")
             return user
         except Exception as e:
-            raise GraphQLError(f"Error fetching user information: {str(e)}")
\ No newline at end of file
+            raise GraphQLError(f"Error fetching user information: {str(e)}")
+
+
+cacheable(CoreQuery, "site_config")
+bounded_list(SiteConfigurationType, "site_logo_variants", max_variants())
@@ -0,0 +1,10 @@
+import graphene
+
+from driver.schema.query import DriverType
+from party.schema.query import PartyType
+from vehicle.schema.query import VehicleType, VehicleExpenseType
+
+
+class SearchResult(graphene.Union):
+    class Meta:
+        types = (VehicleType, DriverType, PartyType, VehicleExpenseType)
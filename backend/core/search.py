@@ -0,0 +1,159 @@
+import heapq
+import re
+from collections import defaultdict
+from itertools import islice
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from utils.lookups import prefix_filter
+from .models import SearchEntry
+
+MAX_RESULTS = 50
+# Entries read per query term, which bounds the work a short prefix can cause.
+CANDIDATES_PER_TERM = 200
+MAX_QUERY_WORDS = 5
+MAX_TERMS_PER_FIELD = 32
+TERM_LENGTH = SearchEntry._meta.get_field("term").max_length
+# An exact term match scores this many times its field weight; a prefix once.
+EXACT_MATCH_FACTOR = 2
+
+# kind -> (model label, {field: weight}, related fields fetched with results).
+SOURCES = {
+    "vehicle": ("vehicle.Vehicle", {"registration_number": 10, "name": 6}, ("brand",)),
+    "driver": ("driver.Driver", {"phone": 9, "name": 6}, ()),
+    "party": ("party.Party", {"phone": 9, "gst_number": 9, "name": 6}, ()),
+    "expense": ("vehicle.VehicleExpense", {"description": 2}, ("vehicle", "category")),
+}
+
+_WORD = re.compile(r"[^\W_]+")
+# Runs of digits or of letters, so "TN01AT1234" is also found as "1234".
+_PART = re.compile(r"\d+|[^\W\d_]+")
+
+
+def _words(value):
+    return [word.lower() for word in _WORD.findall(value or "")]
+
+
+def terms(value):
+    """
+    Search terms for a field value: the whole value without spaces or
+    punctuation (so "TN 01 AT 1234" is found as "tn01at"), each word, then
+    each run of letters or digits.
+    """
+    words = _words(value)
+    found = ["".join(words)] + words + [part.lower() for part in _PART.findall(value or "")]
+    return list(dict.fromkeys(term[:TERM_LENGTH] for term in found if term))[:MAX_TERMS_PER_FIELD]
+
+
+def _model(kind):
+    return apps.get_model(SOURCES[kind][0])
+
+
+def _kind_of(model):
+    for kind, (label, _, _) in SOURCES.items():
+        if model._meta.label_lower == label.lower():
+            return kind
+    return None
+
+
+def entries(kind, instance):
+    fields = SOURCES[kind][1]
+    return [
+        SearchEntry(kind=kind, object_id=instance.pk, field=field, term=term, weight=weight)
+        for field, weight in fields.items()
+        for term in terms(getattr(instance, field))
+    ]
+
+
+def index_objects(kind, instances):
+    """(Re)index ``instances`` of one kind, e.g. after bulk_create."""
+    instances = [instance for instance in instances if instance.pk is not None]
+    remove_objects(kind, [instance.pk for instance in instances])
+    SearchEntry.objects.bulk_create(
+        [entry for instance in instances for entry in entries(kind, instance)],
+        batch_size=1000,
+    )
+
+
+def remove_objects(kind, object_ids):
+    SearchEntry.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+
+def rebuild(batch_size=1000):
+    """
+    Reindex every source from scratch. Returns the number of entries. Entries
+    are built and inserted ``batch_size`` at a time, in one transaction, so
+    searches keep seeing the old index until the new one is complete.
+    """
+    created = 0
+    with transaction.atomic():
+        SearchEntry.objects.all().delete()
+        for kind in SOURCES:
+            queryset = _model(kind).objects.order_by().only("pk", *SOURCES[kind][1])
+            instances = queryset.iterator(chunk_size=batch_size)
+            found = (entry for instance in instances for entry in entries(kind, instance))
+            while batch := list(islice(found, batch_size)):
+                SearchEntry.objects.bulk_create(batch)
+                created += len(batch)
+    return created
+
+
+def _object_saved(sender, instance, **kwargs):
+    index_objects(_kind_of(sender), [instance])
+
+
+def _object_deleted(sender, instance, **kwargs):
+    remove_objects(_kind_of(sender), [instance.pk])
+
+
+def connect_signals():
+    for kind in SOURCES:
+        model = _model(kind)
+        post_save.connect(_object_saved, sender=model, dispatch_uid=f"search:{kind}:save")
+        post_delete.connect(_object_deleted, sender=model, dispatch_uid=f"search:{kind}:delete")
+
+
+def _matching_entries(term):
+    entries = SearchEntry.objects.order_by().values_list("kind", "object_id", "term", "weight")
+    rows = list(entries.filter(prefix_filter("term", term))[:CANDIDATES_PER_TERM])
+    if len(rows) == CANDIDATES_PER_TERM:
+        # The cut may have dropped exact matches, which rank highest.
+        rows += entries.filter(term=term)[:CANDIDATES_PER_TERM]
+    return rows
+
+
+def search(q, first=20):
+    """
+    Vehicles, drivers, parties and expenses matching ``q``, best first.
+
+    Each word of ``q``, and ``q`` without spaces, is looked up as a term
+    prefix. An object scores the weight of its best matching field per query
+    term (doubled for an exact term) summed over the query terms.
+    """
+    first = max(0, min(first, MAX_RESULTS))
+    words = _words(q)[:MAX_QUERY_WORDS]
+    if not words or not first:
+        return []
+
+    query_terms = {"".join(words)[:TERM_LENGTH]}
+    query_terms.update(word for word in words if len(word) > 1 or len(words) == 1)
+    scores = defaultdict(int)
+    for term in query_terms:
+        best = {}
+        for kind, object_id, found, weight in _matching_entries(term):
+            score = weight * (EXACT_MATCH_FACTOR if found == term else 1)
+            best[kind, object_id] = max(best.get((kind, object_id), 0), score)
+        for key, score in best.items():
+            scores[key] += score
+
+    kinds = list(SOURCES)
+    top = heapq.nsmallest(first, scores, key=lambda key: (-scores[key], kinds.index(key[0]), key[1]))
+    objects = {}
+    for kind in kinds:
+        ids = [object_id for found, object_id in top if found == kind]
+        if ids:
+            queryset = _model(kind).objects.select_related(*SOURCES[kind][2])
+            objects.update({(kind, pk): obj for pk, obj in queryset.in_bulk(ids).items()})
+    return [objects[key] for key in top if key in objects]
@@ -1,2 +1,292 @@
-from django.test import TestCase
+import json
+import pickle
+import tempfile
+from unittest import mock
 
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from driver.models import Driver
+from party.models import Party
+from utils.caching import check_shared_cache
+from utils.testing import APITestCase, shared_cache
+from vehicle.models import Vehicle, VehicleBrand
+from .auth import _user_key
+from . import search
+from .models import PersistedQuery, SearchEntry, SiteConfiguration
+from .persisted_queries import query_hash, register_persisted_query
+
+NESTED_EXPENSES = """
+query ($first: Int) {
+  vehicle {
+    allVehicles(first: $first) {
+      edges { node { expenses(first: $first) { edges { node { category { expenses(first: $first) {
+        edges { node { id } }
+      } } } } } } }
+    }
+  }
+}
+"""
+
+SITE_NAME = "query SiteName { core { siteConfig { siteName } } }"
+ME = "{ core { me { username } } }"
+UPDATE_SITE_NAME = "mutation ($name: String) { updateSiteConfiguration(siteName: $name) { siteConfig { siteName } } }"
+CREATE_DRIVER = 'mutation { createDriver(input: {name: "Ravi"}) { driver { id } } }'
+SEARCH = """
+query ($q: String!) {
+  search(q: $q) {
+    __typename
+    ... on VehicleType { name }
+    ... on DriverType { name }
+    ... on PartyType { name }
+  }
+}
+"""
+CREATE_VEHICLE = """
+mutation ($input: CreateVehicleInput!) { createVehicle(input: $input) { vehicle { id } } }
+"""
+UPDATE_VEHICLE = """
+mutation ($id: ID!, $input: UpdateVehicleInput!) { updateVehicle(id: $id, input: $input) { vehicle { id } } }
+"""
+UPDATE_DRIVER = """
+mutation ($id: ID!, $input: UpdateDriverInput!) { updateDriver(id: $id, input: $input) { driver { id } } }
+"""
+DELETE_DRIVER = "mutation ($id: ID!) { deleteDriver(id: $id) { found } }"
+DELETE_PARTY = "mutation ($id: ID!) { deleteParty(id: $id) { found } }"
+
+
+class QueryCostTests(APITestCase):
+    def cost(self, query, variables=None):
+        response = self.query(query, variables)
+        self.assertResponseNoErrors(response)
+        return response.json()["extensions"]["cost"]["cost"]
+
+    def test_over_budget_queries_are_rejected_before_execution(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.query(NESTED_EXPENSES, {"first": 100})
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertNotIn("data", body)
+        cost = body["extensions"]["cost"]["cost"]
+        self.assertGreater(cost, 50000)
+        self.assertEqual([error["message"] for error in body["errors"]], [
+            f"Query cost {cost} exceeds the maximum cost of 50000. "
+            "Request smaller pages with first/last or fewer nested lists."
+        ])
+        self.assertEqual(len(queries), 0)
+
+    def test_page_sizes_come_from_variables(self):
+        small, large = self.cost(NESTED_EXPENSES, {"first": 5}), self.cost(NESTED_EXPENSES, {"first": 20})
+        self.assertLess(small * 10, large)
+
+    def test_omitted_page_sizes_are_costed_at_the_connection_limit(self):
+        query = "query ($first: Int) { vehicle { allVehicles(first: $first) { edges { node { id } } } } }"
+        self.assertEqual(self.cost(query), self.cost(query, {"first": 100}))
+
+    def test_deep_queries_are_rejected(self):
+        query = """{ vehicle { allVehicles(first: 1) { edges { node { brand { vehicles { brand { vehicles {
+            brand { vehicles { brand { name } } } } } } } } } } } }"""
+        self.cost(query)
+        deeper = query.replace("brand { name }", "brand { vehicles { id } }")
+        self.assertIn("Query depth 13 exceeds the maximum depth of 12.", self.errors(deeper))
+
+
+class PersistedQueryTests(APITestCase):
+    def persisted(self, sha256_hash, query=None):
+        body = {"query": query, "extensions": {"persistedQuery": {"version": 1, "sha256Hash": sha256_hash}}}
+        return self.client.post(self.GRAPHQL_URL, json.dumps(body), content_type="application/json")
+
+    def error_codes(self, response):
+        return [error.get("extensions", {}).get("code") for error in response.json()["errors"]]
+
+    def test_unknown_hashes_ask_for_the_query(self):
+        response = self.persisted(query_hash(SITE_NAME))
+        self.assertEqual(self.error_codes(response), ["PERSISTED_QUERY_NOT_FOUND"])
+
+    def test_on_demand_registration_is_cached_but_not_stored(self):
+        sha256_hash = query_hash(SITE_NAME)
+        self.assertIn("data", self.persisted(sha256_hash, SITE_NAME).json())
+        response = self.persisted(sha256_hash)
+        self.assertEqual(response.json()["data"], {"core": {"siteConfig": {"siteName": "Site Name"}}})
+        self.assertFalse(PersistedQuery.objects.exists())
+
+    def test_hash_must_match_the_query(self):
+        response = self.persisted(query_hash(SITE_NAME + " "), SITE_NAME)
+        self.assertEqual(self.error_codes(response), ["INVALID_PERSISTED_QUERY_HASH"])
+
+    def test_hash_only_requests_work_over_get(self):
+        sha256_hash = register_persisted_query(SITE_NAME, "SiteName")
+        extensions = json.dumps({"persistedQuery": {"version": 1, "sha256Hash": sha256_hash}})
+        response = self.client.get(self.GRAPHQL_URL, {"extensions": extensions}, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.json()["data"], {"core": {"siteConfig": {"siteName": "Site Name"}}})
+
+    @override_settings(GRAPHQL_PERSISTED_QUERIES={"REGISTER_ON_DEMAND": False})
+    def test_on_demand_registration_can_be_turned_off(self):
+        response = self.persisted(query_hash(SITE_NAME), SITE_NAME)
+        self.assertEqual(self.error_codes(response), ["PERSISTED_QUERY_NOT_ALLOWED"])
+
+    @override_settings(GRAPHQL_PERSISTED_QUERIES={"ALLOWLIST_ONLY": True})
+    def test_allowlist_only_rejects_everything_else(self):
+        self.assertEqual(self.error_codes(self.query(SITE_NAME)), ["PERSISTED_QUERY_NOT_ALLOWED"])
+        self.assertEqual(
+            self.error_codes(self.persisted(query_hash(SITE_NAME), SITE_NAME)), ["PERSISTED_QUERY_NOT_ALLOWED"]
+        )
+        sha256_hash = register_persisted_query(SITE_NAME, "SiteName")
+        self.assertIn("data", self.persisted(sha256_hash).json())
+        self.assertIn("data", self.query(SITE_NAME).json())
+
+
+class CachedTokenUserTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.clerk = get_user_model().objects.create_user("clerk", password="password")
+        cls.add_driver = Permission.objects.get(codename="add_driver")
+
+    def queries_for(self, query, user):
+        with CaptureQueriesContext(connection) as queries:
+            self.query(query, user=user)
+        return len(queries)
+
+    def can_add_driver(self, user):
+        return "errors" not in self.query(CREATE_DRIVER, user=user).json()
+
+    def test_repeated_tokens_skip_the_user_lookup(self):
+        self.assertGreater(self.queries_for(ME, self.clerk), 0)
+        self.assertEqual(self.queries_for(ME, self.clerk), 0)
+        self.assertEqual(self.execute(ME, user=self.clerk), {"core": {"me": {"username": "clerk"}}})
+
+    def test_cached_entries_hold_no_password_hash(self):
+        self.query(ME, user=self.clerk)
+        entry = cache.get(_user_key(self.clerk.pk))
+        self.assertIsNotNone(entry)
+        self.assertNotIn(self.clerk.password.encode(), pickle.dumps(entry))
+
+    def test_permission_changes_reach_the_next_request(self):
+        self.assertFalse(self.can_add_driver(self.clerk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clerk.user_permissions.add(self.add_driver)
+        self.assertTrue(self.can_add_driver(self.clerk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_driver.user_set.remove(self.clerk)
+        self.assertFalse(self.can_add_driver(self.clerk))
+
+    def test_group_changes_reach_the_next_request(self):
+        drivers = Group.objects.create(name="Drivers desk")
+        with self.captureOnCommitCallbacks(execute=True):
+            drivers.user_set.add(self.clerk)
+        self.assertFalse(self.can_add_driver(self.clerk))
+        with self.captureOnCommitCallbacks(execute=True):
+            drivers.permissions.add(self.add_driver)
+        self.assertTrue(self.can_add_driver(self.clerk))
+        with self.captureOnCommitCallbacks(execute=True):
+            drivers.delete()
+        self.assertFalse(self.can_add_driver(self.clerk))
+
+    def test_changes_only_drop_the_users_they_touch(self):
+        self.query(ME, user=self.admin)
+        self.query(ME, user=self.clerk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clerk.user_permissions.add(self.add_driver)
+        self.assertEqual(self.queries_for(ME, self.admin), 0)
+        self.assertGreater(self.queries_for(ME, self.clerk), 0)
+
+    def test_deactivated_users_are_refused(self):
+        self.query(ME, user=self.clerk)
+        self.clerk.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clerk.save()
+        self.assertEqual(self.errors(ME, user=self.clerk), ["User is disabled"])
+
+
+class UnifiedSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.brand = VehicleBrand.objects.create(name="Tata")
+        cls.truck = Vehicle.objects.create(brand=cls.brand, name="Ultra", year=2021, registration_number="TN 01 AB 1234")
+        cls.driver = Driver.objects.create(name="Ravi Kumar", phone="9000000001")
+        cls.party = Party.objects.create(name="Kumar Traders", phone="9000000002")
+
+    def search(self, q):
+        return [(result["__typename"], result["name"]) for result in self.execute(SEARCH, {"q": q})["search"]]
+
+    def test_results_span_every_kind_best_match_first(self):
+        self.assertEqual(self.search("kumar"), [("DriverType", "Ravi Kumar"), ("PartyType", "Kumar Traders")])
+        self.assertEqual(self.search("tn01ab"), [("VehicleType", "Ultra")])
+        self.assertEqual(self.search("1234"), [("VehicleType", "Ultra")])
+        self.assertEqual(self.search("9000000002"), [("PartyType", "Kumar Traders")])
+        self.assertEqual(self.search(" - "), [])
+
+    def test_creates_and_updates_are_indexed(self):
+        self.execute(CREATE_VEHICLE, {"input": {
+            "brand": self.brand.pk, "name": "Winger", "year": 2022, "registrationNumber": "KA 05 MN 4321",
+        }})
+        self.assertEqual(self.search("ka05"), [("VehicleType", "Winger")])
+        self.execute(UPDATE_VEHICLE, {"id": self.truck.pk, "input": {"registrationNumber": "TN 09 ZZ 9999"}})
+        self.assertEqual(self.search("tn01ab"), [])
+        self.assertEqual(self.search("tn09zz"), [("VehicleType", "Ultra")])
+        self.execute(UPDATE_DRIVER, {"id": self.driver.pk, "input": {"name": "Ravi Selvam"}})
+        self.assertEqual(self.search("kumar"), [("PartyType", "Kumar Traders")])
+        self.assertEqual(self.search("selvam"), [("DriverType", "Ravi Selvam")])
+
+    def index(self):
+        return sorted(SearchEntry.objects.values_list("kind", "object_id", "field", "term", "weight"))
+
+    def test_rebuild_matches_the_maintained_index(self):
+        maintained = self.index()
+        self.assertEqual(search.rebuild(batch_size=2), len(maintained))
+        self.assertEqual(self.index(), maintained)
+
+    def test_failed_rebuilds_keep_the_old_index(self):
+        maintained = self.index()
+        with mock.patch.object(search, "entries", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                search.rebuild()
+        self.assertEqual(self.index(), maintained)
+
+    def test_deletes_are_dropped_from_the_index(self):
+        self.execute(DELETE_DRIVER, {"id": self.driver.pk})
+        self.execute(DELETE_PARTY, {"id": self.party.pk})
+        self.assertEqual(self.search("kumar"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.truck.delete()
+        self.assertEqual(self.search("ultra"), [])
+        self.assertFalse(SearchEntry.objects.exists())
+
+
+class SiteConfigurationCacheTests(APITestCase):
+    def saved_elsewhere(self, site_name):
+        """What another worker's save leaves behind: a new row and, in a shared cache, a new version."""
+        SiteConfiguration.objects.update(site_name=site_name)
+        cache.set(SiteConfiguration._version_key(), site_name, None)
+
+    def test_local_caches_read_the_row_every_time(self):
+        SiteConfiguration.load()
+        SiteConfiguration.objects.update(site_name="Elsewhere")
+        self.assertEqual(SiteConfiguration.load().site_name, "Elsewhere")
+
+    @override_settings(DEBUG=False)
+    def test_local_caches_are_reported(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ["core.W001"])
+        with shared_cache(self.enterContext(tempfile.TemporaryDirectory())):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_shared_caches_keep_a_copy_until_the_version_changes(self):
+        self.enterContext(shared_cache(self.enterContext(tempfile.TemporaryDirectory())))
+        SiteConfiguration.load()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(SiteConfiguration.load().site_name, "Site Name")
+        self.assertEqual(len(queries), 0)
+        self.saved_elsewhere("Elsewhere")
+        self.assertEqual(SiteConfiguration.load().site_name, "Elsewhere")
+
+    def test_saves_reach_the_next_load(self):
+        self.enterContext(shared_cache(self.enterContext(tempfile.TemporaryDirectory())))
+        SiteConfiguration.load()
+        self.execute(UPDATE_SITE_NAME, {"name": "Fleet Desk"})
+        self.assertEqual(SiteConfiguration.load().site_name, "Fleet Desk")
@@ -0,0 +1,19 @@
+from graphql import GraphQLError
+
+from ..models import Driver
+from utils.optimizer import optimize
+from .query import DriverQuery
+
+
+# DriverQuery for the async schema, on Django's async ORM.
+class AsyncDriverQuery(DriverQuery):
+    class Meta:
+        name = "DriverQuery"
+
+    async def resolve_driver(self, info, id):
+        try:
+            return await optimize(Driver.objects.all(), info).aget(pk=id)
+        except Driver.DoesNotExist:
+            raise GraphQLError(f"Driver with id {id} not found.")
+        except Exception as e:
+            raise GraphQLError(f"Error fetching driver: {str(e)}")
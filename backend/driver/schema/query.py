@@ -2,19 +2,25 @@ import graphene
 from graphene_django import DjangoObjectType
 from graphql import GraphQLError
 from ..models import Driver
+from utils.optimizer import optimize
+from utils.pagination import CountableConnection, KeysetConnectionField
+from utils.response_cache import cacheable
 
 
 class DriverType(DjangoObjectType):
     class Meta:
         model = Driver
         fields = "__all__"
+        filter_fields = {"name": ["icontains", "istartswith"], "phone": ["exact", "istartswith"]}
+        use_connection = True
+        connection_class = CountableConnection
 
 
 class DriverQuery(graphene.ObjectType):
-    all_drivers = graphene.List(DriverType)
+    all_drivers = KeysetConnectionField(DriverType)
     driver = graphene.Field(DriverType, id=graphene.Int(required=True))
 
-    def resolve_all_drivers(self, info):
+    def resolve_all_drivers(self, info, **kwargs):
         try:
             return Driver.objects.all()
         except Exception as e:
@@ -22,8 +28,12 @@ class DriverQuery(graphene.ObjectType):
 
     def resolve_driver(self, info, id):
         try:
-            return Driver.objects.get(pk=id)
+            return optimize(Driver.objects.all(), info).get(pk=id)
         except Driver.DoesNotExist:
             raise GraphQLError(f"Driver with id {id} not found.")
         except Exception as e:
-            raise GraphQLError(f"Error fetching driver: {str(e)}")
\ No newline at end of file
+            raise GraphQLError(f"Error fetching driver: {str(e)}")
+
+
+cacheable(DriverQuery, "all_drivers")
+cacheable(DriverQuery, "driver")
@@ -1,3 +1,81 @@
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from party.models import Party
+from utils.response_cache import check_cache_backend
+from utils.testing import APITestCase
+from .models import Driver
+
+ALL_DRIVERS = "{ driver { allDrivers(first: 10) { edges { node { name phone } } } } }"
+CREATE_DRIVER = """
+mutation ($name: String!) { createDriver(input: {name: $name, phone: "9000000000"}) { driver { id } } }
+"""
+
+RESPONSE_CACHE = {**settings.GRAPHQL_RESPONSE_CACHE, "ENABLED": True}
+
+
+@override_settings(GRAPHQL_RESPONSE_CACHE=RESPONSE_CACHE)
+class ResponseCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Driver.objects.create(name="Ravi", phone="9000000001")
+
+    def fetch(self, **kwargs):
+        response = self.query(ALL_DRIVERS, **kwargs)
+        self.assertResponseNoErrors(response)
+        body = response.json()
+        names = [edge["node"]["name"] for edge in body["data"]["driver"]["allDrivers"]["edges"]]
+        return names, body["extensions"].get("responseCache")
+
+    def test_repeated_queries_are_served_from_the_cache(self):
+        self.assertEqual(self.fetch(), (["Ravi"], "MISS"))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.fetch(), (["Ravi"], "HIT"))
+        self.assertEqual(len(queries), 0)
+
+    def test_saves_and_deletes_invalidate_dependent_responses(self):
+        self.fetch()
+        self.execute(CREATE_DRIVER, {"name": "Arun"})
+        self.assertEqual(self.fetch(), (["Ravi", "Arun"], "MISS"))
+        Driver.objects.get(name="Ravi").delete()
+        self.assertEqual(self.fetch(), (["Ravi", "Arun"], "HIT"), "Invalidation waits for the commit.")
+        with self.captureOnCommitCallbacks(execute=True):
+            Driver.objects.get(name="Arun").delete()
+        self.assertEqual(self.fetch(), ([], "MISS"))
+
+    def test_unrelated_saves_keep_the_response(self):
+        self.fetch()
+        with self.captureOnCommitCallbacks(execute=True):
+            Party.objects.create(name="Kumar Traders", phone="9000000002")
+        self.assertEqual(self.fetch(), (["Ravi"], "HIT"))
+
+    def test_users_with_other_permissions_get_their_own_entry(self):
+        self.fetch()
+        clerk = get_user_model().objects.create_user("clerk", password="password")
+        self.assertEqual(self.fetch(user=clerk), (["Ravi"], "MISS"))
+        self.assertEqual(self.fetch(user=clerk), (["Ravi"], "HIT"))
+
+    def test_anonymous_callers_share_their_own_entry(self):
+        self.fetch()
+        self.assertEqual(self.fetch(user=None), (["Ravi"], "MISS"))
+        self.assertEqual(self.fetch(user=None), (["Ravi"], "HIT"))
+
+    def test_invalid_token_traced_and_mutation_requests_bypass_the_cache(self):
+        response = self.query(ALL_DRIVERS, user=None, headers={"Authorization": "JWT not-a-token"})
+        self.assertNotIn("responseCache", response.json().get("extensions", {}))
+        self.assertEqual(self.fetch(headers={"X-GraphQL-Trace": "1"})[1], None)
+        response = self.query(CREATE_DRIVER, {"name": "Arun"})
+        self.assertNotIn("responseCache", response.json()["extensions"])
+
+    def test_the_cache_is_off_by_default(self):
+        with override_settings(GRAPHQL_RESPONSE_CACHE={}):
+            self.assertEqual(self.fetch(), (["Ravi"], None))
+            self.assertEqual(self.fetch(), (["Ravi"], None))
+
+    @override_settings(DEBUG=False)
+    def test_process_local_caches_are_reported(self):
+        self.assertEqual([warning.id for warning in check_cache_backend(None)], ["core.W002"])
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+SEARCH_COLUMNS = ("name", "phone", "gst_number")
+
+
+def create_search_indexes(apps, schema_editor):
+    # Trigram GIN indexes serve both fuzzy name matches and LIKE/ILIKE
+    # searches. Other databases use the in-process index in party/search.py.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS party_party_{column}_trgm "
+            f"ON party_party USING gin ({column} gin_trgm_ops)"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS party_party_{column}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('party', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,18 @@
+from graphql import GraphQLError
+
+from party.models import Party
+from utils.optimizer import optimize
+from .query import PartyQuery
+
+
+# PartyQuery for the async schema. ``parties`` stays synchronous: its filter
+# connection evaluates QuerySets, so it runs in a worker thread.
+class AsyncPartyQuery(PartyQuery):
+    class Meta:
+        name = "PartyQuery"
+
+    async def resolve_party(self, info, id):
+        try:
+            return await optimize(Party.objects.all(), info).aget(pk=id)
+        except Party.DoesNotExist:
+            raise GraphQLError("Party not found")
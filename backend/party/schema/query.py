@@ -2,8 +2,10 @@ import graphene
 from graphene_django import DjangoObjectType
 from graphql import GraphQLError
 from party.models import Party
+from party.search import MAX_RESULTS, search_parties
 from graphene.relay import Node
-from graphene_django.filter import DjangoFilterConnectionField
+from utils.optimizer import OptimizingConnectionField, optimize
+from utils.response_cache import cacheable
 
 class PartyType(DjangoObjectType):
     class Meta:
@@ -19,13 +21,27 @@ class PartyType(DjangoObjectType):
 
 class PartyQuery(graphene.ObjectType):
 
-    parties = DjangoFilterConnectionField(PartyType)
+    parties = OptimizingConnectionField(PartyType)
     def resolve_parties(self, info, **kwargs):
         return Party.objects.all()
 
+    search_parties = graphene.List(
+        graphene.NonNull(PartyType),
+        required=True,
+        q=graphene.String(required=True),
+        first=graphene.Int(default_value=20, description=f"At most {MAX_RESULTS}."),
+    )
+    def resolve_search_parties(self, info, q, first):
+        return search_parties(q, first)
+
     party = graphene.Field(PartyType, id=graphene.ID(required=True))
     def resolve_party(self, info, id):
         try:
-            return Party.objects.get(pk=id)
+            return optimize(Party.objects.all(), info).get(pk=id)
         except Party.DoesNotExist:
-            raise GraphQLError("Party not found")
\ No newline at end of file
+            raise GraphQLError("Party not found")
+
+
+cacheable(PartyQuery, "parties")
+cacheable(PartyQuery, "party")
+cacheable(PartyQuery, "search_parties")
@@ -0,0 +1,234 @@
+import heapq
+import re
+import threading
+import uuid
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.contrib.postgres.search import TrigramSimilarity, TrigramWordSimilarity
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from utils.caching import is_shared_cache
+from .models import Party
+
+MAX_RESULTS = 100
+# Same defaults as pg_trgm's similarity_threshold and word_similarity_threshold.
+SIMILARITY_THRESHOLD = 0.3
+WORD_SIMILARITY_THRESHOLD = 0.6
+# Added to the trigram score, so exact prefixes rank above fuzzy matches.
+NAME_PREFIX_BOOST = 0.5
+NUMBER_PREFIX_BOOST = 1.0
+
+VERSION_KEY = "party-search:version"
+SEQUENCE_KEY = "party-search:sequence"
+CHANGE_KEY = "party-search:change:{}"
+# Saves and deletes a process replays into its index; further behind, it rebuilds.
+MAX_REPLAYED_CHANGES = 500
+CHANGE_TIMEOUT = 24 * 60 * 60
+_WORD = re.compile(r"[^\W_]+")
+
+
+def trigrams(text):
+    """The trigrams pg_trgm extracts from ``text``: per lowercased word, padded."""
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def search_parties(q, first=20):
+    """
+    Parties matching ``q`` by name (fuzzy, via trigrams), phone or GST number
+    prefix, best match first. Uses pg_trgm's GIN indexes on PostgreSQL and an
+    in-process trigram index elsewhere.
+    """
+    q = q.strip()
+    first = max(0, min(first, MAX_RESULTS))
+    if not q or not first:
+        return []
+    if connection.vendor == "postgresql":
+        return _search_postgresql(q, first)
+    return party_index.search(q, first)
+
+
+def _search_postgresql(q, first):
+    boost = Case(
+        When(Q(phone__startswith=q) | Q(gst_number__istartswith=q), then=Value(NUMBER_PREFIX_BOOST)),
+        When(name__istartswith=q, then=Value(NAME_PREFIX_BOOST)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return list(
+        Party.objects.annotate(
+            rank=Greatest(TrigramSimilarity("name", q), TrigramWordSimilarity(q, "name")) + boost
+        )
+        .filter(
+            Q(name__trigram_word_similar=q)
+            | Q(name__icontains=q)
+            | Q(phone__startswith=q)
+            | Q(gst_number__istartswith=q)
+        )
+        .order_by("-rank", "name", "pk")[:first]
+    )
+
+
+def _numbers(pk, phone, gst_number):
+    return [(phone, pk), (gst_number.lower(), pk)] if gst_number else [(phone, pk)]
+
+
+class PartyIndex:
+    """
+    Process-local trigram index over party names, plus sorted phone and GST
+    numbers for prefix lookups. Party saves and deletes are numbered in
+    Django's cache and replayed into the index one party at a time; it is
+    only rebuilt when the version key changes (after bulk writes) or when it
+    has fallen too far behind. Other workers' changes can only be seen through
+    a shared cache, so with a process-local one it is rebuilt on every search.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self.sequence = 0
+        self.names = {}
+        self.gram_counts = {}
+        self.postings = {}
+        self.numbers = []
+        self.numbers_of = {}
+
+    def build(self, version, sequence):
+        names, gram_counts, numbers, numbers_of = {}, {}, [], {}
+        postings = defaultdict(lambda: array("q"))
+        rows = Party.objects.values_list("pk", "name", "phone", "gst_number")
+        for pk, name, phone, gst_number in rows.iterator(chunk_size=5000):
+            names[pk] = name
+            grams = trigrams(name)
+            gram_counts[pk] = len(grams)
+            for gram in grams:
+                postings[gram].append(pk)
+            numbers_of[pk] = _numbers(pk, phone, gst_number)
+            numbers.extend(numbers_of[pk])
+        numbers.sort()
+        self.names, self.gram_counts, self.postings = names, gram_counts, dict(postings)
+        self.numbers, self.numbers_of = numbers, numbers_of
+        self.version, self.sequence = version, sequence
+
+    def add(self, pk, name, phone, gst_number):
+        grams = trigrams(name)
+        self.names[pk] = name
+        self.gram_counts[pk] = len(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, array("q")).append(pk)
+        self.numbers_of[pk] = _numbers(pk, phone, gst_number)
+        for entry in self.numbers_of[pk]:
+            insort(self.numbers, entry)
+
+    def remove(self, pk):
+        name = self.names.pop(pk, None)
+        if name is None:
+            return
+        del self.gram_counts[pk]
+        for gram in trigrams(name):
+            self.postings[gram].remove(pk)
+        for entry in self.numbers_of.pop(pk):
+            del self.numbers[bisect_left(self.numbers, entry)]
+
+    def replay(self, sequence):
+        """
+        Re-read the parties changed since self.sequence. Returns False when
+        a change has already expired from the cache.
+        """
+        keys = [CHANGE_KEY.format(number) for number in range(self.sequence + 1, sequence + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return False
+        pks = set(changes.values())
+        rows = list(Party.objects.filter(pk__in=pks).values_list("pk", "name", "phone", "gst_number"))
+        for pk in pks:
+            self.remove(pk)
+        for row in rows:
+            self.add(*row)
+        self.sequence = sequence
+        return True
+
+    def refresh(self):
+        """Bring the index up to date; called with the lock held."""
+        if not is_shared_cache():
+            self.build(None, 0)
+            return
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(VERSION_KEY)
+        sequence = cache.get(SEQUENCE_KEY) or 0
+        if version != self.version:
+            self.build(version, sequence)
+        elif sequence != self.sequence:
+            behind = sequence - self.sequence
+            if not 0 < behind <= MAX_REPLAYED_CHANGES or not self.replay(sequence):
+                self.build(version, sequence)
+
+    def scores(self, q):
+        query_grams = trigrams(q)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.postings.get(gram, ()))
+
+        # Neither threshold can be met with fewer shared trigrams than this.
+        minimum = max(1, int(SIMILARITY_THRESHOLD * len(query_grams)))
+        scores = {}
+        lowered = q.lower()
+        for pk, count in shared.items():
+            if count < minimum:
+                continue
+            similarity = count / (len(query_grams) + self.gram_counts[pk] - count)
+            word_similarity = count / len(query_grams)
+            name = self.names[pk].lower()
+            if similarity >= SIMILARITY_THRESHOLD or word_similarity >= WORD_SIMILARITY_THRESHOLD or lowered in name:
+                score = max(similarity, word_similarity)
+                scores[pk] = score + (NAME_PREFIX_BOOST if name.startswith(lowered) else 0.0)
+
+        start = bisect_left(self.numbers, (lowered,))
+        for number, pk in self.numbers[start:]:
+            if not number.startswith(lowered):
+                break
+            scores[pk] = max(scores.get(pk, 0.0), 1.0) + NUMBER_PREFIX_BOOST
+        return scores
+
+    def search(self, q, first):
+        # Replayed changes update the index in place, so readers hold the lock too.
+        with self._lock:
+            self.refresh()
+            scores = self.scores(q)
+            best = heapq.nsmallest(first, scores, key=lambda pk: (-scores[pk], self.names[pk], pk))
+        parties = Party.objects.in_bulk(best)
+        return [parties[pk] for pk in best if pk in parties]
+
+
+party_index = PartyIndex()
+
+
+def invalidate_index():
+    """Rebuild every process's index, e.g. after bulk_create or a bulk update."""
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None))
+
+
+def _publish_change(pk):
+    cache.add(SEQUENCE_KEY, 0, None)
+    try:
+        sequence = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        # The counter was evicted in between; fall back to a rebuild.
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+        return
+    cache.set(CHANGE_KEY.format(sequence), pk, CHANGE_TIMEOUT)
+
+
+def record_change(pk):
+    """Have every process re-read one saved or deleted party."""
+    transaction.on_commit(lambda: _publish_change(pk))
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Party
+from .search import record_change
+
+
+@receiver(post_save, sender=Party)
+@receiver(post_delete, sender=Party)
+def party_changed(sender, instance, **kwargs):
+    record_change(instance.pk)
@@ -1,3 +1,89 @@
-from django.test import TestCase
+import tempfile
 
-# Create your tests here.
+from django.core.cache import cache
+
+from utils.testing import APITestCase, shared_cache
+from .models import Party
+from .search import CHANGE_KEY, SEQUENCE_KEY, PartyIndex, party_index, record_change, search_parties
+
+SEARCH_PARTIES = "query ($q: String!) { party { searchParties(q: $q) { name } } }"
+UPDATE_PARTY = """
+mutation ($id: ID!, $name: String!, $phone: String!) {
+  updateParty(id: $id, input: {name: $name, phone: $phone}) { party { id } }
+}
+"""
+DELETE_PARTY = "mutation ($id: ID!) { deleteParty(id: $id) { found } }"
+
+
+class PartySearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.kumar = Party.objects.create(name="Kumar Traders", phone="9000000001", gst_number="33AAAAA0000A1Z5")
+        Party.objects.create(name="Lakshmi Transports", phone="9000000002")
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(shared_cache(self.enterContext(tempfile.TemporaryDirectory())))
+
+    def search(self, q):
+        return [party["name"] for party in self.execute(SEARCH_PARTIES, {"q": q})["party"]["searchParties"]]
+
+    def create_party(self, name, phone):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Party.objects.create(name=name, phone=phone)
+
+    def assertIndexIsFresh(self):
+        fresh = PartyIndex()
+        fresh.build(party_index.version, party_index.sequence)
+        self.assertEqual(party_index.names, fresh.names)
+        self.assertEqual(party_index.gram_counts, fresh.gram_counts)
+        self.assertEqual(party_index.numbers, fresh.numbers)
+        self.assertEqual(
+            {gram: sorted(pks) for gram, pks in party_index.postings.items() if pks},
+            {gram: sorted(pks) for gram, pks in fresh.postings.items()},
+        )
+
+    def test_names_match_fuzzily_and_numbers_by_prefix(self):
+        self.assertEqual(self.search("kumr traders"), ["Kumar Traders"])
+        self.assertEqual(self.search("90000000"), ["Kumar Traders", "Lakshmi Transports"])
+        self.assertEqual(self.search("33aaa"), ["Kumar Traders"])
+        self.assertEqual(self.search("  "), [])
+
+    def test_saves_and_deletes_are_replayed_into_the_index(self):
+        self.search("kumar")
+        version = party_index.version
+        self.create_party("Kumaran Logistics", "9100000000")
+        self.assertEqual(self.search("kumar"), ["Kumar Traders", "Kumaran Logistics"])
+        self.execute(UPDATE_PARTY, {"id": self.kumar.pk, "name": "Selvam Traders", "phone": "9000000001"})
+        self.assertEqual(self.search("kumar"), ["Kumaran Logistics"])
+        self.assertEqual(self.search("selvam"), ["Selvam Traders"])
+        self.execute(DELETE_PARTY, {"id": self.kumar.pk})
+        self.assertEqual(self.search("selvam"), [])
+        self.assertEqual(party_index.version, version, "Single-party changes should not rebuild the index.")
+        self.assertIndexIsFresh()
+
+    def test_expired_changes_rebuild_the_index(self):
+        self.search("kumar")
+        self.create_party("Kumaran Logistics", "9100000000")
+        cache.delete(CHANGE_KEY.format(cache.get(SEQUENCE_KEY)))
+        self.assertEqual(self.search("logistics"), ["Kumaran Logistics"])
+        self.assertIndexIsFresh()
+
+    def test_changes_made_by_other_workers_reach_the_index(self):
+        self.search("kumar")
+        # Another worker's save: the row and the shared cache change, this process's index does not.
+        Party.objects.filter(pk=self.kumar.pk).update(name="Selvam Traders")
+        with self.captureOnCommitCallbacks(execute=True):
+            record_change(self.kumar.pk)
+        self.assertEqual(self.search("selvam"), ["Selvam Traders"])
+
+
+class LocalCachePartySearchTests(APITestCase):
+    def test_process_local_caches_rebuild_on_every_search(self):
+        party = Party.objects.create(name="Kumar Traders", phone="9000000001")
+        self.assertEqual(search_parties("kumar"), [party])
+        # Another worker's change, which this process's cache never hears about.
+        Party.objects.filter(pk=party.pk).update(name="Selvam Traders")
+        self.assertEqual(search_parties("kumar"), [])
+        self.assertEqual([found.name for found in search_parties("selvam")], ["Selvam Traders"])
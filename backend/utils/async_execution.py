@@ -0,0 +1,48 @@
+import inspect
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from graphene.types.resolver import get_default_resolver
+from graphql import get_named_type, is_leaf_type
+
+
+def _runs_on_event_loop(info):
+    field = info.parent_type.fields.get(info.field_name)
+    if field is None or field.resolve is None:
+        # Introspection and other fields without a resolver only read data.
+        return True
+    resolve = field.resolve
+    if inspect.iscoroutinefunction(resolve):
+        return True
+    is_default = isinstance(resolve, partial) and resolve.func is get_default_resolver()
+    return is_default and is_leaf_type(get_named_type(info.return_type))
+
+
+class SyncResolverMiddleware:
+    """
+    Lets the schema execute on an event loop. Coroutine resolvers run there
+    directly. Every other resolver, which may touch the database, is moved to a
+    worker thread with sync_to_async. Scalar fields with the default resolver
+    are the exception, since they only read an attribute.
+
+    Must be the last (outermost) middleware, so the rest of the middleware
+    chain runs in the worker thread along with the resolver.
+    """
+
+    def resolve(self, next, root, info, **kwargs):
+        if _runs_on_event_loop(info):
+            return next(root, info, **kwargs)
+        return sync_to_async(next)(root, info, **kwargs)
+
+
+def push_execute_wrapper(wrapper):
+    """
+    Install ``wrapper`` on the current thread's connection. Call it through
+    sync_to_async so it lands on the thread the request's queries use.
+    """
+    connection.execute_wrappers.append(wrapper)
+
+
+def pop_execute_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
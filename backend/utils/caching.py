@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS
+
+# Backends whose entries no other process can see.
+LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def is_shared_cache(alias=DEFAULT_CACHE_ALIAS):
+    """
+    True unless ``alias`` is process-local. Process-level copies that are
+    revalidated through Django's cache are only kept when it is shared, since
+    a version bumped in one worker's LocMemCache never reaches the others.
+    """
+    return settings.CACHES[alias]["BACKEND"] not in LOCAL_BACKENDS
+
+
+def check_shared_cache(app_configs, **kwargs):
+    if settings.DEBUG or is_shared_cache():
+        return []
+    return [
+        checks.Warning(
+            "The default cache is local to each process, so the site configuration is read from the "
+            "database on every load, and the party search index (outside PostgreSQL) is rebuilt on "
+            "every search, instead of keeping per-process copies.",
+            hint="Set CACHE_BACKEND to a shared backend (Redis, Memcached, database or file) when "
+            "running more than one worker.",
+            id="core.W001",
+        )
+    ]
@@ -0,0 +1,185 @@
+from django.conf import settings
+from graphene.relay import Connection
+from graphene.utils.str_converters import to_camel_case
+from graphene_django import DjangoObjectType
+from graphene_django.settings import graphene_settings
+from graphql import GraphQLError, Undefined, get_named_type, get_nullable_type, is_list_type
+from graphql.language import (
+    FieldNode,
+    FragmentSpreadNode,
+    InlineFragmentNode,
+    IntValueNode,
+    VariableNode,
+)
+from graphql.utilities import get_operation_ast
+
+DEFAULT_LIMITS = {
+    # Deepest field nesting allowed; root fields are at depth 1.
+    "MAX_DEPTH": 12,
+    # Maximum number of field resolutions the query may expand to. Every
+    # operation in core/benchmark.py stays well under it.
+    "MAX_COST": 50000,
+    # Assumed length of list fields that take no first/last argument.
+    "DEFAULT_LIST_SIZE": 100,
+    # Assumed length of unpaged lists of related rows on a Django type. Lists
+    # that can be long take first, like a brand's vehicles, and are costed by it.
+    "RELATED_LIST_SIZE": 20,
+}
+
+# (GraphQL type name, field name) -> most items the list field can return.
+_list_sizes = {}
+
+
+def get_limits():
+    return {**DEFAULT_LIMITS, **getattr(settings, "GRAPHQL_QUERY_LIMITS", {})}
+
+
+def bounded_list(object_type, field_name, size):
+    """
+    Tell the cost analysis that ``object_type.field_name``, a list field
+    without first/last, never returns more than ``size`` items.
+    """
+    _list_sizes[(object_type._meta.name, to_camel_case(field_name))] = size
+
+
+class QueryCost:
+    def __init__(self, depth=0, cost=0):
+        self.depth = depth
+        self.cost = cost
+
+    def as_dict(self, limits=None):
+        limits = limits or get_limits()
+        return {
+            "depth": self.depth,
+            "cost": self.cost,
+            "maxDepth": limits["MAX_DEPTH"],
+            "maxCost": limits["MAX_COST"],
+        }
+
+
+def _is_graphene_type(graphql_type, base):
+    graphene_type = getattr(get_named_type(graphql_type), "graphene_type", None)
+    return isinstance(graphene_type, type) and issubclass(graphene_type, base)
+
+
+def _is_connection(graphql_type):
+    return _is_graphene_type(graphql_type, Connection)
+
+
+def _page_size(field_node, field, variables):
+    """The field's first/last argument as written, or else its schema default."""
+    arguments = {argument.name.value: argument.value for argument in field_node.arguments or ()}
+    for name in ("first", "last"):
+        value = arguments.get(name)
+        if isinstance(value, IntValueNode):
+            return int(value.value)
+        if isinstance(value, VariableNode):
+            try:
+                return int((variables or {})[value.name.value])
+            except (KeyError, TypeError, ValueError):
+                pass
+        default = field.args[name].default_value if name in field.args else Undefined
+        if isinstance(default, int):
+            return default
+    return None
+
+
+def calculate_cost(schema, document, operation_name=None, variables=None, default_list_size=None):
+    """
+    Static cost of the operation: its maximum field depth and the number of
+    field resolutions it can expand to. Every field costs one per parent row,
+    and list or connection fields multiply the cost of their children by the
+    requested ``first``/``last`` (or by the argument's default, the
+    connection max limit, or the default list size when the client does not
+    say). Unpaged lists of related rows on a Django type count as
+    RELATED_LIST_SIZE items.
+    """
+    limits = get_limits()
+    default_list_size = default_list_size or limits["DEFAULT_LIST_SIZE"]
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return QueryCost()
+    root_type = schema.get_root_type(operation.operation)
+    if root_type is None:
+        return QueryCost()
+
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if definition.kind == "fragment_definition"
+    }
+
+    def walk(parent_type, selection_set, depth, multiplier, seen):
+        max_depth, cost = depth - 1, 0
+        fields = getattr(parent_type, "fields", {})
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                name = selection.name.value
+                field = fields.get(name)
+                if name.startswith("__") or field is None:
+                    continue
+                cost += multiplier
+                max_depth = max(max_depth, depth)
+                if not selection.selection_set:
+                    continue
+
+                size = _page_size(selection, field, variables)
+                if _is_connection(field.type):
+                    size = size if size is not None else graphene_settings.RELAY_CONNECTION_MAX_LIMIT or default_list_size
+                elif is_list_type(get_nullable_type(field.type)) and not _is_connection(parent_type):
+                    if size is None:
+                        size = _list_sizes.get((parent_type.name, name))
+                    if size is None and _is_graphene_type(parent_type, DjangoObjectType) and _is_graphene_type(
+                        field.type, DjangoObjectType
+                    ):
+                        size = limits["RELATED_LIST_SIZE"]
+                    if size is None:
+                        size = default_list_size
+                else:
+                    size = 1
+
+                child_depth, child_cost = walk(
+                    get_named_type(field.type), selection.selection_set, depth + 1, multiplier * size, seen
+                )
+                max_depth = max(max_depth, child_depth)
+                cost += child_cost
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = schema.get_type(selection.type_condition.name.value) or parent_type
+                child_depth, child_cost = walk(fragment_type, selection.selection_set, depth, multiplier, seen)
+                max_depth, cost = max(max_depth, child_depth), cost + child_cost
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = fragments.get(selection.name.value)
+                if fragment is None or fragment.name.value in seen:
+                    continue
+                fragment_type = schema.get_type(fragment.type_condition.name.value) or parent_type
+                child_depth, child_cost = walk(
+                    fragment_type, fragment.selection_set, depth, multiplier, seen | {fragment.name.value}
+                )
+                max_depth, cost = max(max_depth, child_depth), cost + child_cost
+        return max_depth, cost
+
+    depth, cost = walk(root_type, operation.selection_set, 1, 1, frozenset())
+    return QueryCost(depth=depth, cost=cost)
+
+
+def check_query_cost(schema, document, operation_name=None, variables=None):
+    """
+    Compute the operation's cost and return it with the errors for any
+    configured GRAPHQL_QUERY_LIMITS it exceeds. Runs after validation,
+    because page sizes are usually passed as variables.
+    """
+    limits = get_limits()
+    cost = calculate_cost(schema, document, operation_name, variables, limits["DEFAULT_LIST_SIZE"])
+    errors = []
+    if cost.depth > limits["MAX_DEPTH"]:
+        errors.append(GraphQLError(
+            f"Query depth {cost.depth} exceeds the maximum depth of {limits['MAX_DEPTH']}."
+        ))
+    if cost.cost > limits["MAX_COST"]:
+        errors.append(GraphQLError(
+            f"Query cost {cost.cost} exceeds the maximum cost of {limits['MAX_COST']}. "
+            "Request smaller pages with first/last or fewer nested lists."
+        ))
+    return cost, errors
@@ -0,0 +1,207 @@
+import inspect
+from collections import defaultdict
+
+from django.db.models import Count, Model, QuerySet
+from graphene.relay import Connection
+from graphql import get_nullable_type, is_list_type
+
+_loader_classes = defaultdict(list)
+
+
+class DataLoader:
+    """
+    Batches lookups of related rows for the duration of one GraphQL request.
+
+    Every instance of ``source`` the request returns primes its ``key`` into
+    the registry, so the first ``load()`` at a nesting level fetches the keys
+    of all sibling rows with a single query and later loads hit the cache.
+    """
+
+    source = None
+    key = "pk"
+    many = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.source is not None:
+            _loader_classes[cls.source].append(cls)
+
+    def __init__(self, registry, filter_queryset=None):
+        self.registry = registry
+        self.filter_queryset = filter_queryset
+        self._cache = {}
+
+    def batch_load(self, keys):
+        """
+        Return a mapping of key -> value (or key -> list when ``many``).
+        """
+        raise NotImplementedError
+
+    def filter(self, queryset):
+        if self.filter_queryset is None:
+            return queryset
+        return self.filter_queryset(queryset)
+
+    def empty(self):
+        return [] if self.many else None
+
+    def load(self, key):
+        if key is None:
+            return self.empty()
+        if key not in self._cache:
+            keys = {k for k in self.registry.primed(type(self)) if k not in self._cache}
+            keys.add(key)
+            results = self.batch_load(keys)
+            for k in keys:
+                self._cache[k] = results.get(k, self.empty())
+            self.registry.prime(_flatten(results.values(), self.many))
+        return self._cache[key]
+
+    def load_for(self, instance):
+        return self.load(getattr(instance, self.key))
+
+
+class DataLoaderRegistry:
+    """
+    Per-request container of loaders and primed keys, stored on ``info.context``.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._primed = defaultdict(set)
+
+    def get(self, loader_class, variant=None, filter_queryset=None):
+        loader = self._loaders.get((loader_class, variant))
+        if loader is None:
+            loader = loader_class(self, filter_queryset)
+            self._loaders[(loader_class, variant)] = loader
+        return loader
+
+    def primed(self, loader_class):
+        return self._primed[loader_class]
+
+    def prime(self, instances):
+        for instance in instances:
+            for loader_class in _loader_classes.get(type(instance), ()):
+                key = getattr(instance, loader_class.key)
+                if key is not None:
+                    self._primed[loader_class].add(key)
+            # Prefetched rows are resolved without a loader, one parent at a
+            # time; priming them with their parent lets their own relations
+            # batch across every parent.
+            for related in getattr(instance, "_prefetched_objects_cache", {}).values():
+                self.prime(related)
+
+
+def loader_keys(model):
+    """Attributes DataLoaders read from every loaded instance of ``model``."""
+    return {
+        model._meta.pk.attname if loader_class.key == "pk" else loader_class.key
+        for loader_class in _loader_classes.get(model, ())
+    }
+
+
+def get_loaders(info):
+    context = info.context
+    registry = getattr(context, "dataloaders", None)
+    if registry is None:
+        registry = DataLoaderRegistry()
+        if context is not None:
+            context.dataloaders = registry
+    return registry
+
+
+def resolve_related(instance, info, name, loader_class):
+    """
+    Resolve a forward or reverse relation, preferring rows the queryset already
+    fetched through ``select_related``/``prefetch_related`` over the loader.
+    """
+    field = instance._meta.get_field(name)
+    if field.concrete:
+        if field.is_cached(instance):
+            return getattr(instance, name)
+    elif name in getattr(instance, "_prefetched_objects_cache", {}):
+        return list(getattr(instance, name).all())
+    return get_loaders(info).get(loader_class).load_for(instance)
+
+
+class RelatedRowsLoader(DataLoader):
+    """
+    Rows of ``model`` whose ``related_key`` is the parent's key, grouped by
+    parent. Each subclass gets a ``count_loader`` that counts the same rows
+    per parent with one grouped COUNT.
+    """
+
+    model = None
+    related_key = None
+    many = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.source is not None:
+            attributes = {"source": cls.source, "key": cls.key, "model": cls.model, "related_key": cls.related_key}
+            cls.count_loader = type(f"{cls.__name__}Count", (RelatedCountLoader,), attributes)
+
+    def queryset(self, keys):
+        return self.filter(self.model._default_manager.filter(**{f"{self.related_key}__in": keys}))
+
+    def batch_load(self, keys):
+        return group_by(self.queryset(keys), self.related_key)
+
+
+class RelatedCountLoader(DataLoader):
+    model = None
+    related_key = None
+
+    def empty(self):
+        return 0
+
+    def batch_load(self, keys):
+        queryset = RelatedRowsLoader.queryset(self, keys).order_by()
+        return dict(queryset.values_list(self.related_key).annotate(Count("pk")))
+
+
+def group_by(queryset, attname):
+    grouped = defaultdict(list)
+    for obj in queryset:
+        grouped[getattr(obj, attname)].append(obj)
+    return grouped
+
+
+def _flatten(values, many):
+    if not many:
+        return [value for value in values if value is not None]
+    return [obj for group in values for obj in group]
+
+
+class DataLoaderMiddleware:
+    """
+    Primes the request's loaders with every list of model instances a resolver
+    returns, so nested relation fields can be batched across siblings.
+    """
+
+    def resolve(self, next, root, info, **kwargs):
+        result = next(root, info, **kwargs)
+        if inspect.isawaitable(result):
+            return self.prime_awaited(result, info)
+        return self.prime(result, info)
+
+    async def prime_awaited(self, result, info):
+        return self.prime(await result, info)
+
+    def prime(self, result, info):
+        if isinstance(result, QuerySet):
+            # Only lists are read whole anyway; anything else (e.g. a
+            # connection) slices the QuerySet and must not load it here.
+            if not is_list_type(get_nullable_type(info.return_type)):
+                return result
+            result = list(result)
+            get_loaders(info).prime(result)
+        elif isinstance(result, (list, tuple)):
+            if result and isinstance(result[0], Model):
+                get_loaders(info).prime(result)
+        elif isinstance(result, Connection):
+            get_loaders(info).prime(
+                edge.node for edge in result.edges if isinstance(edge.node, Model)
+            )
+        return result
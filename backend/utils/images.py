@@ -0,0 +1,143 @@
+import io
+import posixpath
+
+import graphene
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+DEFAULT_SETTINGS = {
+    # Longest side, in pixels, of each variant. Images are never upscaled.
+    "SIZES": (64, 160, 320),
+    "FORMATS": ("webp", "jpeg"),
+    "QUALITY": 80,
+}
+
+CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, "IMAGE_VARIANTS", {})}
+
+
+def variant_name(name, size, image_format):
+    """'vehicle_brands/logos/x.png' -> 'vehicle_brands/logos/variants/x/160.webp'."""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, "variants", stem, f"{size}.{image_format}")
+
+
+def _cache_key(name):
+    return f"image-variants:{name}"
+
+
+def _encode(image, image_format, quality):
+    if image_format == "jpeg" and image.mode != "RGB":
+        # JPEG has no alpha channel, so transparent logos go on white.
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, "white")
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def generate_variants(fieldfile):
+    """
+    Write every configured variant of an image to the default storage,
+    skipping those already there, and return their descriptions (name, size,
+    format, width, height). Returns [] when the file is missing or not an
+    image.
+    """
+    options = get_settings()
+    name = fieldfile.name
+    try:
+        with fieldfile.storage.open(name, "rb") as f:
+            original = Image.open(f)
+            # Lets Pillow decode JPEGs at a reduced scale.
+            original.draft("RGB", (max(options["SIZES"]),) * 2)
+            original = ImageOps.exif_transpose(original)
+            original.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        return []
+
+    variants = []
+    for size in sorted(options["SIZES"]):
+        image = original.copy()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for image_format in options["FORMATS"]:
+            path = variant_name(name, size, image_format)
+            if not default_storage.exists(path):
+                default_storage.save(path, ContentFile(_encode(image, image_format, options["QUALITY"])))
+            variants.append({
+                "name": path,
+                "size": size,
+                "format": image_format,
+                "width": image.width,
+                "height": image.height,
+            })
+    return variants
+
+
+def get_variants(fieldfile):
+    """
+    Descriptions of an image's variants, generating missing files on first
+    use. The list is kept in Django's cache, so later calls touch neither the
+    storage nor Pillow. A failed generation (a missing or unreadable file) is
+    not cached, and is retried on the next call.
+    """
+    if not fieldfile:
+        return []
+    key = _cache_key(fieldfile.name)
+    variants = cache.get(key)
+    if variants is None:
+        variants = generate_variants(fieldfile)
+        if variants:
+            cache.set(key, variants, None)
+    return [
+        {**variant, "url": default_storage.url(variant["name"]), "content_type": CONTENT_TYPES[variant["format"]]}
+        for variant in variants
+    ]
+
+
+def delete_variants(name):
+    """Remove the variants of the image stored as ``name``."""
+    options = get_settings()
+    for size in options["SIZES"]:
+        for image_format in options["FORMATS"]:
+            default_storage.delete(variant_name(name, size, image_format))
+    cache.delete(_cache_key(name))
+
+
+class ImageVariantType(graphene.ObjectType):
+    url = graphene.String(required=True)
+    size = graphene.Int(required=True, description="Longest side the variant was fitted into.")
+    width = graphene.Int(required=True)
+    height = graphene.Int(required=True)
+    format = graphene.String(required=True)
+    content_type = graphene.String(required=True)
+
+
+def max_variants():
+    options = get_settings()
+    return len(options["SIZES"]) * len(options["FORMATS"])
+
+
+def image_variants_field():
+    """List field of an image's variants, optionally of a single format."""
+    return graphene.List(
+        graphene.NonNull(ImageVariantType),
+        required=True,
+        format=graphene.String(description="'webp' or 'jpeg'."),
+    )
+
+
+def resolve_image_variants(fieldfile, format=None):
+    variants = get_variants(fieldfile)
+    if format is not None:
+        variants = [variant for variant in variants if variant["format"] == format.lower()]
+    return variants
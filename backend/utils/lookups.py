@@ -0,0 +1,14 @@
+from django.db import connection
+from django.db.models import Q
+
+
+def prefix_filter(field, prefix):
+    """
+    Q matching values of ``field`` that start with ``prefix``, in a form an
+    index on the column can answer: LIKE 'prefix%' on PostgreSQL (with a
+    varchar_pattern_ops index), a range scan elsewhere. The range compares
+    byte-wise, so it suits normalized keys, not free text.
+    """
+    if connection.vendor == "postgresql":
+        return Q(**{f"{field}__startswith": prefix})
+    return Q(**{f"{field}__gte": prefix, f"{field}__lt": prefix + "\U0010ffff"})
@@ -1,7 +1,25 @@
-from django.db import models
+import copy
+import uuid
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.fields.files import FieldFile
+
+from utils.caching import is_shared_cache
+
+# Process-local copies of loaded singletons: {model: (version, instance)}.
+_singleton_cache = {}
+
 
 class SingletonModel(models.Model):
-    
+    """
+    Model with exactly one row. ``load()`` is served from a process-local copy
+    that is revalidated against a version key in Django's cache; ``save()`` and
+    ``delete()`` bump the version so every worker reloads on its next call.
+    The copy is only kept when that cache is shared between workers;
+    otherwise ``load()`` reads the row every time.
+    """
+
     _PK = 1
     
     class Meta:
@@ -10,8 +28,73 @@ class SingletonModel(models.Model):
     def save(self, *args, **kwargs):
         self.pk = self._PK
         super().save(*args, **kwargs)
+        self.invalidate_cache()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.invalidate_cache()
+        return result
+
+    @classmethod
+    def _version_key(cls):
+        return f"singleton:{cls._meta.label_lower}:version"
+
+    @classmethod
+    def invalidate_cache(cls):
+        _singleton_cache.pop(cls, None)
+        # Other workers only see the new version once the row is committed.
+        transaction.on_commit(lambda: cache.set(cls._version_key(), uuid.uuid4().hex, None))
 
     @classmethod
     def load(cls):
+        if not is_shared_cache():
+            return cls.objects.get_or_create(pk=cls._PK)[0]
+        version = cache.get(cls._version_key())
+        cached = _singleton_cache.get(cls)
+        if cached is not None and version is not None and cached[0] == version:
+            return copy.copy(cached[1])
+
         obj, created = cls.objects.get_or_create(pk=cls._PK)
-        return obj
+        if version is None:
+            cache.add(cls._version_key(), uuid.uuid4().hex, None)
+            version = cache.get(cls._version_key())
+        _singleton_cache[cls] = (version, obj)
+        return copy.copy(obj)
+
+
+class TrackLoadedValuesMixin:
+    """
+    Remembers the ``tracked_fields`` values an instance was loaded with, so
+    save and delete hooks can tell what changed without another SELECT.
+    """
+
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value
+            for name, value in zip(field_names, values)
+            if name in cls.tracked_fields
+        }
+        return instance
+
+    def get_loaded_values(self):
+        """
+        Return the loaded values, or None if the instance was not loaded from
+        the database with every tracked field.
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None or len(loaded) != len(self.tracked_fields):
+            return None
+        return loaded
+
+    def reset_loaded_values(self):
+        self._loaded_values = {name: _db_value(getattr(self, name)) for name in self.tracked_fields}
+
+
+def _db_value(value):
+    # A FieldFile is loaded as, and must be remembered as, its name: the same
+    # FieldFile object is updated in place when a new file is saved to it.
+    return value.name if isinstance(value, FieldFile) else value
@@ -0,0 +1,165 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, QuerySet
+from graphene.utils.str_converters import to_snake_case
+from graphene_django import DjangoObjectType
+from graphene_django.filter import DjangoFilterConnectionField
+from graphql import get_named_type, get_nullable_type, is_list_type, is_object_type
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+from utils.dataloader import loader_keys
+
+
+def _django_model(graphql_type):
+    graphene_type = getattr(get_named_type(graphql_type), "graphene_type", None)
+    if isinstance(graphene_type, type) and issubclass(graphene_type, DjangoObjectType):
+        return graphene_type._meta.model
+    return None
+
+
+def _subfields(info, nodes, object_type):
+    """FieldNodes selected on ``object_type`` below ``nodes``, with fragments expanded."""
+    for node in nodes:
+        if node.selection_set:
+            yield from _expand(info, node.selection_set.selections, object_type)
+
+
+def _expand(info, selections, object_type):
+    for selection in selections:
+        if isinstance(selection, FieldNode):
+            yield selection
+            continue
+        if isinstance(selection, FragmentSpreadNode):
+            selection = info.fragments[selection.name.value]
+        elif not isinstance(selection, InlineFragmentNode):
+            continue
+        # Fragments on other object types do not apply; fragments on
+        # interfaces and unions may.
+        condition = selection.type_condition and info.schema.get_type(selection.type_condition.name.value)
+        if condition is None or condition is object_type or not is_object_type(condition):
+            yield from _expand(info, selection.selection_set.selections, object_type)
+
+
+class _Plan:
+    def __init__(self):
+        self.only = set()
+        self.select_related = set()
+        self.prefetch = []
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch)
+        return queryset.only(*self.only)
+
+
+def _all_columns(model, prefix):
+    return {prefix + field.attname for field in model._meta.concrete_fields}
+
+
+def _walk(info, model, object_type, nodes, plan, prefix=""):
+    """
+    Add to ``plan`` what the selection below ``nodes`` (fields of
+    ``object_type``, a type for ``model``) needs from ``model``, with lookups
+    relative to the root model through ``prefix``.
+    """
+    columns = {model._meta.pk.attname, *loader_keys(model)}
+    every_column = False
+    for field_node in _subfields(info, nodes, object_type):
+        name = field_node.name.value
+        graphql_field = object_type.fields.get(name)
+        if name.startswith("__") or graphql_field is None:
+            continue
+        try:
+            field = model._meta.get_field(to_snake_case(name))
+        except FieldDoesNotExist:
+            # A custom resolver may read any attribute.
+            every_column = True
+            continue
+        if not field.is_relation:
+            columns.add(field.attname)
+            continue
+
+        related_type = get_named_type(graphql_field.type)
+        related_model = _django_model(related_type)
+        if field.concrete and not field.many_to_many:
+            columns.add(field.attname)
+            if related_model is field.related_model and field_node.selection_set:
+                plan.select_related.add(prefix + field.name)
+                _walk(info, related_model, related_type, [field_node], plan, f"{prefix}{field.name}__")
+        elif (
+            related_model is field.related_model
+            and is_list_type(get_nullable_type(graphql_field.type))
+            and not graphql_field.args
+        ):
+            # Plain lists of related rows are prefetched; connections and
+            # fields with arguments are left to their resolvers (DataLoaders).
+            related_plan = _Plan()
+            _walk(info, related_model, related_type, [field_node], related_plan)
+            if field.one_to_many:
+                # The prefetch matches children to parents on their foreign key.
+                related_plan.only.add(field.field.attname)
+            accessor = field.name if field.concrete else field.get_accessor_name()
+            related = related_plan.apply(related_model._default_manager.all())
+            plan.prefetch.append(Prefetch(prefix + accessor, queryset=related))
+
+    plan.only |= _all_columns(model, prefix) if every_column else {prefix + column for column in columns}
+
+
+def optimize(queryset, info, path=(), columns=()):
+    """
+    Return ``queryset`` with ``select_related``, ``prefetch_related`` and
+    ``only()`` applied for the fields the client selected on the rows it
+    resolves. ``path`` leads from the field being resolved to those rows, e.g.
+    ("edges", "node") for a connection.
+
+    Forward relations with a selection are joined, plain lists of related
+    rows are prefetched (recursively optimized), and every model loads only
+    the selected columns plus its primary key and the keys DataLoaders read.
+    Models whose selection includes a field that is not a model field load
+    every column; ``columns`` are loaded as well. Querysets that were already
+    evaluated, or that already follow relations, are returned unchanged.
+    """
+    if not isinstance(queryset, QuerySet) or queryset._result_cache is not None or queryset._fields is not None:
+        return queryset
+    if queryset.query.select_related or queryset._prefetch_related_lookups or queryset.query.deferred_loading[0]:
+        return queryset
+
+    object_type = get_named_type(info.return_type)
+    nodes = list(info.field_nodes)
+    for name in path:
+        graphql_field = object_type.fields.get(name)
+        if graphql_field is None:
+            return queryset
+        nodes = [node for node in _subfields(info, nodes, object_type) if node.name.value == name]
+        object_type = get_named_type(graphql_field.type)
+    if _django_model(object_type) is not queryset.model:
+        return queryset
+
+    plan = _Plan()
+    plan.only.update(columns)
+    _walk(info, queryset.model, object_type, nodes, plan)
+    return plan.apply(queryset)
+
+
+class OptimizingConnectionField(DjangoFilterConnectionField):
+    """DjangoFilterConnectionField whose querysets go through optimize()."""
+
+    @classmethod
+    def resolve_queryset(cls, connection, iterable, info, args, filtering_args, filterset_class):
+        queryset = super().resolve_queryset(connection, iterable, info, args, filtering_args, filterset_class)
+        return optimize(queryset, info, ("edges", "node"))
+
+
+class QueryOptimizerMiddleware:
+    """
+    Optimizes every QuerySet a resolver returns for a list of Django objects,
+    so list fields need no hand-written select_related or only(). Must be
+    listed before DataLoaderMiddleware, which evaluates the QuerySets.
+    """
+
+    def resolve(self, next, root, info, **kwargs):
+        result = next(root, info, **kwargs)
+        if isinstance(result, QuerySet):
+            return optimize(result, info)
+        return result
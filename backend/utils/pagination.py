@@ -0,0 +1,291 @@
+import base64
+import datetime
+import json
+from functools import partial
+
+import graphene
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Q, QuerySet, Value, Window
+from django.db.models.functions import Least, RowNumber
+from graphene.relay import PageInfo
+from graphene_django.filter import DjangoFilterConnectionField
+from graphql import GraphQLError
+from graphql_relay import get_offset_with_default, offset_to_cursor
+
+from utils.dataloader import get_loaders
+from utils.optimizer import OptimizingConnectionField, optimize
+
+CURSOR_PREFIX = "keyset:"
+
+
+class CountableConnection(graphene.relay.Connection):
+    """
+    Connection with an opt-in ``totalCount``. The COUNT query only runs when
+    the field is selected.
+    """
+
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int(description="Total number of matching rows. Costs a COUNT query.")
+
+    def resolve_total_count(self, info):
+        count_rows = getattr(self, "count_rows", None)
+        if count_rows is not None:
+            return count_rows()
+        if isinstance(self.iterable, QuerySet):
+            return self.iterable.count()
+        return len(self.iterable)
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    Keeps full microsecond precision, which DjangoJSONEncoder truncates, so
+    decoded datetimes compare equal to the stored values.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    payload = json.dumps(values, cls=CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode((CURSOR_PREFIX + payload).encode()).decode()
+
+
+def decode_cursor(cursor, size):
+    try:
+        payload = base64.urlsafe_b64decode(cursor.encode()).decode()
+        values = json.loads(payload.removeprefix(CURSOR_PREFIX)) if payload.startswith(CURSOR_PREFIX) else None
+    except (ValueError, UnicodeDecodeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise GraphQLError(f"Invalid cursor: {cursor}")
+    return values
+
+
+def default_ordering(model, ordering=None):
+    """``ordering`` (default: the model's) with the primary key as a tie-breaker."""
+    ordering = list(ordering or model._meta.ordering)
+    if not any(isinstance(name, str) and name.lstrip("-") in ("pk", "id") for name in ordering):
+        descending = bool(ordering) and str(ordering[-1]).startswith("-")
+        ordering.append("-id" if descending else "id")
+    return tuple(ordering)
+
+
+def keyset_filter(ordering, values, forward=True):
+    """
+    Q matching the rows strictly after (or, with forward=False, before) the row
+    whose sort key is ``values``. Sort fields are assumed to be non-null.
+    """
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, values):
+        field = name.lstrip("-")
+        descending = name.startswith("-")
+        lookup = "lt" if descending == forward else "gt"
+        condition |= equal & Q(**{f"{field}__{lookup}": value})
+        equal &= Q(**{field: value})
+    return condition
+
+
+def check_page_size(field_name, max_limit, first=None, last=None, kind="connection"):
+    """Raise GraphQLError for a negative ``first``/``last`` or one over ``max_limit``."""
+    for name, value in (("first", first), ("last", last)):
+        if value is not None and value < 0:
+            raise GraphQLError(f"`{name}` must be a non-negative integer.")
+        if max_limit and value is not None and value > max_limit:
+            raise GraphQLError(
+                f"Requesting {value} records on the `{field_name}` {kind} exceeds the limit of {max_limit} records."
+            )
+
+
+def _reverse(ordering):
+    return tuple(name[1:] if name.startswith("-") else f"-{name}" for name in ordering)
+
+
+class KeysetConnectionField(OptimizingConnectionField):
+    """
+    Filterable connection paginated on the sort key instead of an offset.
+
+    Cursors encode the last row's values for ``ordering`` (the model ordering
+    plus the primary key by default), so every page is a range scan on the
+    ordering index and costs the same as the first one. The queryset goes
+    through optimize(), and no COUNT query runs unless ``totalCount`` is
+    selected.
+    """
+
+    def __init__(self, _type, *args, ordering=None, **kwargs):
+        self.ordering = ordering
+        super().__init__(_type, *args, **kwargs)
+        self._base_args.pop("offset", None)
+
+    def wrap_resolve(self, parent_resolver):
+        return partial(
+            self.keyset_resolver,
+            parent_resolver,
+            self.connection_type,
+            self.get_manager(),
+            self.get_queryset_resolver(),
+            self.ordering or default_ordering(self.model),
+            self.max_limit,
+        )
+
+    @classmethod
+    def keyset_resolver(
+        cls, resolver, connection, default_manager, queryset_resolver, ordering, max_limit, root, info, **args
+    ):
+        first, last = args.get("first"), args.get("last")
+        check_page_size(info.field_name, max_limit, first, last)
+        if first is None and last is None:
+            first = max_limit
+
+        iterable = resolver(root, info, **args)
+        if iterable is None:
+            iterable = default_manager
+        queryset = queryset_resolver(connection, iterable, info, args)
+
+        keys = {f"keyset_{i}": F(name.lstrip("-")) for i, name in enumerate(ordering)}
+        page = queryset.annotate(**keys)
+        if args.get("after"):
+            page = page.filter(keyset_filter(ordering, decode_cursor(args["after"], len(ordering))))
+        if args.get("before"):
+            page = page.filter(keyset_filter(ordering, decode_cursor(args["before"], len(ordering)), forward=False))
+
+        has_next = has_previous = False
+        if last is not None and first is None:
+            rows = list(page.order_by(*_reverse(ordering))[:last + 1])
+            has_previous = len(rows) > last
+            rows = rows[:last][::-1]
+            has_next = bool(args.get("before"))
+        else:
+            rows = list(page.order_by(*ordering)[:first + 1] if first is not None else page.order_by(*ordering))
+            has_next = first is not None and len(rows) > first
+            rows = rows[:first]
+            if last is not None:
+                has_previous = len(rows) > last
+                rows = rows[len(rows) - last:] if last else []
+            has_previous = has_previous or bool(args.get("after"))
+
+        edges = [
+            connection.Edge(node=row, cursor=encode_cursor([getattr(row, key) for key in keys]))
+            for row in rows
+        ]
+        result = connection(
+            edges=edges,
+            page_info=PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=has_previous,
+                has_next_page=has_next,
+            ),
+        )
+        result.iterable = queryset
+        return result
+
+
+def window_queryset(queryset, partition, start, before=None, first=None, last=None):
+    """
+    The rows of each ``partition`` that a connection page with these offsets
+    needs, numbered by ``window_row`` (from 1) in ``queryset``'s ordering.
+    With ``first``, one row past the page is kept to tell whether there is a
+    next page; with ``last``, ``window_total`` holds the partition's size.
+    """
+    ordering = default_ordering(queryset.model, queryset.query.order_by)
+    queryset = queryset.annotate(window_row=Window(RowNumber(), partition_by=F(partition), order_by=ordering))
+    bounds = Q(window_row__gt=start)
+    if before is not None:
+        bounds &= Q(window_row__lte=before)
+    if first is not None:
+        bounds &= Q(window_row__lte=start + first + 1)
+    if last is not None:
+        queryset = queryset.annotate(window_total=Window(Count("pk"), partition_by=F(partition)))
+        ends = [F("window_total"), *(Value(end) for end in (before, _add(start, first)) if end is not None)]
+        bounds &= Q(window_row__gt=(Least(*ends) if len(ends) > 1 else ends[0]) - last)
+    return queryset.filter(bounds).order_by(*ordering)
+
+
+def _add(start, count):
+    return None if count is None else start + count
+
+
+def window_page(rows, start, before=None, first=None, last=None):
+    """
+    (rows, has_previous, has_next) of a page cut from one partition of
+    window_queryset(), with the same semantics as connection_from_array_slice.
+    """
+    if last is None:
+        return rows[:first], False, first is not None and len(rows) > first
+    if not rows:
+        return [], False, False
+    total = rows[0].window_total
+    end = min(bound for bound in (total, before, _add(start, first)) if bound is not None)
+    begin = max(start, end - last)
+    page = [row for row in rows if begin < row.window_row <= end]
+    upper = before if before is not None else total
+    return page, begin > start, first is not None and end < upper
+
+
+class DataLoaderConnectionField(DjangoFilterConnectionField):
+    """
+    Filterable connection over a reverse relation whose rows are fetched through
+    a RelatedRowsLoader for all parents at once. Each distinct set of filter and
+    page arguments gets its own loader, so filters and the page window (a
+    ROW_NUMBER() per parent) are applied in SQL and only the rows of each page
+    are read. ``totalCount`` is a grouped COUNT over all parents.
+    """
+
+    def __init__(self, _type, loader_class, *args, **kwargs):
+        self.loader_class = loader_class
+        super().__init__(_type, *args, **kwargs)
+
+    def wrap_resolve(self, parent_resolver):
+        return self.batched_resolver
+
+    def batched_resolver(self, root, info, **args):
+        filters = {k: v for k, v in args.items() if k in self.filtering_args}
+        first, last = args.get("first"), args.get("last")
+        check_page_size(info.field_name, self.max_limit, first, last)
+        if first is None and last is None:
+            first = self.max_limit
+        # As in graphene-django, ``offset`` counts from the ``after`` cursor.
+        start = get_offset_with_default(args.get("after"), -1) + 1 + (args.get("offset") or 0)
+        before = get_offset_with_default(args.get("before"), None)
+        window = (start, before, first, last)
+        related_key = self.loader_class.related_key
+
+        def filter_queryset(queryset):
+            filterset = self.filterset_class(data=filters, queryset=queryset, request=info.context)
+            if not filterset.is_valid():
+                raise ValidationError(filterset.form.errors.as_json())
+            return filterset.qs
+
+        def page_queryset(queryset):
+            queryset = optimize(filter_queryset(queryset), info, ("edges", "node"), columns=(related_key,))
+            return window_queryset(queryset, related_key, *window)
+
+        loaders = get_loaders(info)
+        variant = tuple(sorted(filters.items()))
+        # Aliases of the field may select different columns.
+        selection = tuple(id(node) for node in info.field_nodes)
+        rows = loaders.get(self.loader_class, (variant, window, selection), page_queryset).load_for(root)
+        counter = loaders.get(self.loader_class.count_loader, variant, filter_queryset)
+
+        rows, has_previous, has_next = window_page(rows, *window)
+        connection = self.connection_type
+        edges = [connection.Edge(node=row, cursor=offset_to_cursor(row.window_row - 1)) for row in rows]
+        result = connection(
+            edges=edges,
+            page_info=PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=has_previous,
+                has_next_page=has_next,
+            ),
+        )
+        result.iterable = rows
+        result.count_rows = lambda: counter.load_for(root)
+        return result
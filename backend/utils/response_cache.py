@@ -0,0 +1,233 @@
+import hashlib
+import json
+import threading
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from graphene.utils.str_converters import to_camel_case
+from graphene_django import DjangoObjectType
+from graphql import get_named_type, is_abstract_type, is_object_type, print_ast
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+from graphql.utilities import get_operation_ast
+
+from utils.caching import is_shared_cache
+
+DEFAULT_SETTINGS = {
+    # Off unless turned on. Invalidation goes through CACHE_ALIAS, which must
+    # be shared by every worker (not LocMemCache) once there is more than one.
+    "ENABLED": False,
+    "TIMEOUT": 300,
+    "CACHE_ALIAS": "default",
+    # Models whose saves and deletes invalidate cached responses. Operations
+    # that touch any other model are never cached.
+    "MODELS": (),
+}
+
+# (GraphQL type name, field name) -> labels of extra models the field reads.
+_cacheable_fields = {}
+_plans = {}
+_plans_lock = threading.Lock()
+MAX_PLANS = 1024
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, "GRAPHQL_RESPONSE_CACHE", {})}
+
+
+def _cache():
+    return caches[get_settings()["CACHE_ALIAS"]]
+
+
+def check_cache_backend(app_configs, **kwargs):
+    cache_settings = get_settings()
+    if settings.DEBUG or not cache_settings["ENABLED"] or is_shared_cache(cache_settings["CACHE_ALIAS"]):
+        return []
+    return [
+        checks.Warning(
+            f"GRAPHQL_RESPONSE_CACHE is enabled on the process-local '{cache_settings['CACHE_ALIAS']}' cache, "
+            "so a save in one worker does not invalidate the responses cached by the others.",
+            hint="Point CACHE_ALIAS at a shared backend (Redis, Memcached, database or file), or turn the "
+            "response cache off.",
+            id="core.W002",
+        )
+    ]
+
+
+def cacheable(object_type, field_name, *models):
+    """
+    Opt ``object_type.field_name`` into the response cache. The models of the
+    Django types it returns are found from the query; list any other model
+    the resolver reads (e.g. through an aggregate) in ``models``.
+    """
+    _cacheable_fields[(object_type._meta.name, to_camel_case(field_name))] = frozenset(
+        model._meta.label_lower for model in models
+    )
+
+
+def _version_key(label):
+    return f"response-cache:model:{label}"
+
+
+def invalidate(*models):
+    """Drop every cached response that depends on one of ``models``."""
+    keys = {_version_key(model._meta.label_lower): uuid.uuid4().hex for model in models}
+    transaction.on_commit(lambda: _cache().set_many(keys, None))
+
+
+def _invalidate_sender(sender, **kwargs):
+    invalidate(sender)
+
+
+def connect_signals():
+    for label in get_settings()["MODELS"]:
+        model = apps.get_model(label)
+        post_save.connect(_invalidate_sender, sender=model, dispatch_uid=f"response-cache:{label}:save")
+        post_delete.connect(_invalidate_sender, sender=model, dispatch_uid=f"response-cache:{label}:delete")
+
+
+def _model_versions(labels):
+    cache = _cache()
+    keys = [_version_key(label) for label in sorted(labels)]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # A fresh random version, so nothing stored before an eviction of the
+        # version key can be served again.
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, "") for key in keys]
+
+
+def _plan(schema, document, operation_name):
+    """
+    (normalized document hash, dependency labels) for a cacheable query, or
+    None. A query is cacheable when every field it selects is either a
+    registered cacheable field or a namespace object leading to one.
+    """
+    operation = get_operation_ast(document, operation_name)
+    if operation is None or operation.operation.value != "query":
+        return None
+    tracked = {label.lower() for label in get_settings()["MODELS"]}
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if definition.kind == "fragment_definition"
+    }
+
+    def selections(selection_set, seen=frozenset()):
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection
+            elif isinstance(selection, InlineFragmentNode):
+                yield from selections(selection.selection_set, seen)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                if name in fragments and name not in seen:
+                    yield from selections(fragments[name].selection_set, seen | {name})
+
+    def models_in(parent_type, field_nodes, labels):
+        for field_node in field_nodes:
+            field = parent_type.fields.get(field_node.name.value)
+            if field is None or not field_node.selection_set:
+                continue
+            field_type = get_named_type(field.type)
+            # A union or interface field may return any of its object types.
+            if is_abstract_type(field_type):
+                object_types = schema.get_possible_types(field_type)
+            else:
+                object_types = [field_type]
+            for object_type in object_types:
+                graphene_type = getattr(object_type, "graphene_type", None)
+                if isinstance(graphene_type, type) and issubclass(graphene_type, DjangoObjectType):
+                    labels.add(graphene_type._meta.model._meta.label_lower)
+                if is_object_type(object_type):
+                    models_in(object_type, selections(field_node.selection_set), labels)
+        return labels
+
+    def dependencies(parent_type, selection_set):
+        labels = set()
+        for field_node in selections(selection_set):
+            name = field_node.name.value
+            if name == "__typename":
+                continue
+            field = parent_type.fields.get(name)
+            if field is None:
+                return None
+            field_type = get_named_type(field.type)
+            extra = _cacheable_fields.get((parent_type.name, name))
+            if extra is not None:
+                labels |= extra
+                models_in(parent_type, [field_node], labels)
+                continue
+            graphene_type = getattr(field_type, "graphene_type", None)
+            is_namespace = (
+                is_object_type(field_type)
+                and not field_node.arguments
+                and not (isinstance(graphene_type, type) and issubclass(graphene_type, DjangoObjectType))
+            )
+            nested = dependencies(field_type, field_node.selection_set) if is_namespace else None
+            if nested is None:
+                return None
+            labels |= nested
+        return labels
+
+    labels = dependencies(schema.get_root_type(operation.operation), operation.selection_set)
+    if not labels or not labels <= tracked:
+        return None
+    normalized = hashlib.sha256(print_ast(document).encode("utf-8")).hexdigest()
+    return normalized, frozenset(labels)
+
+
+def get_plan(schema, document, query_hash, operation_name):
+    key = (id(schema), query_hash, operation_name)
+    with _plans_lock:
+        if key in _plans:
+            return _plans[key]
+    plan = _plan(schema, document, operation_name)
+    with _plans_lock:
+        if len(_plans) >= MAX_PLANS:
+            _plans.clear()
+        _plans[key] = plan
+    return plan
+
+
+def permission_scope(user):
+    if not user.is_authenticated:
+        return "anonymous"
+    if user.is_superuser:
+        return "superuser"
+    permissions = ",".join(sorted(user.get_all_permissions()))
+    return f"staff={user.is_staff}:" + hashlib.sha256(permissions.encode("utf-8")).hexdigest()
+
+
+def cache_key(request, schema, document, query_hash, operation_name, variables):
+    """Key for the response to this request, or None if it is not cacheable."""
+    options = get_settings()
+    if not options["ENABLED"] or not query_hash:
+        return None
+    plan = get_plan(schema, document, query_hash, operation_name)
+    if plan is None:
+        return None
+    scope = permission_scope(request.user)
+    normalized, labels = plan
+    parts = json.dumps(
+        [normalized, operation_name, variables or {}, scope, _model_versions(labels)],
+        cls=DjangoJSONEncoder,
+        sort_keys=True,
+    )
+    return "response-cache:" + hashlib.sha256(parts.encode("utf-8")).hexdigest()
+
+
+def get_response(key):
+    return _cache().get(key)
+
+
+def set_response(key, data):
+    _cache().set(key, data, get_settings()["TIMEOUT"])
@@ -0,0 +1,25 @@
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+from graphene.utils.str_converters import to_snake_case
+
+
+def selected_fields(info):
+    """
+    Snake-case names of the fields selected directly below the field being
+    resolved, with fragments expanded.
+    """
+    names = set()
+    for field_node in info.field_nodes:
+        if field_node.selection_set:
+            _collect(info, field_node.selection_set.selections, names)
+    return names
+
+
+def _collect(info, selections, names):
+    for selection in selections:
+        if isinstance(selection, FieldNode):
+            names.add(to_snake_case(selection.name.value))
+        elif isinstance(selection, InlineFragmentNode):
+            _collect(info, selection.selection_set.selections, names)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = info.fragments[selection.name.value]
+            _collect(info, fragment.selection_set.selections, names)
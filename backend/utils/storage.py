@@ -0,0 +1,122 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.apps import apps
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import FileField
+from django.utils.deconstruct import deconstructible
+
+from utils.images import delete_variants
+
+# A content hash as a file stem ("<hash>.png") or directory ("<hash>/160.webp").
+_CONTENT_ADDRESSED = re.compile(r"(^|/)[0-9a-f]{64}(\.[\w]+$|/)")
+
+
+def is_content_addressed(name):
+    """True for names whose content never changes, and so can be cached forever."""
+    return bool(_CONTENT_ADDRESSED.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names each file by the SHA-256 of its content,
+    keeping the directory and extension of the requested name. Saving content
+    that is already stored writes nothing and returns the existing name, and
+    delete() keeps a file while any model field still references it.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Names are replaced by the content hash in _save, so the usual
+        # collision suffix is never needed.
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        if hasattr(content, "temporary_file_path"):
+            # Uploads spooled to disk are moved into place. LimitedUploadHandler
+            # hashes them while they stream in; anything else is hashed here.
+            sha256 = getattr(content, "sha256", None)
+            if sha256 is None:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                sha256 = digest.hexdigest()
+            source, temporary = content.temporary_file_path(), False
+        else:
+            # Hash while streaming to a temporary file next to the target.
+            fd, source = tempfile.mkstemp(dir=full_directory, suffix=".upload")
+            with os.fdopen(fd, "wb") as f:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode("utf-8")
+                    digest.update(chunk)
+                    f.write(chunk)
+            sha256, temporary = digest.hexdigest(), True
+
+        name = posixpath.join(directory, sha256 + extension)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            if temporary:
+                os.remove(source)
+            return name
+
+        try:
+            if temporary:
+                os.replace(source, full_path)
+            else:
+                file_move_safe(source, full_path, allow_overwrite=True)
+        except BaseException:
+            if temporary and os.path.exists(source):
+                os.remove(source)
+            raise
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    def references(self, name):
+        """Number of model rows whose file fields on this storage hold ``name``."""
+        count = 0
+        for model in apps.get_models():
+            for field in model._meta.get_fields():
+                if isinstance(field, FileField) and field.storage is self:
+                    count += model._default_manager.filter(**{field.name: name}).count()
+        return count
+
+    def delete(self, name):
+        if name and not self.references(name):
+            super().delete(name)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def get_content_addressed_storage():
+    # Callable for FileField(storage=...), so migrations reference it by path.
+    return content_addressed_storage
+
+
+def release(fieldfile_or_name):
+    """
+    Delete a file, and its image variants, once the current transaction
+    commits, unless another row still references it.
+    """
+    name = getattr(fieldfile_or_name, "name", fieldfile_or_name)
+    if not name:
+        return
+
+    def cleanup():
+        if not content_addressed_storage.references(name):
+            delete_variants(name)
+            content_addressed_storage.delete(name)
+
+    transaction.on_commit(cleanup)
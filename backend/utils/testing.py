@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import override_settings
+from graphene_django.utils.testing import GraphQLTestCase
+from graphql_jwt.shortcuts import get_token
+
+
+def shared_cache(location):
+    """Settings for a default cache that every process shares, as in production."""
+    return override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location},
+    })
+
+
+class APITestCase(GraphQLTestCase):
+    """
+    GraphQLTestCase against /graphql/, authenticated as a superuser unless a
+    test passes ``user=None``. Caches are cleared before each test, and each
+    request's on_commit callbacks (cache invalidation, search indexing) run as
+    if it had committed.
+    """
+
+    GRAPHQL_URL = "/graphql/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.tokens = {}
+
+    def token(self, user):
+        """One JWT per user and test, so requests send the same token the way a client would."""
+        if user.pk not in self.tokens:
+            self.tokens[user.pk] = get_token(user)
+        return self.tokens[user.pk]
+
+    def query(self, query, variables=None, headers=None, user=True, **kwargs):
+        user = self.admin if user is True else user
+        if user is not None:
+            headers = {"Authorization": f"JWT {self.token(user)}", **(headers or {})}
+        with self.captureOnCommitCallbacks(execute=True):
+            return super().query(query, variables=variables, headers=headers, **kwargs)
+
+    def execute(self, query, variables=None, **kwargs):
+        """The response's data, failing the test on any error."""
+        response = self.query(query, variables, **kwargs)
+        self.assertResponseNoErrors(response)
+        return response.json()["data"]
+
+    def errors(self, query, variables=None, **kwargs):
+        """The response's error messages, failing the test if there are none."""
+        response = self.query(query, variables, **kwargs)
+        self.assertResponseHasErrors(response)
+        return [error["message"] for error in response.json()["errors"]]
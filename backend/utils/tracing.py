@@ -0,0 +1,216 @@
+import bisect
+import inspect
+import json
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from graphql import get_named_type, is_leaf_type
+
+TRACE_HEADER = "HTTP_X_GRAPHQL_TRACE"
+ANONYMOUS_OPERATION = "anonymous"
+OTHER_OPERATION = "other"
+# Distinct operation names tracked before the rest are folded into "other".
+MAX_OPERATIONS = 500
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            yield bound, total
+
+
+class OperationMetrics:
+    """
+    Process-wide histograms of GraphQL request duration, SQL query count and
+    SQL time per operation name, rendered in the Prometheus text format.
+    """
+
+    histograms = (
+        ("graphql_operation_duration_seconds", "Wall time spent executing the operation.", DURATION_BUCKETS),
+        ("graphql_operation_sql_queries", "SQL queries run by the operation.", SQL_COUNT_BUCKETS),
+        ("graphql_operation_sql_duration_seconds", "Time spent in SQL by the operation.", DURATION_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def observe(self, operation_name, duration, sql_count, sql_duration):
+        name = operation_name or ANONYMOUS_OPERATION
+        with self._lock:
+            if name not in self._operations and len(self._operations) >= MAX_OPERATIONS:
+                name = OTHER_OPERATION
+            histograms = self._operations.get(name)
+            if histograms is None:
+                histograms = self._operations[name] = [Histogram(buckets) for _, _, buckets in self.histograms]
+            for histogram, value in zip(histograms, (duration, sql_count, sql_duration)):
+                histogram.observe(value)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for index, (metric, help_text, _) in enumerate(self.histograms):
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+                for name, histograms in sorted(self._operations.items()):
+                    histogram = histograms[index]
+                    label = name.replace("\\", "\\\\").replace('"', '\\"')
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{metric}_bucket{{operation="{label}",le="{bound}"}} {count}')
+                    lines.append(f'{metric}_sum{{operation="{label}"}} {histogram.sum}')
+                    lines.append(f'{metric}_count{{operation="{label}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+
+operation_metrics = OperationMetrics()
+
+
+class QueryTrace:
+    """
+    Timings for one GraphQL request. Every request counts its SQL and wall
+    time; per-resolver timings are only kept after record_resolvers(), for
+    traced or sampled requests. SQL run while a resolver is active is then
+    attributed to that resolver's path (list indices dropped, so every row
+    of a list shares one entry).
+    """
+
+    def __init__(self):
+        self.resolvers = None
+        self.current = None
+        self.sql_count = 0
+        self.sql_duration = 0.0
+        self.duration = 0.0
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.sql_count += 1
+            self.sql_duration += elapsed
+            if self.current is not None:
+                self.current[2] += 1
+                self.current[3] += elapsed
+
+    def record_resolvers(self):
+        self.resolvers = {}
+
+    def as_dict(self):
+        resolvers = sorted((self.resolvers or {}).items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            "duration": round(self.duration * 1000, 3),
+            "sqlCount": self.sql_count,
+            "sqlDuration": round(self.sql_duration * 1000, 3),
+            "resolvers": [
+                {
+                    "path": path,
+                    "calls": calls,
+                    "duration": round(duration * 1000, 3),
+                    "sqlCount": sql_count,
+                    "sqlDuration": round(sql_duration * 1000, 3),
+                }
+                for path, (calls, duration, sql_count, sql_duration) in resolvers
+            ],
+        }
+
+
+def trace_requested(request):
+    """Per-request traces are returned to staff, or to anyone with DEBUG on."""
+    if not request.META.get(TRACE_HEADER):
+        return False
+    user = getattr(request, "user", None)
+    return settings.DEBUG or bool(user and user.is_staff)
+
+
+def trace_sampled():
+    """Whether to trace a request nobody asked to, at GRAPHQL_TRACE_SAMPLE_RATE."""
+    rate = settings.GRAPHQL_TRACE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def log_trace(operation_name, trace):
+    logger.info(
+        "GraphQL trace for %s: %s",
+        operation_name or ANONYMOUS_OPERATION,
+        json.dumps(trace.as_dict(), separators=(",", ":")),
+    )
+
+
+def _path_key(path):
+    keys = []
+    while path is not None:
+        if isinstance(path.key, str):
+            keys.append(path.key)
+        path = path.prev
+    return ".".join(reversed(keys))
+
+
+class ResolverTimingMiddleware:
+    """
+    Records wall time and SQL per resolver path into the request's QueryTrace.
+    Scalar and enum fields are skipped, so only resolvers that can load data
+    pay for the bookkeeping.
+
+    Must be listed last in GRAPHENE["MIDDLEWARE"] (the outermost middleware),
+    so the time DataLoaderMiddleware spends materializing QuerySets counts.
+    The view leaves it out for requests that are neither traced nor sampled.
+    """
+
+    def resolve(self, next, root, info, **kwargs):
+        trace = getattr(info.context, "graphql_trace", None)
+        if trace is None or trace.resolvers is None or is_leaf_type(get_named_type(info.return_type)):
+            return next(root, info, **kwargs)
+
+        key = _path_key(info.path)
+        entry = trace.resolvers.get(key)
+        if entry is None:
+            entry = trace.resolvers[key] = [0, 0.0, 0, 0.0]
+        previous, trace.current = trace.current, entry
+        start = time.perf_counter()
+        try:
+            result = next(root, info, **kwargs)
+        except Exception:
+            self.record(entry, start)
+            raise
+        finally:
+            trace.current = previous
+        if inspect.isawaitable(result):
+            return self.record_awaited(result, entry, start)
+        self.record(entry, start)
+        return result
+
+    def record(self, entry, start):
+        entry[0] += 1
+        entry[1] += time.perf_counter() - start
+
+    async def record_awaited(self, result, entry, start):
+        # Awaited resolvers interleave, so their SQL is not attributed to them.
+        try:
+            return await result
+        finally:
+            self.record(entry, start)
@@ -0,0 +1,139 @@
+import codecs
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from graphql import GraphQLError
+from PIL import Image
+
+MB = 1024 * 1024
+IMAGE_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp")
+CSV_TYPES = ("text/csv",)
+
+DEFAULT_SETTINGS = {
+    # Largest multipart body accepted, checked against Content-Length before
+    # anything is read.
+    "MAX_REQUEST_SIZE": 25 * MB,
+    # Accepted file types, as sniffed from their first bytes, and the largest
+    # size allowed for each. Which of them an argument takes is checked by
+    # its mutation with check_upload().
+    "MAX_SIZES": {
+        "image/png": 5 * MB,
+        "image/jpeg": 5 * MB,
+        "image/gif": 5 * MB,
+        "image/webp": 5 * MB,
+        "text/csv": 20 * MB,
+    },
+}
+
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, "GRAPHQL_UPLOADS", {})}
+
+
+def sniff_content_type(head):
+    """The type of a file from its first bytes, or None if it is not one we know."""
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if b"\x00" not in head:
+        try:
+            # Not final: the chunk may end inside a multi-byte character.
+            codecs.getincrementaldecoder("utf-8")().decode(head)
+        except UnicodeDecodeError:
+            return None
+        return "text/csv"
+    return None
+
+
+def check_upload(upload, content_types):
+    """
+    Raise GraphQLError unless ``upload`` (if given) is one of
+    ``content_types``, sniffed from its content. Images must also pass
+    Pillow's verify(), so a file with an image's first bytes but no image
+    behind them is rejected before it is stored.
+    """
+    if upload is None:
+        return
+    upload.seek(0)
+    content_type = sniff_content_type(upload.read(2048))
+    upload.seek(0)
+    if content_type not in content_types:
+        raise GraphQLError(f"{upload.name} must be one of: {', '.join(content_types)}.")
+    if content_type in IMAGE_TYPES:
+        try:
+            with Image.open(upload) as image:
+                image.verify()
+        except Exception:
+            raise GraphQLError(f"{upload.name} is not a valid image.")
+        finally:
+            upload.seek(0)
+
+
+class UploadRejected(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams every uploaded file to a temporary file on disk in chunks, so
+    memory use does not grow with the upload. While reading it
+
+    - rejects the request up front when Content-Length is over the limit,
+    - sniffs each file's type from its first chunk and rejects types not in
+      MAX_SIZES (the client's Content-Type is not trusted),
+    - rejects a file as soon as it grows past its type's limit, and
+    - hashes the content, so ContentAddressedStorage need not read it again.
+
+    Rejections raise UploadRejected, which stops the parse.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        limit = get_settings()["MAX_REQUEST_SIZE"]
+        if content_length > limit:
+            raise UploadRejected(f"Request body is larger than {limit} bytes.", 413)
+        return None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.limit = None
+        self.received = 0
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.limit is None:
+            content_type = sniff_content_type(raw_data)
+            limits = get_settings()["MAX_SIZES"]
+            if content_type not in limits:
+                self.reject(f"{self.file_name} is not an accepted file type.", 415)
+            self.limit = limits[content_type]
+            self.file.content_type = content_type
+        self.received += len(raw_data)
+        if self.received > self.limit:
+            self.reject(f"{self.file_name} is larger than {self.limit} bytes.", 413)
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.limit is None:
+            # An empty file never reaches receive_data_chunk.
+            self.reject(f"{self.file_name} is empty.", 400)
+        file = super().file_complete(file_size)
+        file.sha256 = self.digest.hexdigest()
+        return file
+
+    def reject(self, message, status_code):
+        # Removes the partly written temporary file.
+        self.file.close()
+        raise UploadRejected(message, status_code)
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from .models import VehicleBrand, Vehicle, ExpenseCategory, VehicleExpense
 from django.utils.html import format_html
+from utils.images import get_variants
+from .totals import reconcile_totals
 
 @admin.register(VehicleBrand)
 class VehicleBrandAdmin(admin.ModelAdmin):
@@ -9,7 +11,9 @@ class VehicleBrandAdmin(admin.ModelAdmin):
 
     def logo_preview(self, obj):
         if obj.logo:
-            return format_html('<img src="{}" style="height:50px;"/>', obj.logo.url)
+            variants = get_variants(obj.logo)
+            url = variants[0]["url"] if variants else obj.logo.url
+            return format_html('<img src="{}" style="height:50px;"/>', url)
         return format_html('<svg xmlns="http://www.w3.org/2000/svg" height="50px" viewBox="0 -960 960 960" width="50px" fill="#e3e3e3"><path d="M200-120q-33 0-56.5-23.5T120-200v-560q0-33 23.5-56.5T200-840h560q33 0 56.5 23.5T840-760v560q0 33-23.5 56.5T760-120H200Zm40-337 160-160 160 160 160-160 40 40v-183H200v263l40 40Zm-40 257h560v-264l-40-40-160 160-160-160-160 160-40-40v184Zm0 0v-264 80-376 560Z"/></svg>')
     logo_preview.short_description = "Logo"
 
@@ -17,7 +21,13 @@ class VehicleBrandAdmin(admin.ModelAdmin):
 class VehicleAdmin(admin.ModelAdmin):
     list_display = ('brand', 'name', 'year', 'registration_number')
     list_filter = ('brand', 'year')
-    search_fields = ('name', 'brand__name', 'registration_number')
+    search_fields = ('name', 'brand__name', 'registration_number', 'registration_key')
+    actions = ('recompute_totals',)
+
+    @admin.action(description="Recompute totals from expenses")
+    def recompute_totals(self, request, queryset):
+        updated = reconcile_totals(queryset.values_list('pk', flat=True))
+        self.message_user(request, f"Recomputed totals for {updated} vehicle(s).")
 
 
 @admin.register(ExpenseCategory)
@@ -0,0 +1,146 @@
+import datetime
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import BigIntegerField, F, Value
+from django.db.models.functions import Cast, Coalesce, ExtractMonth, ExtractYear, Round
+from django.utils import timezone
+
+from .models import Vehicle
+from .summary import attach_related
+
+CHUNK_SIZE = 20000
+# Stands in for a missing category, since the arrays hold integers only.
+UNCATEGORIZED = 0
+
+
+def load_expense_columns(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Stream ``(vehicle_id, category_id, month, cents)`` for every expense in
+    ``queryset`` into four int64 arrays. The database computes the month
+    (``year * 12 + month - 1``) and the amount in cents, so Python only
+    handles integers, and rows are converted to NumPy a chunk at a time.
+    """
+    rows = queryset.order_by().values_list(
+        "vehicle_id",
+        Coalesce("category_id", Value(UNCATEGORIZED)),
+        ExtractYear("date") * 12 + ExtractMonth("date") - 1,
+        Cast(Round(F("amount") * 100), BigIntegerField()),
+    )
+    chunks, batch = [], []
+    for row in rows.iterator(chunk_size=chunk_size):
+        batch.append(row)
+        if len(batch) == chunk_size:
+            chunks.append(np.array(batch, dtype=np.int64))
+            batch = []
+    if batch:
+        chunks.append(np.array(batch, dtype=np.int64))
+    columns = np.concatenate(chunks) if chunks else np.empty((0, 4), dtype=np.int64)
+    return tuple(columns.T)
+
+
+def _money(cents):
+    return Decimal(int(round(cents))).scaleb(-2)
+
+
+def _share(cents, total):
+    # Zero-amount or cancelling expenses can leave nothing to share out.
+    return float(cents / total) if total else 0.0
+
+
+def _month_start(month):
+    return datetime.date(int(month) // 12, int(month) % 12 + 1, 1)
+
+
+def monthly_costs(first_month, costs):
+    """
+    One row per month from ``first_month`` for an array of monthly costs in
+    cents: the month's total, the running total, and the change from the
+    previous month (absolute and relative).
+    """
+    running = np.cumsum(costs)
+    previous = np.concatenate(([0.0], costs[:-1]))
+    delta = costs - previous
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta_percent = np.where(previous > 0, delta / previous * 100, np.nan)
+    return [
+        {
+            "month": _month_start(first_month + i),
+            "total": _money(costs[i]),
+            "running_total": _money(running[i]),
+            "delta": _money(delta[i]) if i else None,
+            "delta_percent": None if np.isnan(delta_percent[i]) else round(float(delta_percent[i]), 2),
+        }
+        for i in range(len(costs))
+    ]
+
+
+def fleet_analytics(queryset, today=None):
+    """
+    Cost analytics over an expense queryset, computed with vectorized NumPy
+    passes over its columns:
+
+    - ``vehicles``: per vehicle total, expense count, age in years (from
+      ``Vehicle.year``, counting the model year), cost per year of age and
+      share of the fleet total (0 when that total is 0), most expensive
+      first. ``monthly`` holds the
+      vehicle's month-by-month costs for monthly_costs().
+    - ``months``: the fleet's monthly totals, running total and
+      month-over-month deltas, including months without expenses.
+    - ``categories``: total and share of the fleet total per category.
+    """
+    today = today or timezone.localdate()
+    vehicle_ids, category_ids, months, cents = load_expense_columns(queryset)
+    if not len(cents):
+        return {"total": Decimal("0.00"), "count": 0, "vehicles": [], "months": [], "categories": []}
+
+    total = cents.sum()
+    vehicles, vehicle_index = np.unique(vehicle_ids, return_inverse=True)
+    first_month = int(months.min())
+    month_count = int(months.max()) - first_month + 1
+
+    # Vehicles x months cost matrix, filled in one bincount.
+    matrix = np.bincount(
+        vehicle_index * month_count + (months - first_month),
+        weights=cents,
+        minlength=len(vehicles) * month_count,
+    ).reshape(len(vehicles), month_count)
+    vehicle_totals = matrix.sum(axis=1)
+    vehicle_counts = np.bincount(vehicle_index, minlength=len(vehicles))
+
+    years = dict(Vehicle.objects.filter(pk__in=vehicles.tolist()).values_list("pk", "year"))
+    model_years = np.array([years.get(int(pk), today.year) for pk in vehicles])
+    ages = np.maximum(today.year - model_years + 1, 1)
+    per_year = vehicle_totals / ages
+
+    vehicle_rows = [
+        {
+            "vehicle": int(vehicles[i]),
+            "total": _money(vehicle_totals[i]),
+            "count": int(vehicle_counts[i]),
+            "age_years": int(ages[i]),
+            "cost_per_year": _money(per_year[i]),
+            "share": _share(vehicle_totals[i], total),
+            "monthly": (first_month, matrix[i]),
+        }
+        for i in np.argsort(-vehicle_totals, kind="stable")
+    ]
+
+    categories, category_index = np.unique(category_ids, return_inverse=True)
+    category_totals = np.bincount(category_index, weights=cents)
+    category_rows = [
+        {
+            "category": int(categories[i]) if categories[i] != UNCATEGORIZED else None,
+            "total": _money(category_totals[i]),
+            "share": _share(category_totals[i], total),
+        }
+        for i in np.argsort(-category_totals, kind="stable")
+    ]
+
+    return {
+        "total": _money(total),
+        "count": len(cents),
+        "vehicles": attach_related(vehicle_rows, ["vehicle"]),
+        "months": monthly_costs(first_month, matrix.sum(axis=0)),
+        "categories": attach_related(category_rows, ["category"]),
+    }
@@ -0,0 +1,128 @@
+import csv
+import io
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from graphql_relay import from_global_id
+
+from .models import Vehicle, ExpenseCategory, VehicleExpense
+from .rollups import record_bulk_create
+from .totals import record_bulk_totals
+from core.search import index_objects
+from utils.response_cache import invalidate
+
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ROWS = 50000
+CSV_COLUMNS = ("vehicle", "category", "amount", "date", "description")
+# GraphQL type named by a relay global ID accepted for each id column.
+GLOBAL_ID_TYPES = {"vehicle": "VehicleType", "category": "ExpenseCategoryType"}
+
+
+class ImportRowError:
+    def __init__(self, row, field, messages):
+        self.row = row
+        self.field = field
+        self.messages = messages
+
+
+def _parse_id(value, type_name):
+    """A database id from a plain integer or a relay global ID of ``type_name``."""
+    if value in (None, ""):
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return int(value)
+    global_id = from_global_id(value)
+    if global_id.type != type_name:
+        raise ValueError(f"Not a {type_name} id: {value!r}")
+    return int(global_id.id)
+
+
+def read_csv_rows(upload):
+    """
+    Read expense rows from an uploaded CSV file with a header row naming the
+    CSV_COLUMNS (vehicle and category are IDs, plain or relay global IDs).
+    """
+    reader = csv.DictReader(io.TextIOWrapper(upload, encoding="utf-8-sig", newline=""))
+    missing = {"vehicle", "amount"} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(sorted(missing))}")
+    for row in reader:
+        yield {column: (row.get(column) or "").strip() for column in CSV_COLUMNS}
+
+
+def import_expenses(rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Validate and insert expense rows in chunks with bulk_create.
+
+    Each row is a mapping with vehicle, category, amount, date and description.
+    Vehicle and category IDs are checked against sets loaded with one query
+    each. Invalid rows are reported as ImportRowError (``row`` is 1-based)
+    and skipped, while valid rows are still written.
+    Returns (created_count, errors).
+    """
+    parsed, errors = [], []
+    for index, row in enumerate(rows, start=1):
+        if index > MAX_IMPORT_ROWS:
+            raise ValueError(f"Imports are limited to {MAX_IMPORT_ROWS} rows.")
+        values = {}
+        for name in ("vehicle", "category"):
+            try:
+                values[name] = _parse_id(row.get(name), GLOBAL_ID_TYPES[name])
+            except ValueError:
+                errors.append(ImportRowError(index, name, [f"Invalid {name} id."]))
+        if "vehicle" in values and values["vehicle"] is None:
+            errors.append(ImportRowError(index, "vehicle", ["This field is required."]))
+        for name in ("amount", "date", "description"):
+            field = VehicleExpense._meta.get_field(name)
+            raw = row.get(name)
+            if raw in (None, "") and name != "amount":
+                values[name] = timezone.localdate() if name == "date" else ""
+                continue
+            try:
+                values[name] = field.clean(raw, None)
+            except ValidationError as e:
+                errors.append(ImportRowError(index, name, e.messages))
+        parsed.append((index, values))
+
+    vehicle_ids = set(
+        Vehicle.objects.filter(pk__in={v["vehicle"] for _, v in parsed if v.get("vehicle")})
+        .values_list("pk", flat=True)
+    )
+    category_ids = set(
+        ExpenseCategory.objects.filter(pk__in={v["category"] for _, v in parsed if v.get("category")})
+        .values_list("pk", flat=True)
+    )
+
+    failed = {error.row for error in errors}
+    expenses = []
+    for index, values in parsed:
+        if index in failed:
+            continue
+        if values["vehicle"] not in vehicle_ids:
+            errors.append(ImportRowError(index, "vehicle", [f"Vehicle {values['vehicle']} does not exist."]))
+            continue
+        if values["category"] is not None and values["category"] not in category_ids:
+            errors.append(ImportRowError(index, "category", [f"Category {values['category']} does not exist."]))
+            continue
+        expenses.append(VehicleExpense(
+            vehicle_id=values["vehicle"],
+            category_id=values["category"],
+            amount=values["amount"],
+            date=values["date"],
+            description=values["description"],
+        ))
+
+    with transaction.atomic():
+        for start in range(0, len(expenses), batch_size):
+            VehicleExpense.objects.bulk_create(expenses[start:start + batch_size])
+        record_bulk_create(expenses)
+        record_bulk_totals(expenses)
+        # bulk_create sends no post_save, so index the expenses and drop
+        # cached responses here.
+        index_objects("expense", expenses)
+        invalidate(VehicleExpense)
+
+    errors.sort(key=lambda error: error.row)
+    return len(expenses), errors
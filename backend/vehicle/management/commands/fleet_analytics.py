@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from vehicle.analytics import fleet_analytics, monthly_costs
+from vehicle.filters import VehicleExpenseFilter
+from vehicle.models import VehicleExpense
+
+
+class Command(BaseCommand):
+    help = "Report cost per vehicle, cost per year of vehicle age, monthly deltas and category shares."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vehicle", dest="vehicle_id", help="Only this vehicle's expenses.")
+        parser.add_argument("--category", dest="category_id", help="Only this category's expenses.")
+        parser.add_argument("--start-date", help="First expense date (YYYY-MM-DD).")
+        parser.add_argument("--end-date", help="Last expense date (YYYY-MM-DD).")
+        parser.add_argument("--json", action="store_true", help="Print the full report as JSON.")
+
+    def handle(self, *args, **options):
+        filters = {
+            key: options[key]
+            for key in ("vehicle_id", "category_id", "start_date", "end_date")
+            if options[key]
+        }
+        filterset = VehicleExpenseFilter(data=filters, queryset=VehicleExpense.objects.all())
+        if not filterset.is_valid():
+            raise CommandError(filterset.errors.as_text())
+        report = fleet_analytics(filterset.qs)
+
+        if options["json"]:
+            for row in report["vehicles"]:
+                row["months"] = monthly_costs(*row.pop("monthly"))
+                row["vehicle"] = row["vehicle"].registration_number if row["vehicle"] else None
+            for row in report["categories"]:
+                row["category"] = row["category"].name if row["category"] else None
+            self.stdout.write(json.dumps(report, cls=DjangoJSONEncoder, indent=2))
+            return
+
+        self.stdout.write(f"{report['count']} expense(s), total {report['total']}")
+        self.stdout.write("\nVehicle                  Total    Count  Age  Per year   Share")
+        for row in report["vehicles"]:
+            name = row["vehicle"].registration_number if row["vehicle"] else "?"
+            self.stdout.write(
+                f"{name:<20} {row['total']:>12} {row['count']:>6} {row['age_years']:>4} "
+                f"{row['cost_per_year']:>10} {row['share']:>6.1%}"
+            )
+        self.stdout.write("\nMonth         Total        Delta    Delta %")
+        for row in report["months"]:
+            delta = "" if row["delta"] is None else row["delta"]
+            percent = "" if row["delta_percent"] is None else f"{row['delta_percent']:.1f}%"
+            self.stdout.write(f"{row['month']:%Y-%m} {row['total']:>12} {delta:>12} {percent:>10}")
+        self.stdout.write("\nCategory             Total   Share")
+        for row in report["categories"]:
+            name = row["category"].name if row["category"] else "Uncategorized"
+            self.stdout.write(f"{name:<16} {row['total']:>12} {row['share']:>6.1%}")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vehicle.rollups import find_drift, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly expense rollup table from raw expenses, or check it for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report rollups that differ from the raw expenses; exit non-zero on drift.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            drift = find_drift()
+            for (vehicle_id, category_id, month), stored, expected in drift:
+                self.stdout.write(
+                    f"vehicle={vehicle_id} category={category_id} month={month:%Y-%m} "
+                    f"stored={stored} expected={expected}"
+                )
+            if drift:
+                raise CommandError(f"{len(drift)} rollup row(s) drifted from raw expenses.")
+            self.stdout.write(self.style.SUCCESS("Rollups match raw expenses."))
+            return
+
+        created = rebuild_rollups(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} rollup row(s)."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vehicle.totals import find_drift, reconcile_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount each vehicle's expense counters (lifetime total, expense count, last expense date, "
+        "current month total) where they drifted from raw expenses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report vehicles whose counters differ from the raw expenses; exit non-zero on drift.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        drift = find_drift()
+        if options["check"]:
+            for vehicle_id, stored, expected in drift:
+                self.stdout.write(f"vehicle={vehicle_id} stored={stored} expected={expected}")
+            if drift:
+                raise CommandError(f"{len(drift)} vehicle(s) drifted from raw expenses.")
+            self.stdout.write(self.style.SUCCESS("Vehicle totals match raw expenses."))
+            return
+
+        updated = reconcile_totals([vehicle_id for vehicle_id, _, _ in drift], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {updated} vehicle(s)."))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_rollups(apps, schema_editor):
+    VehicleExpense = apps.get_model('vehicle', 'VehicleExpense')
+    VehicleExpenseMonthlyRollup = apps.get_model('vehicle', 'VehicleExpenseMonthlyRollup')
+    rows = (
+        VehicleExpense.objects.order_by()
+        .annotate(month=TruncMonth('date'))
+        .values('vehicle_id', 'category_id', 'month')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+    VehicleExpenseMonthlyRollup.objects.bulk_create(
+        (VehicleExpenseMonthlyRollup(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle', '0003_expensecategory_emoji'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleExpenseMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='vehicle.expensecategory')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='vehicle.vehicle')),
+            ],
+            options={
+                'verbose_name': 'Monthly Expense Rollup',
+                'verbose_name_plural': 'Monthly Expense Rollups',
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['month'], name='vehicle_veh_month_7d01d8_idx'), models.Index(fields=['category', 'month'], name='vehicle_veh_categor_5fe1f5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vehicle', 'category', 'month'), name='unique_vehicle_category_month_rollup')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+import re
+
+from django.db import migrations, models
+
+
+def normalize_registration(value):
+    # A copy of vehicle.models.normalize_registration as of this migration.
+    return re.sub(r'[\W_]+', '', value or '').upper()
+
+
+def populate_registration_keys(apps, schema_editor):
+    Vehicle = apps.get_model('vehicle', 'Vehicle')
+    vehicles = list(Vehicle.objects.only('registration_number'))
+    for vehicle in vehicles:
+        vehicle.registration_key = normalize_registration(vehicle.registration_number)
+    Vehicle.objects.bulk_update(vehicles, ['registration_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle', '0004_vehicleexpensemonthlyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='registration_key',
+            field=models.CharField(default='', editable=False, help_text='Registration number upper-cased, without spaces or separators', max_length=20),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_registration_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['registration_key'], name='vehicle_registration_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
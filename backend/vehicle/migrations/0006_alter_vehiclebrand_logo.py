@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:08
+
+import utils.storage
+import vehicle.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle', '0005_vehicle_registration_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vehiclebrand',
+            name='logo',
+            field=models.ImageField(blank=True, null=True, storage=utils.storage.get_content_addressed_storage, upload_to=vehicle.models.get_brand_logo_upload_path),
+        ),
+    ]
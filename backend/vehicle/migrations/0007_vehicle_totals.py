@@ -0,0 +1,67 @@
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+
+def populate_totals(apps, schema_editor):
+    Vehicle = apps.get_model('vehicle', 'Vehicle')
+    VehicleExpense = apps.get_model('vehicle', 'VehicleExpense')
+    month = timezone.localdate().replace(day=1)
+    totals = {
+        row['vehicle_id']: row
+        for row in VehicleExpense.objects.order_by().values('vehicle_id').annotate(
+            total=Sum('amount'),
+            count=Count('id'),
+            latest=Max('date'),
+            month_total=Sum('amount', filter=Q(date__year=month.year, date__month=month.month)),
+        )
+    }
+    vehicles = list(Vehicle.objects.filter(pk__in=totals).only('pk'))
+    for vehicle in vehicles:
+        row = totals[vehicle.pk]
+        vehicle.lifetime_total = row['total']
+        vehicle.expense_count = row['count']
+        vehicle.last_expense_date = row['latest']
+        vehicle.running_month = month
+        vehicle.running_month_total = row['month_total'] or 0
+    Vehicle.objects.bulk_update(
+        vehicles,
+        ['lifetime_total', 'expense_count', 'last_expense_date', 'running_month', 'running_month_total'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle', '0006_alter_vehiclebrand_logo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='lifetime_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='expense_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='last_expense_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='running_month',
+            field=models.DateField(blank=True, editable=False, help_text='First day of the month running_month_total covers', null=True),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='running_month_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
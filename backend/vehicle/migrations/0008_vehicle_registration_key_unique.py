@@ -0,0 +1,39 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_registration_collisions(apps, schema_editor):
+    Vehicle = apps.get_model('vehicle', 'Vehicle')
+    keys = (
+        Vehicle.objects.order_by().values('registration_key')
+        .annotate(vehicles=Count('id')).filter(vehicles__gt=1).values_list('registration_key', flat=True)
+    )
+    collisions = {}
+    for key, number in Vehicle.objects.filter(registration_key__in=list(keys)).order_by('registration_key', 'pk').values_list('registration_key', 'registration_number'):
+        collisions.setdefault(key, []).append(number)
+    if collisions:
+        lines = '\n'.join(f'  {key}: {", ".join(numbers)}' for key, numbers in collisions.items())
+        raise RuntimeError(
+            'These vehicles have registration numbers that only differ in case or separators; '
+            f'rename or merge them before migrating:\n{lines}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle', '0007_vehicle_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_registration_collisions, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='vehicle',
+            name='vehicle_registration_key_idx',
+        ),
+        migrations.AlterField(
+            model_name='vehicle',
+            name='registration_key',
+            field=models.CharField(editable=False, help_text='Registration number upper-cased, without spaces or separators', max_length=20, unique=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:49
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_uncategorized_rollups(apps, schema_editor):
+    # Concurrent writers could leave several uncategorized rows for one
+    # vehicle and month while only the NULL-distinct constraint existed.
+    Rollup = apps.get_model('vehicle', 'VehicleExpenseMonthlyRollup')
+    duplicates = (
+        Rollup.objects.filter(category__isnull=True).order_by().values('vehicle_id', 'month')
+        .annotate(rows=Count('id'), keep=Min('id'), merged_total=Sum('total'), merged_count=Sum('count'))
+        .filter(rows__gt=1)
+    )
+    for row in list(duplicates):
+        rows = Rollup.objects.filter(category__isnull=True, vehicle_id=row['vehicle_id'], month=row['month'])
+        rows.exclude(pk=row['keep']).delete()
+        rows.update(total=row['merged_total'], count=row['merged_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle', '0008_vehicle_registration_key_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_uncategorized_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vehicleexpensemonthlyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('vehicle', 'month'), name='unique_vehicle_month_uncategorized_rollup'),
+        ),
+    ]
@@ -1,19 +1,34 @@
-import uuid
+import re
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
+from utils.models import TrackLoadedValuesMixin
+from utils.storage import get_content_addressed_storage
 
 
 def get_brand_logo_upload_path(instance, filename: str) -> str:
-    extension = filename.split('.')[-1]
-    return f"vehicle_brands/logos/{uuid.uuid4()}.{extension}"
+    # The storage replaces the file name with a hash of its content.
+    return f"vehicle_brands/logos/{filename}"
 
 
-class VehicleBrand(models.Model):
+def normalize_registration(value: str) -> str:
+    """'tn 01 at-1234' -> 'TN01AT1234'."""
+    return re.sub(r"[\W_]+", "", value or "").upper()
+
+
+class VehicleBrand(TrackLoadedValuesMixin, models.Model):
     """
     Represents a vehicle brand (e.g., Toyota, Ford, BMW).
     """
+    tracked_fields = ("logo",)
+
     name = models.CharField(max_length=100, unique=True, db_index=True)
-    logo = models.ImageField(upload_to=get_brand_logo_upload_path, blank=True, null=True)
+    logo = models.ImageField(
+        upload_to=get_brand_logo_upload_path,
+        storage=get_content_addressed_storage,
+        blank=True,
+        null=True
+    )
 
     class Meta:
         verbose_name = "Brand"
@@ -28,6 +43,11 @@ class Vehicle(models.Model):
     """
     Represents a vehicle belonging to a specific brand.
     """
+    # Maintained from its expenses by vehicle.totals; save() never writes them.
+    counter_fields = (
+        "lifetime_total", "expense_count", "last_expense_date", "running_month", "running_month_total",
+    )
+
     brand = models.ForeignKey(
         VehicleBrand, 
         on_delete=models.PROTECT,
@@ -36,14 +56,73 @@ class Vehicle(models.Model):
     name = models.CharField(max_length=100, db_index=True)
     year = models.PositiveIntegerField()
     registration_number = models.CharField(max_length=20, unique=True, db_index=True, help_text="Unique registration number (e.g., TN 01 AT 1234)")
+    registration_key = models.CharField(
+        max_length=20,
+        unique=True,
+        editable=False,
+        help_text="Registration number upper-cased, without spaces or separators"
+    )
+    lifetime_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    expense_count = models.PositiveIntegerField(default=0, editable=False)
+    last_expense_date = models.DateField(null=True, blank=True, editable=False)
+    running_month = models.DateField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="First day of the month running_month_total covers"
+    )
+    running_month_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
 
     class Meta:
         verbose_name = "Vehicle"
         verbose_name_plural = "Vehicles"
+        # registration_key's unique index serves exact lookups; on PostgreSQL
+        # Django adds a varchar_pattern_ops index for prefix (LIKE 'KEY%') ones.
         ordering = ["brand__name", "name"]
 
     def __str__(self) -> str:
         return f"{self.brand.name} {self.name} ({self.year})"
+
+    @classmethod
+    def registration_taken(cls, registration_number, exclude_pk=None):
+        """Whether another vehicle's number normalizes to the same key."""
+        key = normalize_registration(registration_number)
+        return cls.objects.filter(registration_key=key).exclude(pk=exclude_pk).exists()
+
+    def clean(self):
+        super().clean()
+        if self.registration_taken(self.registration_number, exclude_pk=self.pk):
+            raise ValidationError({
+                "registration_number": "A vehicle with this registration number already exists.",
+            })
+
+    def save(self, *args, **kwargs):
+        """
+        Save the vehicle, keeping registration_key in step with its number.
+
+        A plain save() of an existing row leaves out the counter_fields, since
+        the values on this instance may be stale by the time it is saved. New
+        rows (fixtures, seed data, admin "add") are written whole, as is any
+        save() that passes update_fields, so save(update_fields=[...]) still
+        writes counters on purpose. recompute_totals() recounts them.
+        """
+        self.registration_key = normalize_registration(self.registration_number)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "registration_number" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "registration_key"}
+        elif update_fields is None and not self._state.adding and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+    def recompute_totals(self):
+        """Recount the counter_fields from this vehicle's expenses and reload them."""
+        from .totals import reconcile_totals
+
+        reconcile_totals([self.pk])
+        self.refresh_from_db(fields=self.counter_fields)
     
 
 class ExpenseCategory(models.Model):
@@ -62,10 +141,12 @@ class ExpenseCategory(models.Model):
         return self.name
 
 
-class VehicleExpense(models.Model):
+class VehicleExpense(TrackLoadedValuesMixin, models.Model):
     """
     Tracks expenses associated with a specific vehicle.
     """
+    tracked_fields = ("vehicle_id", "category_id", "amount", "date")
+
     vehicle = models.ForeignKey(
         "Vehicle", 
         on_delete=models.CASCADE,
@@ -95,4 +176,47 @@ class VehicleExpense(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.vehicle} - {self.category or 'Uncategorized'} - ${self.amount} ({self.date})"
\ No newline at end of file
+        return f"{self.vehicle} - {self.category or 'Uncategorized'} - ${self.amount} ({self.date})"
+
+
+class VehicleExpenseMonthlyRollup(models.Model):
+    """
+    Sum and count of expenses per (vehicle, category, month), kept up to date
+    by the VehicleExpense signal handlers in vehicle/signals.py.
+    """
+    vehicle = models.ForeignKey(
+        Vehicle,
+        on_delete=models.CASCADE,
+        related_name="monthly_rollups"
+    )
+    category = models.ForeignKey(
+        ExpenseCategory,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="monthly_rollups"
+    )
+    month = models.DateField(help_text="First day of the month")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Monthly Expense Rollup"
+        verbose_name_plural = "Monthly Expense Rollups"
+        ordering = ["-month"]
+        constraints = [
+            models.UniqueConstraint(fields=['vehicle', 'category', 'month'], name='unique_vehicle_category_month_rollup'),
+            # NULLs are distinct above, so "uncategorized" rows need their own.
+            models.UniqueConstraint(
+                fields=['vehicle', 'month'],
+                condition=models.Q(category__isnull=True),
+                name='unique_vehicle_month_uncategorized_rollup',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['month']),
+            models.Index(fields=['category', 'month']),
+        ]
+
+    def __str__(self):
+        return f"{self.vehicle_id} - {self.category_id or 'Uncategorized'} - {self.month:%Y-%m}: {self.total}"
@@ -0,0 +1,125 @@
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import VehicleExpense, VehicleExpenseMonthlyRollup
+
+
+def month_of(value):
+    """
+    First day of the month for a date, datetime or ISO string, converted the
+    same way DateField converts values before they are stored.
+    """
+    return VehicleExpense._meta.get_field("date").to_python(value).replace(day=1)
+
+
+def rollup_key(values):
+    return (values["vehicle_id"], values["category_id"], month_of(values["date"]))
+
+
+def amount_of(values):
+    return VehicleExpense._meta.get_field("amount").to_python(values["amount"])
+
+
+def apply_delta(vehicle_id, category_id, month, total, count):
+    rows = VehicleExpenseMonthlyRollup.objects.filter(
+        vehicle_id=vehicle_id, category_id=category_id, month=month
+    )
+    if rows.update(total=F("total") + total, count=F("count") + count):
+        if count < 0:
+            rows.filter(count=0).delete()
+        return
+    if count <= 0:
+        # The row is already gone, e.g. the vehicle is being cascade-deleted.
+        return
+    try:
+        with transaction.atomic():
+            VehicleExpenseMonthlyRollup.objects.create(
+                vehicle_id=vehicle_id, category_id=category_id, month=month,
+                total=total, count=count,
+            )
+    except IntegrityError:
+        rows.update(total=F("total") + total, count=F("count") + count)
+
+
+def record_change(previous, current):
+    """
+    Move an expense's contribution from its ``previous`` values to its
+    ``current`` values. Either side may be None for creates and deletes.
+    """
+    if previous and current and rollup_key(previous) == rollup_key(current):
+        delta = amount_of(current) - amount_of(previous)
+        if delta:
+            apply_delta(*rollup_key(current), delta, 0)
+        return
+    if previous:
+        apply_delta(*rollup_key(previous), -amount_of(previous), -1)
+    if current:
+        apply_delta(*rollup_key(current), amount_of(current), 1)
+
+
+def record_bulk_create(expenses):
+    """
+    Add expenses written with bulk_create, which does not send signals.
+    """
+    totals = {}
+    for expense in expenses:
+        values = {name: getattr(expense, name) for name in VehicleExpense.tracked_fields}
+        key = rollup_key(values)
+        total, count = totals.get(key, (0, 0))
+        totals[key] = (total + amount_of(values), count + 1)
+    for key, (total, count) in totals.items():
+        apply_delta(*key, total, count)
+
+
+def fold_category(category):
+    """
+    Move a category's rollups to "uncategorized" before the category is deleted
+    and its expenses are set to NULL.
+    """
+    for row in category.monthly_rollups.all():
+        apply_delta(row.vehicle_id, None, row.month, row.total, row.count)
+
+
+def computed_rollups():
+    return (
+        VehicleExpense.objects.order_by()
+        .annotate(month=TruncMonth("date"))
+        .values("vehicle_id", "category_id", "month")
+        .annotate(total=Sum("amount"), count=Count("id"))
+    )
+
+
+@transaction.atomic
+def rebuild_rollups(batch_size=1000):
+    VehicleExpenseMonthlyRollup.objects.all().delete()
+    rows = computed_rollups().iterator(chunk_size=batch_size)
+    created = 0
+    while batch := [VehicleExpenseMonthlyRollup(**row) for row in islice(rows, batch_size)]:
+        VehicleExpenseMonthlyRollup.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def find_drift():
+    """
+    Return (key, stored, expected) for every rollup that does not match the
+    raw expense rows, where stored/expected are (total, count) or None.
+    """
+    expected = {
+        (row["vehicle_id"], row["category_id"], row["month"]): (row["total"], row["count"])
+        for row in computed_rollups().iterator()
+    }
+    drift = []
+    stored_rows = VehicleExpenseMonthlyRollup.objects.values_list(
+        "vehicle_id", "category_id", "month", "total", "count"
+    )
+    for vehicle_id, category_id, month, total, count in stored_rows.iterator():
+        key = (vehicle_id, category_id, month)
+        wanted = expected.pop(key, None)
+        if wanted != (total, count):
+            drift.append((key, (total, count), wanted))
+    drift.extend((key, None, wanted) for key, wanted in expected.items())
+    return drift
@@ -0,0 +1,64 @@
+from graphql import GraphQLError
+
+from ..filters import VehicleExpenseFilter
+from ..models import Vehicle, VehicleBrand, ExpenseCategory, VehicleExpense, normalize_registration
+from ..summary import asummarize_expenses, asummarize_rollups
+from utils.optimizer import optimize
+from utils.selection import selected_fields
+from .query import VehicleQuery, vehicles_by_registration_prefix
+
+
+# VehicleQuery for the async schema, with the hot resolvers on Django's async
+# ORM. List resolvers return lists, not QuerySets, because nothing may evaluate
+# a QuerySet on the event loop. Connection fields keep their sync resolvers,
+# which SyncResolverMiddleware runs in a worker thread.
+class AsyncVehicleQuery(VehicleQuery):
+    class Meta:
+        name = "VehicleQuery"
+
+    async def resolve_vehicle_brand(self, info, id):
+        try:
+            return await optimize(VehicleBrand.objects.all(), info).aget(pk=id)
+        except VehicleBrand.DoesNotExist:
+            return None
+
+    async def resolve_vehicle(self, info, id):
+        try:
+            return await optimize(Vehicle.objects.all(), info).aget(pk=id)
+        except Vehicle.DoesNotExist:
+            return None
+
+    async def resolve_vehicles_by_brand(self, info, brand_id):
+        return [vehicle async for vehicle in optimize(Vehicle.objects.filter(brand_id=brand_id), info)]
+
+    async def resolve_vehicle_by_registration(self, info, reg):
+        key = normalize_registration(reg)
+        return await optimize(Vehicle.objects.filter(registration_key=key), info).afirst() if key else None
+
+    async def resolve_vehicles_by_registration_prefix(self, info, prefix, first):
+        return [vehicle async for vehicle in optimize(vehicles_by_registration_prefix(prefix, first), info)]
+
+    async def resolve_expense_category(self, info, id):
+        try:
+            return await optimize(ExpenseCategory.objects.all(), info).aget(pk=id)
+        except ExpenseCategory.DoesNotExist:
+            return None
+
+    async def resolve_vehicle_expense(self, info, id):
+        try:
+            return await optimize(VehicleExpense.objects.all(), info).aget(pk=id)
+        except VehicleExpense.DoesNotExist:
+            return None
+
+    async def resolve_expense_summary(self, info, group_by=None, **filters):
+        filterset = VehicleExpenseFilter(data=filters, queryset=VehicleExpense.objects.all())
+        if not filterset.is_valid():
+            raise GraphQLError(filterset.errors.as_text())
+        group_by = [g.value for g in group_by or []]
+
+        rows = None
+        if not {"min", "max"} & selected_fields(info):
+            rows = await asummarize_rollups(filterset.form.cleaned_data, group_by)
+        if rows is None:
+            rows = await asummarize_expenses(filterset.qs, group_by)
+        return rows
@@ -0,0 +1,44 @@
+from utils.dataloader import DataLoader, RelatedRowsLoader
+from ..models import Vehicle, VehicleBrand, ExpenseCategory, VehicleExpense
+
+
+class BrandByVehicleLoader(DataLoader):
+    source = Vehicle
+    key = "brand_id"
+
+    def batch_load(self, keys):
+        return VehicleBrand.objects.in_bulk(list(keys))
+
+
+class VehiclesByBrandLoader(RelatedRowsLoader):
+    source = VehicleBrand
+    model = Vehicle
+    related_key = "brand_id"
+
+
+class VehicleByExpenseLoader(DataLoader):
+    source = VehicleExpense
+    key = "vehicle_id"
+
+    def batch_load(self, keys):
+        return Vehicle.objects.in_bulk(list(keys))
+
+
+class CategoryByExpenseLoader(DataLoader):
+    source = VehicleExpense
+    key = "category_id"
+
+    def batch_load(self, keys):
+        return ExpenseCategory.objects.in_bulk(list(keys))
+
+
+class ExpensesByVehicleLoader(RelatedRowsLoader):
+    source = Vehicle
+    model = VehicleExpense
+    related_key = "vehicle_id"
+
+
+class ExpensesByCategoryLoader(RelatedRowsLoader):
+    source = ExpenseCategory
+    model = VehicleExpense
+    related_key = "category_id"
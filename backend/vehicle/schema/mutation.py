@@ -5,7 +5,11 @@ from graphene_django_cud.mutations import (
     DjangoUpdateMutation,
 )
 from graphene_file_upload.scalars import Upload
+from graphql import GraphQLError
+from graphql_jwt.decorators import permission_required
 from vehicle.models import Vehicle, VehicleBrand, ExpenseCategory, VehicleExpense
+from vehicle.imports import import_expenses, read_csv_rows
+from utils.uploads import CSV_TYPES, IMAGE_TYPES, check_upload
 
 
 class CreateVehicleBrandMutation(DjangoCreateMutation):
@@ -19,6 +23,10 @@ class CreateVehicleBrandMutation(DjangoCreateMutation):
         
         permissions = ["vehicle.add_vehiclebrand"]
 
+    @classmethod
+    def validate_logo(cls, root, info, value, input, *args, **kwargs):
+        check_upload(value, IMAGE_TYPES)
+
 
 class UpdateVehicleBrandMutation(DjangoUpdateMutation):
     class Meta:
@@ -30,6 +38,10 @@ class UpdateVehicleBrandMutation(DjangoUpdateMutation):
         }
         permissions = ["vehicle.change_vehiclebrand"]
 
+    @classmethod
+    def validate_logo(cls, root, info, value, input, *args, **kwargs):
+        check_upload(value, IMAGE_TYPES)
+
 
 class DeleteVehicleBrandMutation(DjangoDeleteMutation):
     class Meta:
@@ -37,6 +49,11 @@ class DeleteVehicleBrandMutation(DjangoDeleteMutation):
         permissions = ["vehicle.delete_vehiclebrand"]
 
 
+def check_registration(registration_number, exclude_pk=None):
+    if Vehicle.registration_taken(registration_number, exclude_pk=exclude_pk):
+        raise GraphQLError("A vehicle with this registration number already exists.")
+
+
 class CreateVehicleMutation(DjangoCreateMutation):
     class Meta:
         model = Vehicle
@@ -50,6 +67,10 @@ class CreateVehicleMutation(DjangoCreateMutation):
         
         permissions = ["vehicle.add_vehicle"]
 
+    @classmethod
+    def validate_registration_number(cls, root, info, value, input, *args, **kwargs):
+        check_registration(value)
+
 
 class UpdateVehicleMutation(DjangoUpdateMutation):
     class Meta:
@@ -63,6 +84,10 @@ class UpdateVehicleMutation(DjangoUpdateMutation):
         }
         permissions = ["vehicle.change_vehicle"]
 
+    @classmethod
+    def validate_registration_number(cls, root, info, value, input, id, obj, *args, **kwargs):
+        check_registration(value, exclude_pk=obj.pk)
+
 
 class DeleteVehicleMutation(DjangoDeleteMutation):
     class Meta:
@@ -128,3 +153,52 @@ class DeleteVehicleExpenseMutation(DjangoDeleteMutation):
     class Meta:
         model = VehicleExpense
         permissions = ["vehicle.delete_vehicleexpense"]
+
+
+class VehicleExpenseInput(graphene.InputObjectType):
+    vehicle = graphene.ID(required=True)
+    category = graphene.ID()
+    description = graphene.String()
+    amount = graphene.Decimal(required=True)
+    date = graphene.Date()
+
+
+class ExpenseImportErrorType(graphene.ObjectType):
+    row = graphene.Int(required=True, description="1-based position of the row in the input")
+    field = graphene.String()
+    messages = graphene.List(graphene.NonNull(graphene.String), required=True)
+
+
+class BulkCreateVehicleExpensesMutation(graphene.Mutation):
+    class Arguments:
+        expenses = graphene.List(graphene.NonNull(VehicleExpenseInput), required=True)
+
+    created_count = graphene.Int(required=True)
+    errors = graphene.List(graphene.NonNull(ExpenseImportErrorType), required=True)
+
+    @classmethod
+    @permission_required("vehicle.add_vehicleexpense")
+    def mutate(cls, root, info, expenses):
+        try:
+            created_count, errors = import_expenses(dict(expense) for expense in expenses)
+        except ValueError as e:
+            raise GraphQLError(str(e))
+        return cls(created_count=created_count, errors=errors)
+
+
+class ImportVehicleExpensesCsvMutation(graphene.Mutation):
+    class Arguments:
+        file = Upload(required=True)
+
+    created_count = graphene.Int(required=True)
+    errors = graphene.List(graphene.NonNull(ExpenseImportErrorType), required=True)
+
+    @classmethod
+    @permission_required("vehicle.add_vehicleexpense")
+    def mutate(cls, root, info, file):
+        check_upload(file, CSV_TYPES)
+        try:
+            created_count, errors = import_expenses(read_csv_rows(file))
+        except (ValueError, UnicodeDecodeError) as e:
+            raise GraphQLError(f"Error importing expenses: {str(e)}")
+        return cls(created_count=created_count, errors=errors)
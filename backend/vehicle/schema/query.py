@@ -1,27 +1,106 @@
 import graphene
+from graphql import GraphQLError
 from graphene_django import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
 from graphene import relay
-from ..models import Vehicle, VehicleBrand, ExpenseCategory, VehicleExpense
+from ..models import Vehicle, VehicleBrand, ExpenseCategory, VehicleExpense, normalize_registration
 from ..filters import VehicleExpenseFilter
+from ..analytics import fleet_analytics, monthly_costs
+from ..summary import summarize_expenses, summarize_rollups
+from ..totals import current_month_total
+from utils.dataloader import get_loaders, resolve_related
+from utils.complexity import bounded_list
+from utils.images import image_variants_field, max_variants, resolve_image_variants
+from utils.lookups import prefix_filter
+from utils.optimizer import optimize
+from utils.selection import selected_fields
+from utils.pagination import (
+    CountableConnection,
+    DataLoaderConnectionField,
+    KeysetConnectionField,
+    check_page_size,
+    window_queryset,
+)
+from utils.response_cache import cacheable
+from .loaders import (
+    BrandByVehicleLoader,
+    VehiclesByBrandLoader,
+    VehicleByExpenseLoader,
+    CategoryByExpenseLoader,
+    ExpensesByVehicleLoader,
+    ExpensesByCategoryLoader,
+)
+
+MAX_REGISTRATION_MATCHES = 50
+MAX_BRAND_VEHICLES = 100
+
+
+def vehicles_by_registration_prefix(prefix, first):
+    """Vehicles whose registration key starts with ``prefix``, normalized the same way."""
+    key = normalize_registration(prefix)
+    first = max(0, min(first, MAX_REGISTRATION_MATCHES))
+    if not key or not first:
+        return Vehicle.objects.none()
+    return Vehicle.objects.filter(prefix_filter("registration_key", key)).order_by("registration_key")[:first]
 
 
 class VehicleBrandType(DjangoObjectType):
     class Meta:
         model = VehicleBrand
         fields = "__all__"
+        filter_fields = {"name": ["exact", "icontains", "istartswith"]}
+        use_connection = True
+        connection_class = CountableConnection
+
+    # Declared, or the reverse relation would become a connection now that
+    # VehicleType has one. Capped, so its cost has a bound.
+    vehicles = graphene.List(
+        graphene.NonNull(lambda: VehicleType),
+        required=True,
+        first=graphene.Int(default_value=20, description=f"At most {MAX_BRAND_VEHICLES}, oldest first."),
+    )
+    logo_variants = image_variants_field()
+
+    def resolve_logo_variants(self, info, format=None):
+        return resolve_image_variants(self.logo, format)
+
+    def resolve_vehicles(self, info, first):
+        check_page_size(info.field_name, MAX_BRAND_VEHICLES, first, kind="list")
+
+        def first_vehicles(queryset):
+            return window_queryset(queryset.order_by("pk"), "brand_id", 0, first=first)
+
+        # Every brand's first vehicles in one query, keeping one past the page.
+        loader = get_loaders(info).get(VehiclesByBrandLoader, ("first", first), first_vehicles)
+        return loader.load_for(self)[:first]
 
 
 class VehicleType(DjangoObjectType):
     class Meta:
         model = Vehicle
-        fields = "__all__"
+        exclude = ("registration_key", "running_month", "running_month_total")
+        filter_fields = {"name": ["exact", "icontains"], "year": ["exact", "gte", "lte"]}
+        use_connection = True
+        connection_class = CountableConnection
+
+    expenses = DataLoaderConnectionField(lambda: VehicleExpenseType, ExpensesByVehicleLoader, required=True)
+    current_month_total = graphene.Decimal(required=True)
+
+    def resolve_brand(self, info):
+        return resolve_related(self, info, "brand", BrandByVehicleLoader)
+
+    def resolve_current_month_total(self, info):
+        return current_month_total(self)
 
 
 class ExpenseCategoryType(DjangoObjectType):
     class Meta:
         model = ExpenseCategory
         fields = "__all__"
+        filter_fields = {"name": ["exact", "icontains"]}
+        use_connection = True
+        connection_class = CountableConnection
+
+    expenses = DataLoaderConnectionField(lambda: VehicleExpenseType, ExpensesByCategoryLoader, required=True)
 
 
 class VehicleExpenseType(DjangoObjectType):
@@ -30,61 +109,217 @@ class VehicleExpenseType(DjangoObjectType):
         fields = "__all__"
         filter_fields = ['vehicle_id', 'category_id']
         interfaces = (relay.Node, )
+        connection_class = CountableConnection
+
+    def resolve_vehicle(self, info):
+        return resolve_related(self, info, "vehicle", VehicleByExpenseLoader)
+
+    def resolve_category(self, info):
+        return resolve_related(self, info, "category", CategoryByExpenseLoader)
+
+
+class ExpenseSummaryGroupBy(graphene.Enum):
+    VEHICLE = "vehicle"
+    CATEGORY = "category"
+    BRAND = "brand"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+    YEAR = "year"
+
+
+class ExpenseSummaryType(graphene.ObjectType):
+    vehicle = graphene.Field(VehicleType)
+    category = graphene.Field(ExpenseCategoryType)
+    brand = graphene.Field(VehicleBrandType)
+    day = graphene.Date()
+    week = graphene.Date()
+    month = graphene.Date()
+    year = graphene.Int()
+    total = graphene.Decimal(required=True)
+    count = graphene.Int(required=True)
+    min = graphene.Decimal()
+    max = graphene.Decimal()
+    average = graphene.Decimal()
+
+    def resolve_year(self, info):
+        year = self.get("year")
+        return year.year if year else None
+
+
+class MonthlyCostType(graphene.ObjectType):
+    month = graphene.Date(required=True)
+    total = graphene.Decimal(required=True)
+    running_total = graphene.Decimal(required=True)
+    delta = graphene.Decimal(description="Change from the previous month; null for the first month.")
+    delta_percent = graphene.Float(description="Null when the previous month had no expenses.")
+
+
+class VehicleCostType(graphene.ObjectType):
+    vehicle = graphene.Field(VehicleType)
+    total = graphene.Decimal(required=True)
+    count = graphene.Int(required=True)
+    age_years = graphene.Int(required=True)
+    cost_per_year = graphene.Decimal(required=True)
+    share = graphene.Float(required=True)
+    months = graphene.List(
+        graphene.NonNull(MonthlyCostType),
+        required=True,
+        last=graphene.Int(description="Only the most recent months."),
+    )
+
+    def resolve_months(self, info, last=None):
+        rows = monthly_costs(*self["monthly"])
+        return rows[-last:] if last else rows
+
+
+class CategoryShareType(graphene.ObjectType):
+    category = graphene.Field(ExpenseCategoryType)
+    total = graphene.Decimal(required=True)
+    share = graphene.Float(required=True)
+
+
+class FleetAnalyticsType(graphene.ObjectType):
+    total = graphene.Decimal(required=True)
+    count = graphene.Int(required=True)
+    vehicles = graphene.List(
+        graphene.NonNull(VehicleCostType),
+        required=True,
+        first=graphene.Int(description="Only the most expensive vehicles."),
+    )
+    months = graphene.List(graphene.NonNull(MonthlyCostType), required=True)
+    categories = graphene.List(graphene.NonNull(CategoryShareType), required=True)
+
+    def resolve_vehicles(self, info, first=None):
+        return self["vehicles"][:first] if first else self["vehicles"]
 
 
 class VehicleQuery(graphene.ObjectType):
-    all_vehicle_brands = graphene.List(VehicleBrandType)
+    all_vehicle_brands = KeysetConnectionField(VehicleBrandType)
     vehicle_brand = graphene.Field(VehicleBrandType, id=graphene.Int(required=True))
     
-    all_vehicles = graphene.List(VehicleType)
+    all_vehicles = KeysetConnectionField(VehicleType)
     vehicle = graphene.Field(VehicleType, id=graphene.Int(required=True))
     vehicles_by_brand = graphene.List(VehicleType, brand_id=graphene.Int(required=True))
+    vehicle_by_registration = graphene.Field(VehicleType, reg=graphene.String(required=True))
+    vehicles_by_registration_prefix = graphene.List(
+        graphene.NonNull(VehicleType),
+        required=True,
+        prefix=graphene.String(required=True),
+        first=graphene.Int(default_value=20, description=f"At most {MAX_REGISTRATION_MATCHES}."),
+    )
     
-    all_expense_categories = graphene.List(ExpenseCategoryType)
+    all_expense_categories = KeysetConnectionField(ExpenseCategoryType)
     expense_category = graphene.Field(ExpenseCategoryType, id=graphene.Int(required=True))
     
-    all_vehicle_expenses = graphene.List(VehicleExpenseType)
+    all_vehicle_expenses = KeysetConnectionField(
+        VehicleExpenseType,
+        filterset_class=VehicleExpenseFilter,
+        ordering=("-date", "-created_at", "-id"),
+    )
     vehicle_expense = graphene.Field(VehicleExpenseType, id=graphene.Int(required=True))
-    expenses = DjangoFilterConnectionField(
+    expenses = KeysetConnectionField(
         VehicleExpenseType,
-        filterset_class=VehicleExpenseFilter
+        filterset_class=VehicleExpenseFilter,
+        ordering=("-date", "-created_at", "-id"),
+    )
+    expense_summary = graphene.List(
+        graphene.NonNull(ExpenseSummaryType),
+        required=True,
+        vehicle_id=graphene.ID(),
+        category_id=graphene.ID(),
+        start_date=graphene.Date(),
+        end_date=graphene.Date(),
+        group_by=graphene.List(graphene.NonNull(ExpenseSummaryGroupBy)),
+    )
+    fleet_analytics = graphene.Field(
+        FleetAnalyticsType,
+        required=True,
+        vehicle_id=graphene.ID(),
+        category_id=graphene.ID(),
+        start_date=graphene.Date(),
+        end_date=graphene.Date(),
     )
 
-    def resolve_all_vehicle_brands(self, info):
+    def resolve_all_vehicle_brands(self, info, **kwargs):
         return VehicleBrand.objects.all()
 
     def resolve_vehicle_brand(self, info, id):
         try:
-            return VehicleBrand.objects.get(pk=id)
+            return optimize(VehicleBrand.objects.all(), info).get(pk=id)
         except VehicleBrand.DoesNotExist:
             return None
 
-    def resolve_all_vehicles(self, info):
-        return Vehicle.objects.select_related('brand').all()
+    def resolve_all_vehicles(self, info, **kwargs):
+        return Vehicle.objects.all()
 
     def resolve_vehicle(self, info, id):
         try:
-            return Vehicle.objects.select_related('brand').get(pk=id)
+            return optimize(Vehicle.objects.all(), info).get(pk=id)
         except Vehicle.DoesNotExist:
             return None
 
     def resolve_vehicles_by_brand(self, info, brand_id):
-        return Vehicle.objects.filter(brand_id=brand_id).select_related('brand')
+        return Vehicle.objects.filter(brand_id=brand_id)
+
+    def resolve_vehicle_by_registration(self, info, reg):
+        key = normalize_registration(reg)
+        return optimize(Vehicle.objects.filter(registration_key=key), info).first() if key else None
+
+    def resolve_vehicles_by_registration_prefix(self, info, prefix, first):
+        return vehicles_by_registration_prefix(prefix, first)
 
-    def resolve_all_expense_categories(self, info):
+    def resolve_all_expense_categories(self, info, **kwargs):
         return ExpenseCategory.objects.all()
 
     def resolve_expense_category(self, info, id):
         try:
-            return ExpenseCategory.objects.get(pk=id)
+            return optimize(ExpenseCategory.objects.all(), info).get(pk=id)
         except ExpenseCategory.DoesNotExist:
             return None
 
-    def resolve_all_vehicle_expenses(self, info):
-        return VehicleExpense.objects.select_related('vehicle', 'category', 'vehicle__brand').all()
+    def resolve_all_vehicle_expenses(self, info, **kwargs):
+        return VehicleExpense.objects.all()
 
     def resolve_vehicle_expense(self, info, id):
         try:
-            return VehicleExpense.objects.select_related('vehicle', 'category', 'vehicle__brand').get(pk=id)
+            return optimize(VehicleExpense.objects.all(), info).get(pk=id)
         except VehicleExpense.DoesNotExist:
             return None
+
+    def resolve_expense_summary(self, info, group_by=None, **filters):
+        filterset = VehicleExpenseFilter(data=filters, queryset=VehicleExpense.objects.all())
+        if not filterset.is_valid():
+            raise GraphQLError(filterset.errors.as_text())
+        group_by = [g.value for g in group_by or []]
+
+        # Totals, counts and averages come from the monthly rollup when possible.
+        rows = None
+        if not {"min", "max"} & selected_fields(info):
+            rows = summarize_rollups(filterset.form.cleaned_data, group_by)
+        if rows is None:
+            rows = summarize_expenses(filterset.qs, group_by)
+        return rows
+
+    def resolve_fleet_analytics(self, info, **filters):
+        filterset = VehicleExpenseFilter(data=filters, queryset=VehicleExpense.objects.all())
+        if not filterset.is_valid():
+            raise GraphQLError(filterset.errors.as_text())
+        return fleet_analytics(filterset.qs)
+
+
+for field_name in (
+    "all_vehicle_brands",
+    "vehicle_brand",
+    "all_vehicles",
+    "vehicle",
+    "vehicles_by_brand",
+    "vehicle_by_registration",
+    "vehicles_by_registration_prefix",
+    "all_expense_categories",
+    "expense_category",
+):
+    cacheable(VehicleQuery, field_name)
+cacheable(VehicleQuery, "expense_summary", VehicleExpense)
+cacheable(VehicleQuery, "fleet_analytics", VehicleExpense, Vehicle)
+bounded_list(VehicleBrandType, "logo_variants", max_variants())
@@ -0,0 +1,83 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from utils.images import get_variants
+from utils.storage import release
+from .models import ExpenseCategory, Vehicle, VehicleBrand, VehicleExpense
+from .rollups import fold_category, record_change
+from .totals import record_totals_change
+
+
+def _current_values(expense):
+    return {name: getattr(expense, name) for name in VehicleExpense.tracked_fields}
+
+
+@receiver(pre_save, sender=VehicleExpense)
+def remember_previous_expense(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._previous_values = None
+        return
+    previous = instance.get_loaded_values()
+    if previous is None:
+        previous = (
+            VehicleExpense.objects.filter(pk=instance.pk)
+            .values(*VehicleExpense.tracked_fields)
+            .first()
+        )
+    instance._previous_values = previous
+
+
+@receiver(post_save, sender=VehicleExpense)
+def update_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_values", None)
+    current = _current_values(instance)
+    record_change(previous, current)
+    record_totals_change(previous, current)
+    instance.reset_loaded_values()
+
+
+@receiver(post_delete, sender=VehicleExpense)
+def update_rollups_on_delete(sender, instance, origin=None, **kwargs):
+    previous = instance.get_loaded_values() or _current_values(instance)
+    record_change(previous, None)
+    # When the vehicle itself is being deleted (CASCADE), its counters go
+    # with it.
+    origin_model = getattr(origin, "model", type(origin))
+    if origin_model is not Vehicle:
+        record_totals_change(previous, None)
+
+
+@receiver(pre_delete, sender=ExpenseCategory)
+def fold_category_rollups(sender, instance, **kwargs):
+    fold_category(instance)
+
+
+@receiver(pre_save, sender=VehicleBrand)
+def remember_previous_logo(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._previous_logo = None
+        return
+    loaded = instance.get_loaded_values()
+    if loaded is not None:
+        instance._previous_logo = loaded["logo"]
+    else:
+        instance._previous_logo = VehicleBrand.objects.filter(pk=instance.pk).values_list("logo", flat=True).first()
+
+
+@receiver(post_save, sender=VehicleBrand)
+def update_logo_files(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_logo", None)
+    if previous and previous != instance.logo.name:
+        release(previous)
+    instance.reset_loaded_values()
+    # Resized copies are made at upload time rather than on first request.
+    get_variants(instance.logo)
+
+
+@receiver(post_delete, sender=VehicleBrand)
+def release_logo(sender, instance, **kwargs):
+    release(instance.logo)
@@ -0,0 +1,204 @@
+import calendar
+from decimal import Decimal
+
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+
+from .models import Vehicle, VehicleBrand, ExpenseCategory, VehicleExpenseMonthlyRollup
+
+# Each grouping maps to the column (or date truncation) it adds to GROUP BY.
+GROUPINGS = {
+    "vehicle": F("vehicle_id"),
+    "category": F("category_id"),
+    "brand": F("vehicle__brand_id"),
+    "day": TruncDay("date"),
+    "week": TruncWeek("date"),
+    "month": TruncMonth("date"),
+    "year": TruncYear("date"),
+}
+
+# The monthly rollup can answer groupings no finer than a month.
+ROLLUP_GROUPINGS = {
+    "vehicle": F("vehicle_id"),
+    "category": F("category_id"),
+    "brand": F("vehicle__brand_id"),
+    "month": F("month"),
+    "year": TruncYear("month"),
+}
+
+CENT = Decimal("0.01")
+
+
+def _money(value):
+    # SQLite returns sums with trailing digits ("108219.320000000").
+    return None if value is None else Decimal(value).quantize(CENT)
+
+
+def _summary(total, count, min=None, max=None):
+    """
+    The aggregates of one summary row. Both the raw and the rollup path end
+    here, so the average is total / count rounded to the cent either way.
+    """
+    total, count = _money(total or 0), count or 0
+    return {
+        "total": total,
+        "count": count,
+        "min": _money(min),
+        "max": _money(max),
+        "average": (total / count).quantize(CENT) if count else None,
+    }
+
+
+def _expense_aggregates():
+    return {
+        "total": Sum("amount"),
+        "count": Count("id"),
+        "min": Min("amount"),
+        "max": Max("amount"),
+    }
+
+
+def _grouped(queryset, groupings, group_by, aggregates):
+    """
+    Annotate ``queryset`` with one ``group_<name>`` alias per grouping and
+    aggregate per group. Returns (values queryset, group_by, aliases).
+    """
+    group_by = [name for name in groupings if name in set(group_by)]
+    aliases = [f"group_{name}" for name in group_by]
+    rows = (
+        queryset.annotate(**{alias: groupings[name] for name, alias in zip(group_by, aliases)})
+        .values(*aliases)
+        .annotate(**aggregates)
+        .order_by(*aliases)
+    )
+    return rows, group_by, aliases
+
+
+def _expense_row(row, group_by, aliases):
+    result = _summary(row["total"], row["count"], row["min"], row["max"])
+    for name, alias in zip(group_by, aliases):
+        result[name] = row[alias]
+    return result
+
+
+def summarize_expenses(queryset, group_by=()):
+    """
+    Aggregate an expense queryset in SQL, grouped by any mix of GROUPINGS.
+
+    Returns one dict per group holding the grouping values plus ``total``,
+    ``count``, ``min``, ``max`` and ``average``. Referenced vehicles, brands
+    and categories are fetched with one query each and attached to the rows.
+    """
+    if not set(group_by) & set(GROUPINGS):
+        return [_summary(**queryset.aggregate(**_expense_aggregates()))]
+
+    # Clearing the model ordering keeps -date/-created_at out of GROUP BY.
+    rows, group_by, aliases = _grouped(queryset.order_by(), GROUPINGS, group_by, _expense_aggregates())
+    return attach_related([_expense_row(row, group_by, aliases) for row in rows], group_by)
+
+
+async def asummarize_expenses(queryset, group_by=()):
+    """summarize_expenses on Django's async ORM."""
+    if not set(group_by) & set(GROUPINGS):
+        return [_summary(**await queryset.aaggregate(**_expense_aggregates()))]
+
+    rows, group_by, aliases = _grouped(queryset.order_by(), GROUPINGS, group_by, _expense_aggregates())
+    results = [_expense_row(row, group_by, aliases) async for row in rows]
+    return await aattach_related(results, group_by)
+
+
+def _rollup_queryset(filters, group_by):
+    """
+    The rollup rows matching a summary request, or None when the grouping or
+    date range is finer than a month.
+    """
+    if not set(group_by) <= set(ROLLUP_GROUPINGS):
+        return None
+
+    start_date, end_date = filters.get("start_date"), filters.get("end_date")
+    if start_date and start_date.day != 1:
+        return None
+    if end_date and end_date.day != calendar.monthrange(end_date.year, end_date.month)[1]:
+        return None
+
+    queryset = VehicleExpenseMonthlyRollup.objects.order_by()
+    if filters.get("vehicle_id"):
+        queryset = queryset.filter(vehicle=filters["vehicle_id"])
+    if filters.get("category_id"):
+        queryset = queryset.filter(category=filters["category_id"])
+    if start_date:
+        queryset = queryset.filter(month__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(month__lte=end_date)
+    return queryset
+
+
+def _rollup_aggregates():
+    return {"total": Sum("total"), "count": Sum("count")}
+
+
+def _rollup_row(row, group_by, aliases):
+    result = _summary(row["total"], row["count"])
+    for name, alias in zip(group_by, aliases):
+        result[name] = row[alias]
+    return result
+
+
+def summarize_rollups(filters, group_by=()):
+    """
+    Answer a summary from VehicleExpenseMonthlyRollup instead of scanning raw
+    expenses. ``filters`` is the cleaned data of a VehicleExpenseFilter.
+
+    The rollup only stores sums and counts per month, so min/max are left out
+    and None is returned when the grouping or date range is finer than a month.
+    """
+    queryset = _rollup_queryset(filters, group_by)
+    if queryset is None:
+        return None
+    if not group_by:
+        return [_rollup_row(queryset.aggregate(**_rollup_aggregates()), [], [])]
+
+    rows, group_by, aliases = _grouped(queryset, ROLLUP_GROUPINGS, group_by, _rollup_aggregates())
+    return attach_related([_rollup_row(row, group_by, aliases) for row in rows], group_by)
+
+
+async def asummarize_rollups(filters, group_by=()):
+    """summarize_rollups on Django's async ORM."""
+    queryset = _rollup_queryset(filters, group_by)
+    if queryset is None:
+        return None
+    if not group_by:
+        return [_rollup_row(await queryset.aaggregate(**_rollup_aggregates()), [], [])]
+
+    rows, group_by, aliases = _grouped(queryset, ROLLUP_GROUPINGS, group_by, _rollup_aggregates())
+    results = [_rollup_row(row, group_by, aliases) async for row in rows]
+    return await aattach_related(results, group_by)
+
+
+def _related_querysets(group_by):
+    related = {
+        "vehicle": Vehicle.objects.select_related("brand"),
+        "category": ExpenseCategory.objects.all(),
+        "brand": VehicleBrand.objects.all(),
+    }
+    return [(name, queryset) for name, queryset in related.items() if name in group_by]
+
+
+def _attach(results, name, objects):
+    for result in results:
+        result[name] = objects.get(result[name])
+
+
+def attach_related(results, group_by):
+    """
+    Replace vehicle/category/brand ids in summary rows with model instances.
+    """
+    for name, queryset in _related_querysets(group_by):
+        _attach(results, name, queryset.in_bulk([r[name] for r in results if r[name] is not None]))
+    return results
+
+
+async def aattach_related(results, group_by):
+    for name, queryset in _related_querysets(group_by):
+        _attach(results, name, await queryset.ain_bulk([r[name] for r in results if r[name] is not None]))
+    return results
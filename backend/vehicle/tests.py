@@ -1,3 +1,910 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from graphql_relay import to_global_id
+from PIL import Image
+
+from Project.schema import async_schema
+from Project.views import AsyncGraphQLView
+from utils.images import variant_name
+from utils.pagination import default_ordering
+from utils.testing import APITestCase
+from .analytics import fleet_analytics
+from .models import ExpenseCategory, Vehicle, VehicleBrand, VehicleExpense, VehicleExpenseMonthlyRollup
+from .rollups import find_drift as find_rollup_drift
+from .totals import find_drift as find_totals_drift
+from .views import EXPORT_CHUNK_SIZE
+
+CREATE_EXPENSE = """
+mutation ($input: CreateVehicleExpenseInput!) {
+  createVehicleExpense(input: $input) { vehicleExpense { id } }
+}
+"""
+UPDATE_EXPENSE = """
+mutation ($id: ID!, $input: UpdateVehicleExpenseInput!) {
+  updateVehicleExpense(id: $id, input: $input) { vehicleExpense { id } }
+}
+"""
+DELETE_EXPENSE = "mutation ($id: ID!) { deleteVehicleExpense(id: $id) { found } }"
+BULK_CREATE_EXPENSES = """
+mutation ($expenses: [VehicleExpenseInput!]!) {
+  bulkCreateVehicleExpenses(expenses: $expenses) { createdCount errors { row field messages } }
+}
+"""
+EXPENSE_PAGE = """
+query ($first: Int, $after: String, $last: Int, $before: String, $vehicleId: ID) {
+  vehicle {
+    allVehicleExpenses(first: $first, after: $after, last: $last, before: $before, vehicleId: $vehicleId) {
+      edges { cursor node { id } }
+      pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+    }
+  }
+}
+"""
+VEHICLE_EXPENSE_PAGES = """
+query ($first: Int, $after: String, $last: Int) {
+  vehicle {
+    allVehicles {
+      edges {
+        node {
+          id
+          expenses(first: $first, after: $after, last: $last) {
+            totalCount
+            edges { cursor node { id } }
+            pageInfo { hasNextPage hasPreviousPage endCursor }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+VEHICLE_TOTALS = """
+query ($id: Int!) {
+  vehicle { vehicle(id: $id) { lifetimeTotal expenseCount lastExpenseDate currentMonthTotal } }
+}
+"""
+BRAND_VEHICLES = """
+query ($first: Int) {
+  vehicle {
+    allVehicleBrands(first: 10) {
+      edges { node { name vehicles(first: $first) { name expenses(first: 10) { edges { node { id } } } } } }
+    }
+  }
+}
+"""
+FLEET_ANALYTICS = """
+query ($vehicleId: ID) {
+  vehicle {
+    fleetAnalytics(vehicleId: $vehicleId) {
+      total count
+      vehicles { vehicle { name } total count ageYears costPerYear share months { month total delta deltaPercent } }
+      months { month total runningTotal delta deltaPercent }
+      categories { category { name } total share }
+    }
+  }
+}
+"""
+SUMMARY_TOTALS = """
+query ($groupBy: [ExpenseSummaryGroupBy!]) {
+  vehicle { expenseSummary(groupBy: $groupBy) { month total count average } }
+}
+"""
+CREATE_BRAND = """
+mutation ($name: String!, $logo: Upload) {
+  createVehicleBrand(input: {name: $name, logo: $logo}) { vehicleBrand { id logo } }
+}
+"""
+UPDATE_BRAND = """
+mutation ($id: ID!, $logo: Upload) { updateVehicleBrand(id: $id, input: {logo: $logo}) { vehicleBrand { logo } } }
+"""
+CREATE_VEHICLE = """
+mutation ($brand: ID!, $registrationNumber: String!) {
+  createVehicle(input: {brand: $brand, name: "Ace", year: 2023, registrationNumber: $registrationNumber}) {
+    vehicle { id }
+  }
+}
+"""
+UPDATE_VEHICLE = """
+mutation ($id: ID!, $registrationNumber: String!) {
+  updateVehicle(id: $id, input: {registrationNumber: $registrationNumber}) { vehicle { id } }
+}
+"""
+IMPORT_CSV = """
+mutation ($file: Upload!) { importVehicleExpensesCsv(file: $file) { createdCount errors { row messages } } }
+"""
+EXPENSE_SUMMARY = """
+query ($groupBy: [ExpenseSummaryGroupBy!]) {
+  vehicle { expenseSummary(groupBy: $groupBy) { vehicle { id } category { id } month total count } }
+}
+"""
+LOGO_VARIANTS = """
+query ($id: Int!, $format: String) {
+  vehicle { vehicleBrand(id: $id) { logoVariants(format: $format) { url size width height format contentType } } }
+}
+"""
+BRAND_EXPENSES = """
+query ($id: Int!) {
+  vehicle {
+    vehicleBrand(id: $id) {
+      name
+      vehicles { name expenses(first: 2) { totalCount edges { node { amount } } } }
+    }
+  }
+}
+"""
+
+# /graphql/ as Project.urls mounts it under ASGI (GRAPHQL_ASYNC), for AsyncGraphQLViewTests.
+urlpatterns = [path("graphql/", csrf_exempt(AsyncGraphQLView.as_view(schema=async_schema)))]
+
+
+class FleetTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.brand = VehicleBrand.objects.create(name="Tata")
+        cls.truck = Vehicle.objects.create(brand=cls.brand, name="Ultra", year=2021, registration_number="TN 01 AB 1234")
+        cls.van = Vehicle.objects.create(brand=cls.brand, name="Winger", year=2022, registration_number="TN 02 CD 5678")
+        cls.fuel = ExpenseCategory.objects.create(name="Fuel")
+        cls.tax = ExpenseCategory.objects.create(name="Tax")
+
+    def create_expense(self, vehicle, amount, date, category=None):
+        self.execute(CREATE_EXPENSE, {"input": {
+            "vehicle": vehicle.pk,
+            "category": category.pk if category else None,
+            "amount": str(amount),
+            "date": date.isoformat(),
+        }})
+        return VehicleExpense.objects.latest("pk")
+
+    def update_expense(self, expense, **values):
+        self.execute(UPDATE_EXPENSE, {"id": expense.pk, "input": values})
+
+    def delete_expense(self, expense):
+        self.execute(DELETE_EXPENSE, {"id": expense.pk})
+
+
+class MonthlyRollupTests(FleetTestCase):
+    def rollups(self):
+        return {
+            (row.vehicle_id, row.category_id, row.month): (row.total, row.count)
+            for row in VehicleExpenseMonthlyRollup.objects.all()
+        }
+
+    def test_create_adds_to_the_month_row(self):
+        self.create_expense(self.truck, "100.50", datetime.date(2024, 3, 5), self.fuel)
+        self.create_expense(self.truck, "20.00", datetime.date(2024, 3, 28), self.fuel)
+        self.create_expense(self.truck, "7.00", datetime.date(2024, 3, 28))
+        self.assertEqual(self.rollups(), {
+            (self.truck.pk, self.fuel.pk, datetime.date(2024, 3, 1)): (Decimal("120.50"), 2),
+            (self.truck.pk, None, datetime.date(2024, 3, 1)): (Decimal("7.00"), 1),
+        })
+        self.assertEqual(find_rollup_drift(), [])
+
+    def test_update_and_move_between_vehicles_months_and_categories(self):
+        expense = self.create_expense(self.truck, "50.00", datetime.date(2024, 3, 5), self.fuel)
+        self.update_expense(expense, amount="80.00")
+        self.assertEqual(self.rollups(), {
+            (self.truck.pk, self.fuel.pk, datetime.date(2024, 3, 1)): (Decimal("80.00"), 1),
+        })
+        self.update_expense(expense, vehicle=self.van.pk, category=self.tax.pk, date="2024-04-02")
+        self.assertEqual(self.rollups(), {
+            (self.van.pk, self.tax.pk, datetime.date(2024, 4, 1)): (Decimal("80.00"), 1),
+        })
+        self.assertEqual(find_rollup_drift(), [])
+
+    def test_delete_removes_the_emptied_row(self):
+        kept = self.create_expense(self.truck, "10.00", datetime.date(2024, 3, 5), self.fuel)
+        removed = self.create_expense(self.truck, "15.00", datetime.date(2024, 3, 6), self.fuel)
+        self.delete_expense(removed)
+        self.assertEqual(self.rollups(), {
+            (self.truck.pk, self.fuel.pk, datetime.date(2024, 3, 1)): (Decimal("10.00"), 1),
+        })
+        self.delete_expense(kept)
+        self.assertEqual(self.rollups(), {})
+
+    def test_deleting_a_category_folds_its_rows_into_uncategorized(self):
+        self.create_expense(self.truck, "10.00", datetime.date(2024, 3, 5), self.fuel)
+        self.create_expense(self.truck, "5.00", datetime.date(2024, 3, 9))
+        self.execute("mutation ($id: ID!) { deleteExpenseCategory(id: $id) { found } }", {"id": self.fuel.pk})
+        self.assertEqual(self.rollups(), {
+            (self.truck.pk, None, datetime.date(2024, 3, 1)): (Decimal("15.00"), 2),
+        })
+        self.assertEqual(find_rollup_drift(), [])
+
+    def test_deleting_a_vehicle_cascades_to_its_rows(self):
+        self.create_expense(self.truck, "10.00", datetime.date(2024, 3, 5), self.fuel)
+        self.create_expense(self.van, "30.00", datetime.date(2024, 3, 5), self.fuel)
+        self.execute("mutation ($id: ID!) { deleteVehicle(id: $id) { found } }", {"id": self.truck.pk})
+        self.assertEqual(self.rollups(), {
+            (self.van.pk, self.fuel.pk, datetime.date(2024, 3, 1)): (Decimal("30.00"), 1),
+        })
+        self.assertEqual(find_rollup_drift(), [])
+
+    def test_bulk_create_is_rolled_up_and_summarized(self):
+        data = self.execute(BULK_CREATE_EXPENSES, {"expenses": [
+            {"vehicle": self.truck.pk, "category": self.fuel.pk, "amount": "10.00", "date": "2024-03-01"},
+            {"vehicle": self.truck.pk, "category": self.fuel.pk, "amount": "12.00", "date": "2024-03-31"},
+            {"vehicle": self.van.pk, "amount": "4.00", "date": "2024-05-10"},
+        ]})
+        self.assertEqual(data["bulkCreateVehicleExpenses"], {"createdCount": 3, "errors": []})
+        self.assertEqual(find_rollup_drift(), [])
+
+        rows = self.execute(EXPENSE_SUMMARY, {"groupBy": ["VEHICLE", "MONTH"]})["vehicle"]["expenseSummary"]
+        totals = {(row["vehicle"]["id"], row["month"]): (Decimal(row["total"]), row["count"]) for row in rows}
+        self.assertEqual(totals, {
+            (str(self.truck.pk), "2024-03-01"): (Decimal("22.00"), 2),
+            (str(self.van.pk), "2024-05-01"): (Decimal("4.00"), 1),
+        })
+
+    def test_rollup_and_raw_paths_agree(self):
+        for amount in ("10.00", "10.00", "10.01"):
+            self.create_expense(self.truck, amount, datetime.date(2024, 3, 5), self.fuel)
+        self.create_expense(self.van, "0.05", datetime.date(2024, 4, 5))
+        raw_query = SUMMARY_TOTALS.replace("average", "average min")
+        for group_by in ([], ["MONTH"]):
+            rollup = self.execute(SUMMARY_TOTALS, {"groupBy": group_by})["vehicle"]["expenseSummary"]
+            raw = self.execute(raw_query, {"groupBy": group_by})["vehicle"]["expenseSummary"]
+            self.assertEqual(rollup, [{key: row[key] for key in rollup[0]} for row in raw])
+        self.assertEqual(rollup, [
+            {"month": "2024-03-01", "total": "30.01", "count": 3, "average": "10.00"},
+            {"month": "2024-04-01", "total": "0.05", "count": 1, "average": "0.05"},
+        ])
+
+    def test_one_uncategorized_row_per_vehicle_and_month(self):
+        for amount in ("1.00", "2.00", "3.00"):
+            self.create_expense(self.truck, amount, datetime.date(2024, 3, 5))
+        rows = VehicleExpenseMonthlyRollup.objects.filter(vehicle=self.truck, category=None)
+        self.assertEqual(list(rows.values_list("total", "count")), [(Decimal("6.00"), 3)])
+
+
+class VehicleTotalsTests(FleetTestCase):
+    def totals(self, vehicle):
+        totals = self.execute(VEHICLE_TOTALS, {"id": vehicle.pk})["vehicle"]["vehicle"]
+        return (
+            Decimal(totals["lifetimeTotal"]),
+            totals["expenseCount"],
+            totals["lastExpenseDate"],
+            Decimal(totals["currentMonthTotal"]),
+        )
+
+    def test_counters_follow_creates_updates_moves_and_deletes(self):
+        today = timezone.localdate()
+        older = today.replace(day=1) - datetime.timedelta(days=40)
+        first = self.create_expense(self.truck, "100.00", older, self.fuel)
+        second = self.create_expense(self.truck, "25.00", today)
+        self.assertEqual(self.totals(self.truck), (Decimal("125.00"), 2, today.isoformat(), Decimal("25.00")))
+
+        self.update_expense(second, amount="40.00")
+        self.assertEqual(self.totals(self.truck), (Decimal("140.00"), 2, today.isoformat(), Decimal("40.00")))
+
+        self.update_expense(second, vehicle=self.van.pk)
+        self.assertEqual(self.totals(self.truck), (Decimal("100.00"), 1, older.isoformat(), Decimal("0")))
+        self.assertEqual(self.totals(self.van), (Decimal("40.00"), 1, today.isoformat(), Decimal("40.00")))
+
+        self.delete_expense(first)
+        self.assertEqual(self.totals(self.truck), (Decimal("0"), 0, None, Decimal("0")))
+        self.assertEqual(find_totals_drift(), [])
+
+    def test_bulk_create_and_csv_import_update_counters(self):
+        self.execute(BULK_CREATE_EXPENSES, {"expenses": [
+            {"vehicle": self.truck.pk, "amount": "10.00", "date": "2024-03-01"},
+            {"vehicle": self.truck.pk, "amount": "5.50", "date": "2024-06-30"},
+        ]})
+        self.assertEqual(self.totals(self.truck)[:3], (Decimal("15.50"), 2, "2024-06-30"))
+        self.assertEqual(find_totals_drift(), [])
+
+    def test_saving_a_stale_vehicle_keeps_its_counters(self):
+        stale = Vehicle.objects.get(pk=self.truck.pk)
+        self.create_expense(self.truck, "60.00", datetime.date(2024, 3, 5))
+        stale.name = "Ultra 2"
+        stale.save()
+        self.execute(
+            "mutation ($id: ID!) { updateVehicle(id: $id, input: {year: 2020}) { vehicle { id } } }",
+            {"id": self.truck.pk},
+        )
+        self.assertEqual(self.totals(self.truck)[:3], (Decimal("60.00"), 1, "2024-03-05"))
+        self.assertEqual(find_totals_drift(), [])
+
+    def test_recompute_totals_repairs_drift(self):
+        self.create_expense(self.truck, "60.00", datetime.date(2024, 3, 5))
+        Vehicle.objects.filter(pk=self.truck.pk).update(lifetime_total=0, expense_count=7)
+        self.assertEqual(len(find_totals_drift()), 1)
+        vehicle = Vehicle.objects.get(pk=self.truck.pk)
+        vehicle.recompute_totals()
+        self.assertEqual((vehicle.lifetime_total, vehicle.expense_count), (Decimal("60.00"), 1))
+        self.assertEqual(find_totals_drift(), [])
+
+
+class KeysetPaginationTests(FleetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Several expenses share a date, so the tie-breakers decide the order.
+        for day in range(1, 13):
+            vehicle = cls.truck if day % 3 else cls.van
+            VehicleExpense.objects.create(vehicle=vehicle, amount=day, date=datetime.date(2024, 3, 1 + day // 3))
+
+    def expected(self, **filters):
+        rows = VehicleExpense.objects.filter(**filters).order_by("-date", "-created_at", "-id")
+        return [to_global_id("VehicleExpenseType", pk) for pk in rows.values_list("pk", flat=True)]
+
+    def page(self, **variables):
+        return self.execute(EXPENSE_PAGE, variables)["vehicle"]["allVehicleExpenses"]
+
+    def ids(self, page):
+        return [edge["node"]["id"] for edge in page["edges"]]
+
+    def test_forward_pages_cover_every_row_once_in_order(self):
+        seen, after = [], None
+        while True:
+            page = self.page(first=5, after=after)
+            seen += self.ids(page)
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+            after = page["pageInfo"]["endCursor"]
+        self.assertEqual(seen, self.expected())
+
+    def test_backward_pages_mirror_forward_pages(self):
+        expected = self.expected()
+        page = self.page(last=5)
+        self.assertEqual(self.ids(page), expected[-5:])
+        self.assertTrue(page["pageInfo"]["hasPreviousPage"])
+        page = self.page(last=5, before=page["pageInfo"]["startCursor"])
+        self.assertEqual(self.ids(page), expected[-10:-5])
+
+    def test_cursor_is_stable_across_inserts(self):
+        first = self.page(first=4)
+        newest = VehicleExpense.objects.create(vehicle=self.truck, amount=1, date=datetime.date(2024, 12, 1))
+        oldest = VehicleExpense.objects.create(vehicle=self.truck, amount=1, date=datetime.date(2023, 1, 1))
+        rest = self.page(first=100, after=first["pageInfo"]["endCursor"])
+        expected = self.expected()
+        self.assertEqual(expected[0], to_global_id("VehicleExpenseType", newest.pk))
+        self.assertEqual(self.ids(first) + self.ids(rest), expected[1:])
+        self.assertEqual(self.ids(rest)[-1], to_global_id("VehicleExpenseType", oldest.pk))
+
+    def test_filters_apply_before_paging(self):
+        # The connection's filters take global ids.
+        van = to_global_id("VehicleType", self.van.pk)
+        page = self.page(first=3, vehicleId=van)
+        page = self.page(first=3, after=page["pageInfo"]["endCursor"], vehicleId=van)
+        self.assertEqual(self.ids(page), self.expected(vehicle=self.van)[3:6])
+
+    def test_invalid_cursors_are_rejected(self):
+        self.assertEqual(self.errors(EXPENSE_PAGE, {"first": 5, "after": "bm90LWEtY3Vyc29y"}), [
+            "Invalid cursor: bm90LWEtY3Vyc29y",
+        ])
+
+    def test_page_size_is_capped(self):
+        VehicleExpense.objects.bulk_create(
+            VehicleExpense(vehicle=self.truck, amount=1, date=datetime.date(2024, 1, 1)) for _ in range(100)
+        )
+        self.assertEqual(len(self.page()["edges"]), 100)
+        self.assertEqual(self.errors(EXPENSE_PAGE, {"first": 101}), [
+            "Requesting 101 records on the `allVehicleExpenses` connection exceeds the limit of 100 records.",
+        ])
+
+    def test_every_all_connection_is_capped(self):
+        for field in ("allVehicleBrands", "allVehicles", "allExpenseCategories"):
+            with self.subTest(field=field):
+                query = f"{{ vehicle {{ {field}(first: 101) {{ edges {{ node {{ id }} }} }} }} }}"
+                self.assertEqual(self.errors(query), [
+                    f"Requesting 101 records on the `{field}` connection exceeds the limit of 100 records.",
+                ])
+
+
+class NestedConnectionTests(FleetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for vehicle, count in ((cls.truck, 7), (cls.van, 3)):
+            for day in range(count):
+                VehicleExpense.objects.create(vehicle=vehicle, amount=day + 1, date=datetime.date(2024, 3, 1 + day // 2))
+
+    def expected(self, vehicle):
+        rows = vehicle.expenses.order_by(*default_ordering(VehicleExpense))
+        return [to_global_id("VehicleExpenseType", pk) for pk in rows.values_list("pk", flat=True)]
+
+    def pages(self, **variables):
+        edges = self.execute(VEHICLE_EXPENSE_PAGES, variables)["vehicle"]["allVehicles"]["edges"]
+        return {int(edge["node"]["id"]): edge["node"]["expenses"] for edge in edges}
+
+    def ids(self, page):
+        return [edge["node"]["id"] for edge in page["edges"]]
+
+    def test_each_vehicle_gets_its_own_page_and_total(self):
+        pages = self.pages(first=2)
+        for vehicle in (self.truck, self.van):
+            page = pages[vehicle.pk]
+            self.assertEqual(self.ids(page), self.expected(vehicle)[:2])
+            self.assertEqual(page["totalCount"], vehicle.expenses.count())
+            self.assertTrue(page["pageInfo"]["hasNextPage"])
+
+    def test_cursors_round_trip(self):
+        after = self.pages(first=2)[self.truck.pk]["pageInfo"]["endCursor"]
+        pages = self.pages(first=3, after=after)
+        self.assertEqual(self.ids(pages[self.truck.pk]), self.expected(self.truck)[2:5])
+        self.assertEqual(self.ids(pages[self.van.pk]), self.expected(self.van)[2:])
+        self.assertFalse(pages[self.van.pk]["pageInfo"]["hasNextPage"])
+
+    def test_oversized_pages_are_rejected_like_top_level_connections(self):
+        query = VEHICLE_EXPENSE_PAGES.replace("allVehicles {", "allVehicles(first: 2) {")
+        self.assertEqual(set(self.errors(query, {"first": 101})), {
+            "Requesting 101 records on the `expenses` connection exceeds the limit of 100 records.",
+        })
+        self.assertEqual(set(self.errors(query, {"last": -1})), {"`last` must be a non-negative integer."})
+        edges = self.execute(query, {"first": 100})["vehicle"]["allVehicles"]["edges"]
+        self.assertEqual([len(edge["node"]["expenses"]["edges"]) for edge in edges], [7, 3])
+
+    def test_last_pages_end_each_vehicles_list(self):
+        pages = self.pages(last=2)
+        self.assertEqual(self.ids(pages[self.truck.pk]), self.expected(self.truck)[-2:])
+        self.assertEqual(self.ids(pages[self.van.pk]), self.expected(self.van)[-2:])
+
+    def query_count(self):
+        self.pages(first=2)  # Caches the token's user.
+        with CaptureQueriesContext(connection) as queries:
+            self.pages(first=2)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_vehicles(self):
+        count = self.query_count()
+        for number in range(5):
+            vehicle = Vehicle.objects.create(
+                brand=self.brand, name=f"Extra {number}", year=2020, registration_number=f"TN 09 ZZ {number}"
+            )
+            VehicleExpense.objects.create(vehicle=vehicle, amount=1, date=datetime.date(2024, 3, 1))
+        self.assertEqual(self.query_count(), count)
+
+
+class BrandVehiclesTests(FleetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = VehicleBrand.objects.create(name="Eicher")
+        for number in range(3):
+            Vehicle.objects.create(brand=cls.other, name=f"Pro {number}", year=2020, registration_number=f"KA 01 {number}")
+
+    def vehicles(self, **variables):
+        data = self.execute(BRAND_VEHICLES, variables)["vehicle"]["allVehicleBrands"]["edges"]
+        return {edge["node"]["name"]: [vehicle["name"] for vehicle in edge["node"]["vehicles"]] for edge in data}
+
+    def cost(self, **variables):
+        return self.query(BRAND_VEHICLES, variables).json()["extensions"]["cost"]["cost"]
+
+    def test_each_brand_lists_its_first_vehicles(self):
+        self.assertEqual(self.vehicles(), {"Tata": ["Ultra", "Winger"], "Eicher": ["Pro 0", "Pro 1", "Pro 2"]})
+        self.assertEqual(self.vehicles(first=2), {"Tata": ["Ultra", "Winger"], "Eicher": ["Pro 0", "Pro 1"]})
+
+    def test_the_list_is_capped_and_costed_at_its_page_size(self):
+        self.assertEqual(set(self.errors(BRAND_VEHICLES, {"first": 101})), {
+            "Requesting 101 records on the `vehicles` list exceeds the limit of 100 records.",
+        })
+        self.assertEqual(self.cost(), self.cost(first=20))
+        self.assertGreater(self.cost(first=100), self.cost(first=20) * 4)
+
+    def test_query_count_does_not_grow_with_brands(self):
+        self.vehicles(first=2)  # Caches the token's user.
+        with CaptureQueriesContext(connection) as queries:
+            self.vehicles(first=2)
+        count = len(queries)
+        for number in range(3):
+            brand = VehicleBrand.objects.create(name=f"Extra {number}")
+            Vehicle.objects.create(brand=brand, name="Extra", year=2020, registration_number=f"KA 09 {number}")
+        with CaptureQueriesContext(connection) as queries:
+            self.vehicles(first=2)
+        self.assertEqual(len(queries), count)
+
+
+class FleetAnalyticsTests(FleetTestCase):
+    def analytics(self, **variables):
+        return self.execute(FLEET_ANALYTICS, variables)["vehicle"]["fleetAnalytics"]
+
+    def test_costs_shares_and_monthly_deltas(self):
+        self.create_expense(self.truck, "300.00", datetime.date(2024, 1, 5), self.fuel)
+        self.create_expense(self.truck, "150.00", datetime.date(2024, 3, 5), self.tax)
+        self.create_expense(self.van, "50.00", datetime.date(2024, 3, 9), self.fuel)
+        report = fleet_analytics(VehicleExpense.objects.all(), today=datetime.date(2024, 6, 1))
+        self.assertEqual((report["total"], report["count"]), (Decimal("500.00"), 3))
+        truck, van = report["vehicles"]
+        self.assertEqual(
+            (truck["vehicle"], truck["total"], truck["count"], truck["age_years"], truck["cost_per_year"]),
+            (self.truck, Decimal("450.00"), 2, 4, Decimal("112.50")),
+        )
+        self.assertEqual((truck["share"], van["share"]), (0.9, 0.1))
+        self.assertEqual(
+            [(row["month"], row["total"], row["running_total"], row["delta"], row["delta_percent"])
+             for row in report["months"]],
+            [
+                (datetime.date(2024, 1, 1), Decimal("300.00"), Decimal("300.00"), None, None),
+                (datetime.date(2024, 2, 1), Decimal("0.00"), Decimal("300.00"), Decimal("-300.00"), -100.0),
+                (datetime.date(2024, 3, 1), Decimal("200.00"), Decimal("500.00"), Decimal("200.00"), None),
+            ],
+        )
+        self.assertEqual(
+            [(row["category"], row["total"], row["share"]) for row in report["categories"]],
+            [(self.fuel, Decimal("350.00"), 0.7), (self.tax, Decimal("150.00"), 0.3)],
+        )
+
+    def test_graphql_field_applies_filters(self):
+        self.create_expense(self.truck, "300.00", datetime.date(2024, 1, 5), self.fuel)
+        self.create_expense(self.van, "100.00", datetime.date(2024, 2, 9))
+        report = self.analytics(vehicleId=self.van.pk)
+        self.assertEqual((Decimal(report["total"]), report["count"]), (Decimal("100.00"), 1))
+        self.assertEqual([row["vehicle"]["name"] for row in report["vehicles"]], ["Winger"])
+        self.assertEqual(report["vehicles"][0]["share"], 1.0)
+        self.assertEqual(report["categories"], [{"category": None, "total": "100.00", "share": 1.0}])
+
+    def test_zero_totals_have_zero_shares(self):
+        self.create_expense(self.truck, "0", datetime.date(2024, 1, 5), self.fuel)
+        report = self.analytics()
+        self.assertEqual([row["share"] for row in report["vehicles"]], [0.0])
+        self.assertEqual([row["share"] for row in report["categories"]], [0.0])
+        self.assertIn("0.0%", self.command())
+
+    def command(self, *args):
+        out = io.StringIO()
+        call_command("fleet_analytics", *args, stdout=out)
+        return out.getvalue()
+
+    def test_management_command_prints_the_report(self):
+        self.create_expense(self.truck, "300.00", datetime.date(2024, 1, 5), self.fuel)
+        self.create_expense(self.van, "100.00", datetime.date(2024, 2, 9))
+        output = self.command()
+        self.assertIn("2 expense(s), total 400.00", output)
+        self.assertRegex(output, r"TN 01 AB 1234 +300\.00 +1 .* 75\.0%")
+        self.assertRegex(output, r"Uncategorized +100\.00 +25\.0%")
+        report = json.loads(self.command("--json", "--vehicle", str(self.van.pk)))
+        self.assertEqual(report["total"], "100.00")
+        self.assertEqual([row["vehicle"] for row in report["vehicles"]], ["TN 02 CD 5678"])
+        self.assertEqual(report["vehicles"][0]["months"][0]["month"], "2024-02-01")
+
+
+class RegistrationNumberTests(FleetTestCase):
+    def test_registration_numbers_are_unique_however_written(self):
+        self.assertEqual(
+            self.errors(CREATE_VEHICLE, {"brand": self.brand.pk, "registrationNumber": "tn-01-ab-1234"}),
+            ["A vehicle with this registration number already exists."],
+        )
+        self.assertEqual(
+            self.errors(UPDATE_VEHICLE, {"id": self.van.pk, "registrationNumber": "TN01AB1234"}),
+            ["A vehicle with this registration number already exists."],
+        )
+        self.execute(UPDATE_VEHICLE, {"id": self.truck.pk, "registrationNumber": "TN01AB1234"})
+        self.execute(CREATE_VEHICLE, {"brand": self.brand.pk, "registrationNumber": "TN 03 EF 9012"})
+        self.assertEqual(Vehicle.objects.count(), 3)
+
+
+class ExpenseExportTests(FleetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.diesel = VehicleExpense.objects.create(
+            vehicle=cls.truck, category=cls.fuel, amount="100.50", date=datetime.date(2024, 3, 1),
+            description='Diesel, "full" tank',
+        )
+        cls.road_tax = VehicleExpense.objects.create(
+            vehicle=cls.van, category=cls.tax, amount="20.00", date=datetime.date(2024, 4, 10)
+        )
+        cls.toll = VehicleExpense.objects.create(vehicle=cls.truck, amount="7.00", date=datetime.date(2024, 5, 1))
+
+    def export(self, user=True, **params):
+        user = self.admin if user is True else user
+        headers = {"Authorization": f"JWT {self.token(user)}"} if user else {}
+        return self.client.get("/export/expenses/", params, headers=headers)
+
+    def content(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def exported_ids(self, **params):
+        response = self.export(format="ndjson", **params)
+        return [json.loads(line)["id"] for line in self.content(response).splitlines()]
+
+    def test_exports_require_a_user_with_view_permission(self):
+        response = self.export(user=None)
+        self.assertEqual((response.status_code, response.json()), (401, {"error": "Authentication required."}))
+        clerk = get_user_model().objects.create_user("clerk", password="password")
+        response = self.export(user=clerk)
+        self.assertEqual((response.status_code, response.json()), (403, {"error": "Permission denied."}))
+        with self.captureOnCommitCallbacks(execute=True):
+            clerk.user_permissions.add(Permission.objects.get(codename="view_vehicleexpense"))
+        self.assertEqual(self.export(user=clerk).status_code, 200)
+
+    def test_filters(self):
+        self.assertEqual(self.exported_ids(), [self.diesel.pk, self.road_tax.pk, self.toll.pk])
+        self.assertEqual(self.exported_ids(vehicle_id=self.truck.pk), [self.diesel.pk, self.toll.pk])
+        self.assertEqual(self.exported_ids(category_id=self.tax.pk), [self.road_tax.pk])
+        self.assertEqual(self.exported_ids(start_date="2024-04-01", end_date="2024-04-30"), [self.road_tax.pk])
+        response = self.export(start_date="yesterday")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"errors": {"start_date": ["Enter a valid date."]}})
+        self.assertEqual(self.export(format="xlsx").status_code, 400)
+
+    def test_csv_rows(self):
+        response = self.export(vehicle_id=self.truck.pk)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="vehicle-expenses.csv"')
+        content = self.content(response)
+        self.assertTrue(content.startswith(
+            "id,date,vehicle_id,registration_number,vehicle,brand,category,amount,description,created_at\r\n"
+        ))
+        self.assertEqual(list(csv.reader(io.StringIO(content)))[1:], [
+            [str(self.diesel.pk), "2024-03-01", str(self.truck.pk), "TN 01 AB 1234", "Ultra", "Tata", "Fuel",
+             "100.50", 'Diesel, "full" tank', str(self.diesel.created_at)],
+            [str(self.toll.pk), "2024-05-01", str(self.truck.pk), "TN 01 AB 1234", "Ultra", "Tata", "",
+             "7.00", "", str(self.toll.created_at)],
+        ])
+
+    def test_ndjson_rows(self):
+        response = self.export(format="ndjson", category_id=self.fuel.pk)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="vehicle-expenses.ndjson"')
+        lines = self.content(response).split("\n")
+        self.assertEqual(lines[1:], [""], "One object per line, each ending in a newline.")
+        self.assertEqual(json.loads(lines[0]), {
+            "id": self.diesel.pk,
+            "date": "2024-03-01",
+            "vehicle_id": self.truck.pk,
+            "registration_number": "TN 01 AB 1234",
+            "vehicle": "Ultra",
+            "brand": "Tata",
+            "category": "Fuel",
+            "amount": "100.50",
+            "description": 'Diesel, "full" tank',
+            "created_at": DjangoJSONEncoder().default(self.diesel.created_at),
+        })
+
+    def test_rows_are_streamed_from_a_chunked_cursor(self):
+        with mock.patch.object(QuerySet, "iterator", autospec=True, side_effect=QuerySet.iterator) as iterator:
+            response = self.export()
+            self.assertTrue(response.streaming)
+            with CaptureQueriesContext(connection) as queries:
+                chunks = iter(response.streaming_content)
+                header = next(chunks)
+            self.assertEqual(len(queries), 0, "The header is sent before any expense is read.")
+            with CaptureQueriesContext(connection) as queries:
+                rows = list(chunks)
+        iterator.assert_called_once_with(mock.ANY, chunk_size=EXPORT_CHUNK_SIZE)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(header.startswith(b"id,date,"))
+        self.assertEqual(len(rows), 3, "Each row is its own chunk.")
+
+
+def png(color, size=(32, 32)):
+    content = io.BytesIO()
+    Image.new("RGB", size, color).save(content, "PNG")
+    return content.getvalue()
+
+
+class UploadTestCase(APITestCase):
+    """Multipart requests to /graphql/, storing files under a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+
+    def upload(self, query, variables, file_name, content, user=True):
+        """Post ``query`` with ``content`` as its ``file`` or ``logo`` variable."""
+        user = self.admin if user is True else user
+        name = "logo" if "$logo" in query else "file"
+        operations = {"query": query, "variables": {**variables, name: None}}
+        data = {
+            "operations": json.dumps(operations),
+            "map": json.dumps({"0": [f"variables.{name}"]}),
+            "0": SimpleUploadedFile(file_name, content),
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.GRAPHQL_URL, data, HTTP_AUTHORIZATION=f"JWT {self.token(user)}")
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, names in os.walk(self.media_root)
+            for name in names
+        )
+
+
+class ContentAddressedLogoTests(UploadTestCase):
+    def create_brand(self, name, content):
+        response = self.upload(CREATE_BRAND, {"name": name}, "logo.png", content)
+        self.assertResponseNoErrors(response)
+        brand = response.json()["data"]["createVehicleBrand"]["vehicleBrand"]
+        return VehicleBrand.objects.get(pk=brand["id"]), brand["logo"]
+
+    def replace_logo(self, brand, content):
+        response = self.upload(UPDATE_BRAND, {"id": brand.pk}, "logo.png", content)
+        self.assertResponseNoErrors(response)
+        return response.json()["data"]["updateVehicleBrand"]["vehicleBrand"]["logo"]
+
+    def originals(self):
+        return [name for name in self.stored_files() if "variants" not in name]
+
+    def test_identical_logos_share_one_file(self):
+        _, name = self.create_brand("Tata", png("red"))
+        _, other = self.create_brand("Ashok Leyland", png("red"))
+        self.assertEqual(name, other)
+        self.assertRegex(name, r"^vehicle_brands/logos/[0-9a-f]{64}\.png$")
+        self.assertEqual(self.originals(), [name])
+
+    def test_replaced_logos_are_released_once_unreferenced(self):
+        first, shared = self.create_brand("Tata", png("red"))
+        second, _ = self.create_brand("Ashok Leyland", png("red"))
+        self.assertIn(variant_name(shared, 160, "webp"), self.stored_files())
+        blue = self.replace_logo(first, png("blue"))
+        self.assertEqual(self.originals(), sorted([shared, blue]), "The second brand still uses the red logo.")
+        self.replace_logo(second, png("blue"))
+        self.assertEqual(self.originals(), [blue])
+        self.assertNotIn(variant_name(shared, 160, "webp"), self.stored_files())
+
+    def test_deleting_the_last_brand_releases_its_logo(self):
+        brand, _ = self.create_brand("Tata", png("red"))
+        self.assertTrue(self.stored_files())
+        self.execute("mutation ($id: ID!) { deleteVehicleBrand(id: $id) { found } }", {"id": brand.pk})
+        self.assertEqual(self.stored_files(), [])
+
+
+class LogoVariantTests(UploadTestCase):
+    def create_brand(self, content):
+        response = self.upload(CREATE_BRAND, {"name": "Tata"}, "logo.png", content)
+        self.assertResponseNoErrors(response)
+        return VehicleBrand.objects.get(pk=response.json()["data"]["createVehicleBrand"]["vehicleBrand"]["id"])
+
+    def variants(self, brand, format=None):
+        data = self.execute(LOGO_VARIANTS, {"id": brand.pk, "format": format})
+        return data["vehicle"]["vehicleBrand"]["logoVariants"]
+
+    def test_uploads_are_resized_into_every_size_and_format(self):
+        brand = self.create_brand(png("red", size=(400, 200)))
+        expected = []
+        for size, width, height in ((64, 64, 32), (160, 160, 80), (320, 320, 160)):
+            for image_format, content_type in (("webp", "image/webp"), ("jpeg", "image/jpeg")):
+                name = variant_name(brand.logo.name, size, image_format)
+                with Image.open(os.path.join(self.media_root, name)) as image:
+                    self.assertEqual((image.format, image.size), (image_format.upper(), (width, height)))
+                expected.append({
+                    "url": f"/media/{name}", "size": size, "width": width, "height": height,
+                    "format": image_format, "contentType": content_type,
+                })
+        self.assertEqual(self.variants(brand), expected)
+        self.assertEqual(self.variants(brand, "WEBP"), expected[::2])
+
+    def test_small_logos_are_not_upscaled(self):
+        brand = self.create_brand(png("red", size=(40, 20)))
+        self.assertEqual({(variant["width"], variant["height"]) for variant in self.variants(brand)}, {(40, 20)})
+
+    def test_missing_files_get_variants_once_they_appear(self):
+        brand = VehicleBrand.objects.create(name="Tata", logo="vehicle_brands/logos/late.png")
+        self.assertEqual(self.variants(brand), [])
+        os.makedirs(os.path.join(self.media_root, "vehicle_brands", "logos"))
+        with open(os.path.join(self.media_root, brand.logo.name), "wb") as f:
+            f.write(png("red"))
+        self.assertEqual(len(self.variants(brand)), 6)
+
+
+class UploadLimitTests(UploadTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.brand = VehicleBrand.objects.create(name="Tata")
+        cls.truck = Vehicle.objects.create(brand=cls.brand, name="Ultra", year=2021, registration_number="TN 01 AB 1234")
+
+    def replace_logo(self, file_name, content):
+        return self.upload(UPDATE_BRAND, {"id": self.brand.pk}, file_name, content)
+
+    def import_csv(self, file_name, content):
+        return self.upload(IMPORT_CSV, {}, file_name, content)
+
+    def messages(self, response):
+        return [error["message"] for error in response.json()["errors"]]
+
+    def test_real_images_are_accepted(self):
+        response = self.replace_logo("logo.png", png("red"))
+        self.assertResponseNoErrors(response)
+        self.brand.refresh_from_db()
+        self.assertTrue(self.brand.logo.name.endswith(".png"))
+
+    def test_logos_must_be_images(self):
+        svg = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+        self.assertEqual(
+            self.messages(self.replace_logo("logo.png", svg)),
+            ["logo.png must be one of: image/png, image/jpeg, image/gif, image/webp."],
+        )
+        fake = b"\x89PNG\r\n\x1a\n" + b"not an image" * 10
+        self.assertEqual(self.messages(self.replace_logo("logo.png", fake)), ["logo.png is not a valid image."])
+        self.brand.refresh_from_db()
+        self.assertFalse(self.brand.logo)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_csv_imports_must_be_text(self):
+        self.assertEqual(
+            self.messages(self.import_csv("expenses.csv", png("red"))),
+            ["expenses.csv must be one of: text/csv."],
+        )
+        truck = to_global_id("VehicleType", self.truck.pk)
+        response = self.import_csv("expenses.csv", f"vehicle,amount,date\n{truck},10.00,2024-03-01\n".encode())
+        self.assertResponseNoErrors(response)
+        self.assertEqual(response.json()["data"]["importVehicleExpensesCsv"], {"createdCount": 1, "errors": []})
+
+    def test_unknown_file_types_are_refused_while_streaming(self):
+        response = self.replace_logo("logo.bin", b"\x00\x01\x02" * 100)
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(self.messages(response), ["logo.bin is not an accepted file type."])
+
+    @override_settings(GRAPHQL_UPLOADS={"MAX_SIZES": {"image/png": 100}})
+    def test_files_over_their_types_limit_are_refused(self):
+        response = self.replace_logo("logo.png", png("red", size=(256, 256)))
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.messages(response), ["logo.png is larger than 100 bytes."])
+
+    @override_settings(GRAPHQL_UPLOADS={"MAX_REQUEST_SIZE": 1024})
+    def test_requests_over_the_size_limit_are_refused(self):
+        response = self.replace_logo("logo.png", png("red", size=(256, 256)) + b"\x00" * 1024)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.messages(response), ["Request body is larger than 1024 bytes."])
+        self.assertEqual(self.stored_files(), [])
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncGraphQLViewTests(UploadTestCase, FleetTestCase):
+    async def post(self, data, user=True, **kwargs):
+        headers = {"Authorization": f"JWT {self.token(self.admin)}"} if user else {}
+        with self.captureOnCommitCallbacks(execute=True):
+            return await self.async_client.post(self.GRAPHQL_URL, data, headers=headers, **kwargs)
+
+    async def execute_async(self, query, variables=None, user=True):
+        response = await self.post({"query": query, "variables": variables}, user, content_type="application/json")
+        self.assertResponseNoErrors(response)
+        return response.json()["data"]
+
+    async def test_queries_are_authenticated_by_jwt(self):
+        me = "{ core { me { username } } }"
+        self.assertEqual(await self.execute_async(me), {"core": {"me": {"username": "admin"}}})
+        response = await self.post({"query": me}, user=False, content_type="application/json")
+        self.assertEqual(
+            response.json()["errors"][0]["message"], "Error fetching user information: Authentication required!"
+        )
+
+    async def test_dataloader_connections_under_async_resolvers(self):
+        for day in range(3):
+            await VehicleExpense.objects.acreate(
+                vehicle=self.truck, amount=day + 1, date=datetime.date(2024, 3, 1 + day)
+            )
+        await VehicleExpense.objects.acreate(vehicle=self.van, amount=5, date=datetime.date(2024, 3, 1))
+        data = await self.execute_async(BRAND_EXPENSES, {"id": self.brand.pk})
+        self.assertEqual(data["vehicle"]["vehicleBrand"], {"name": "Tata", "vehicles": [
+            {"name": "Ultra", "expenses": {
+                "totalCount": 3, "edges": [{"node": {"amount": "3.00"}}, {"node": {"amount": "2.00"}}],
+            }},
+            {"name": "Winger", "expenses": {"totalCount": 1, "edges": [{"node": {"amount": "5.00"}}]}},
+        ]})
+
+    async def test_multipart_uploads(self):
+        response = await self.post({
+            "operations": json.dumps({"query": UPDATE_BRAND, "variables": {"id": self.brand.pk, "logo": None}}),
+            "map": json.dumps({"0": ["variables.logo"]}),
+            "0": SimpleUploadedFile("logo.png", png("red")),
+        })
+        self.assertResponseNoErrors(response)
+        logo = response.json()["data"]["updateVehicleBrand"]["vehicleBrand"]["logo"]
+        await self.brand.arefresh_from_db()
+        self.assertEqual(self.brand.logo.name, logo)
+        self.assertIn(logo, self.stored_files())
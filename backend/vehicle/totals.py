@@ -0,0 +1,186 @@
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from utils.response_cache import invalidate
+from .models import Vehicle, VehicleExpense
+from .rollups import amount_of, month_of
+
+ZERO = Decimal("0.00")
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def date_of(values):
+    return VehicleExpense._meta.get_field("date").to_python(values["date"])
+
+
+def next_month(month):
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def current_month_total(vehicle, today=None):
+    """running_month_total, or 0 if no expense has touched it this month yet."""
+    if vehicle.running_month != month_of(today or timezone.localdate()):
+        return ZERO
+    return vehicle.running_month_total
+
+
+def _expenses_of(vehicle):
+    return VehicleExpense.objects.filter(vehicle_id=vehicle).order_by().values("vehicle_id")
+
+
+def _latest_date():
+    return Subquery(_expenses_of(OuterRef("pk")).annotate(latest=Max("date")).values("latest"))
+
+
+def _month_total(month):
+    expenses = _expenses_of(OuterRef("pk")).filter(date__gte=month, date__lt=next_month(month))
+    return Coalesce(Subquery(expenses.annotate(total=Sum("amount")).values("total")), Value(ZERO), output_field=MONEY)
+
+
+def apply_totals(vehicle_id, month, total=ZERO, count=0, month_total=ZERO, latest=None, removed=None):
+    """
+    Adjust a vehicle's counters in one UPDATE, after its expenses were
+    written. ``latest`` is the newest date added and ``removed`` the newest
+    date taken away; the last expense date is only recounted when ``removed``
+    may have been it. ``month_total`` is the change to ``month``'s total, which
+    is recounted instead when the row still holds an earlier month.
+    """
+    values = {}
+    if total or count:
+        values["lifetime_total"] = F("lifetime_total") + total
+        values["expense_count"] = F("expense_count") + count
+    last = F("last_expense_date")
+    if latest is not None:
+        last = Greatest(Coalesce("last_expense_date", Value(latest)), Value(latest))
+    if removed is not None:
+        values["last_expense_date"] = Case(When(last_expense_date__gt=removed, then=last), default=_latest_date())
+    elif latest is not None:
+        values["last_expense_date"] = last
+    if month_total:
+        values["running_month_total"] = Case(
+            When(running_month=month, then=F("running_month_total") + month_total),
+            default=_month_total(month),
+        )
+        values["running_month"] = Value(month)
+    if values:
+        Vehicle.objects.filter(pk=vehicle_id).update(**values)
+
+
+def _collect(changes, values, sign, month):
+    change = changes.setdefault(values["vehicle_id"], {
+        "total": ZERO, "count": 0, "month_total": ZERO, "latest": None, "removed": None,
+    })
+    amount, date = amount_of(values) * sign, date_of(values)
+    change["total"] += amount
+    change["count"] += sign
+    if month_of(date) == month:
+        change["month_total"] += amount
+    key = "latest" if sign > 0 else "removed"
+    change[key] = max(change[key] or date, date)
+
+
+def _apply_changes(changes, month):
+    with transaction.atomic(savepoint=False):
+        for vehicle_id, change in changes.items():
+            if change["latest"] and change["removed"] and change["latest"] >= change["removed"]:
+                # The newest removed date is matched by one still present.
+                change["removed"] = None
+            apply_totals(vehicle_id, month, **change)
+    if changes:
+        invalidate(Vehicle)
+
+
+def record_totals_change(previous, current, today=None):
+    """
+    Move an expense's contribution to its vehicle's counters from its
+    ``previous`` values to its ``current`` values, like rollups.record_change.
+    """
+    fields = ("vehicle_id", "amount", "date")
+    if previous and current and all(previous[name] == current[name] for name in fields):
+        return
+    month = month_of(today or timezone.localdate())
+    changes = {}
+    if previous:
+        _collect(changes, previous, -1, month)
+    if current:
+        _collect(changes, current, 1, month)
+    _apply_changes(changes, month)
+
+
+def record_bulk_totals(expenses, today=None):
+    """Add expenses written with bulk_create, which does not send signals."""
+    month = month_of(today or timezone.localdate())
+    changes = {}
+    for expense in expenses:
+        _collect(changes, {name: getattr(expense, name) for name in VehicleExpense.tracked_fields}, 1, month)
+    _apply_changes(changes, month)
+
+
+def computed_totals(month):
+    """Counters as recounted from the raw expenses, keyed by vehicle id."""
+    rows = (
+        VehicleExpense.objects.order_by().values("vehicle_id").annotate(
+            total=Sum("amount"),
+            count=Count("id"),
+            latest=Max("date"),
+            month_total=Sum("amount", filter=Q(date__gte=month, date__lt=next_month(month))),
+        )
+    )
+    return {
+        row["vehicle_id"]: (row["total"], row["count"], row["latest"], row["month_total"] or ZERO)
+        for row in rows.iterator()
+    }
+
+
+def find_drift(today=None):
+    """
+    Return (vehicle_id, stored, expected) for every vehicle whose counters do
+    not match its expenses, as (lifetime total, expense count, last expense
+    date, current month total). A row still holding an earlier month reads as
+    0 for this one, which is only wrong for expenses dated ahead.
+    """
+    month = month_of(today or timezone.localdate())
+    expected = computed_totals(month)
+    drift = []
+    stored_rows = Vehicle.objects.order_by("pk").values_list(
+        "pk", "lifetime_total", "expense_count", "last_expense_date", "running_month", "running_month_total"
+    )
+    for pk, total, count, latest, running_month, running_total in stored_rows.iterator():
+        wanted = expected.get(pk, (ZERO, 0, None, ZERO))
+        stored = (total, count, latest, running_total if running_month == month else ZERO)
+        if stored != wanted:
+            drift.append((pk, stored, wanted))
+    return drift
+
+
+def reconcile_totals(vehicle_ids=None, today=None, batch_size=1000):
+    """
+    Recount the counters of ``vehicle_ids`` (default: every vehicle) from
+    their expenses with correlated subqueries, a batch per UPDATE.
+    """
+    month = month_of(today or timezone.localdate())
+    expenses = _expenses_of(OuterRef("pk"))
+    values = {
+        "lifetime_total": Coalesce(
+            Subquery(expenses.annotate(total=Sum("amount")).values("total")), Value(ZERO), output_field=MONEY
+        ),
+        "expense_count": Coalesce(Subquery(expenses.annotate(count=Count("id")).values("count")), Value(0)),
+        "last_expense_date": _latest_date(),
+        "running_month": Value(month),
+        "running_month_total": _month_total(month),
+    }
+    if vehicle_ids is None:
+        vehicle_ids = Vehicle.objects.order_by("pk").values_list("pk", flat=True)
+    vehicle_ids = list(vehicle_ids)
+    updated = 0
+    with transaction.atomic():
+        for start in range(0, len(vehicle_ids), batch_size):
+            updated += Vehicle.objects.filter(pk__in=vehicle_ids[start:start + batch_size]).update(**values)
+    if updated:
+        invalidate(Vehicle)
+    return updated
@@ -0,0 +1,94 @@
+import csv
+import json
+
+from django.contrib.auth import authenticate
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from graphql_jwt.exceptions import JSONWebTokenError
+
+from .filters import VehicleExpenseFilter
+from .models import VehicleExpense
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = (
+    ("id", "id"),
+    ("date", "date"),
+    ("vehicle_id", "vehicle_id"),
+    ("registration_number", "vehicle__registration_number"),
+    ("vehicle", "vehicle__name"),
+    ("brand", "vehicle__brand__name"),
+    ("category", "category__name"),
+    ("amount", "amount"),
+    ("description", "description"),
+    ("created_at", "created_at"),
+)
+
+
+class Echo:
+    """
+    File-like object whose write() hands the line back to csv.writer's caller.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _request_user(request):
+    if request.user.is_authenticated:
+        return request.user
+    try:
+        return authenticate(request=request)
+    except JSONWebTokenError:
+        return None
+
+
+def _csv_rows(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _ndjson_rows(rows):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+@require_GET
+def export_vehicle_expenses(request):
+    """
+    Stream every expense matching the VehicleExpenseFilter query parameters
+    (vehicle_id, category_id, start_date, end_date) as CSV or NDJSON.
+
+    Rows are read with a server-side cursor in chunks and written as they
+    arrive, so memory use does not grow with the size of the export.
+    """
+    user = _request_user(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required."}, status=401)
+    if not user.has_perm("vehicle.view_vehicleexpense"):
+        return JsonResponse({"error": "Permission denied."}, status=403)
+
+    export_format = request.GET.get("format", "csv")
+    if export_format not in ("csv", "ndjson"):
+        return JsonResponse({"error": "format must be 'csv' or 'ndjson'."}, status=400)
+
+    filterset = VehicleExpenseFilter(request.GET, queryset=VehicleExpense.objects.all())
+    if not filterset.is_valid():
+        return JsonResponse({"errors": filterset.errors}, status=400)
+
+    rows = (
+        filterset.qs.order_by("date", "id")
+        .values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    if export_format == "ndjson":
+        response = StreamingHttpResponse(_ndjson_rows(rows), content_type="application/x-ndjson")
+    else:
+        response = StreamingHttpResponse(_csv_rows(rows), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="vehicle-expenses.{export_format}"'
+    return response